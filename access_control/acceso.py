@@ -0,0 +1,50 @@
+from rest_framework import status
+
+from .cache import NO_ENCONTRADO
+from .metricas import decisiones_acceso
+from .models import Evento
+
+
+def evaluar_acceso(uid_mac, sensor):
+    """
+    Decide el acceso de una credencial del caché (o NO_ENCONTRADO)
+    Retorna (código HTTP, respuesta, campos del Evento a registrar)
+    La barrera se agrega al evento por quien llama, solo si el acceso es permitido
+    """
+    if sensor is NO_ENCONTRADO:
+        decisiones_acceso.incrementar('no_encontrado')
+        return status.HTTP_404_NOT_FOUND, {
+            'acceso': 'denegado',
+            'motivo': 'Sensor no encontrado'
+        }, {
+            'tipo': Evento.TipoEvento.ACCESO_DENEGADO,
+            'motivo_denegacion': 'Sensor no encontrado',
+            'descripcion': f'Intento de acceso con UID/MAC: {uid_mac}'
+        }
+
+    # Verificar estado del sensor
+    if not sensor.esta_activo():
+        motivo = f'Sensor en estado: {sensor.get_estado_display()}'
+        decisiones_acceso.incrementar('denegado')
+        return status.HTTP_403_FORBIDDEN, {
+            'acceso': 'denegado',
+            'motivo': motivo,
+            'sensor': sensor.datos
+        }, {
+            'tipo': Evento.TipoEvento.ACCESO_DENEGADO,
+            'sensor_id': sensor.id,
+            'motivo_denegacion': motivo,
+            'descripcion': f'Sensor {sensor.nombre} intentó acceder'
+        }
+
+    # Acceso permitido
+    decisiones_acceso.incrementar('permitido')
+    return status.HTTP_200_OK, {
+        'acceso': 'permitido',
+        'sensor': sensor.datos,
+        'mensaje': 'Acceso concedido'
+    }, {
+        'tipo': Evento.TipoEvento.ACCESO_PERMITIDO,
+        'sensor_id': sensor.id,
+        'descripcion': f'Acceso permitido para sensor {sensor.nombre}'
+    }
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import Usuario, Departamento, Sensor, Barrera, Evento
+from .models import Usuario, Departamento, Sensor, Barrera, Evento, EstadisticaAcceso, CredencialRetirada, ArchivoEventos
 
 
 @admin.register(Usuario)
@@ -47,3 +47,24 @@ class EventoAdmin(admin.ModelAdmin):
     search_fields = ['descripcion', 'motivo_denegacion']
     raw_id_fields = ['sensor', 'barrera', 'usuario_responsable']
     readonly_fields = ['timestamp']
+
+
+@admin.register(EstadisticaAcceso)
+class EstadisticaAccesoAdmin(admin.ModelAdmin):
+    list_display = ['periodo', 'granularidad', 'tipo', 'barrera', 'departamento', 'total']
+    list_filter = ['granularidad', 'tipo', 'departamento']
+    raw_id_fields = ['barrera', 'departamento']
+    readonly_fields = ['granularidad', 'periodo', 'tipo', 'barrera', 'departamento', 'total']
+
+
+@admin.register(CredencialRetirada)
+class CredencialRetiradaAdmin(admin.ModelAdmin):
+    list_display = ['uid_mac', 'retirado_at']
+    search_fields = ['uid_mac']
+    readonly_fields = ['uid_mac', 'retirado_at']
+
+
+@admin.register(ArchivoEventos)
+class ArchivoEventosAdmin(admin.ModelAdmin):
+    list_display = ['mes', 'cantidad', 'tamano', 'ruta', 'created_at']
+    readonly_fields = ['mes', 'ruta', 'cantidad', 'ultimo_id', 'tamano', 'created_at']
@@ -3,3 +3,14 @@ from django.apps import AppConfig
 
 class AccessControlConfig(AppConfig):
     name = 'access_control'
+
+    def ready(self):
+        # Registrar señales (invalidación de cachés)
+        from . import signals  # noqa: F401
+        from django.db.backends.signals import connection_created
+
+        from . import metricas, perfilado
+
+        # Consultas SQL por petición para las métricas y el perfilado (ver los middlewares)
+        connection_created.connect(metricas.instrumentar_conexion)
+        connection_created.connect(perfilado.instrumentar_conexion)
@@ -0,0 +1,173 @@
+"""
+Retención de eventos: los meses completos más antiguos que EVENTOS_RETENCION_DIAS se
+exportan a archivos CSV comprimidos (almacenamiento 'archivo_eventos') y se eliminan de la
+tabla Evento, que así se mantiene pequeña. Los archivos se pueden consultar bajo demanda
+con buscar() (ver /api/eventos/archivados/).
+Las estadísticas pre-agregadas (EstadisticaAcceso) no se eliminan.
+"""
+import csv
+import gzip
+import tempfile
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import storages
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from .exportacion import COLUMNAS_EVENTO, filas_eventos, generar_csv
+from .filters import parse_fecha, parse_id
+from .models import Evento, ArchivoEventos
+
+# Columnas con ID de otra tabla y columnas con nombres (vacías en el CSV cuando eran NULL)
+_COLUMNAS_ID = {'id', 'sensor', 'barrera', 'usuario_responsable'}
+_COLUMNAS_NOMBRE = {'sensor_nombre', 'barrera_nombre', 'usuario_nombre'}
+
+
+def almacenamiento():
+    return storages['archivo_eventos']
+
+
+def inicio_mes(fecha):
+    """Inicio (hora local) del mes que contiene a la fecha"""
+    local = timezone.localtime(fecha)
+    return timezone.make_aware(datetime(local.year, local.month, 1))
+
+
+def _mes_siguiente(inicio):
+    return timezone.make_aware(datetime(inicio.year + inicio.month // 12, inicio.month % 12 + 1, 1))
+
+
+def fecha_corte(dias=None):
+    """Los eventos anteriores a esta fecha (inicio de mes) se archivan"""
+    if dias is None:
+        dias = settings.EVENTOS_RETENCION_DIAS
+    return inicio_mes(timezone.now() - timedelta(days=dias))
+
+
+def _eliminar(queryset, tamano_lote):
+    """Elimina por lotes de IDs para no bloquear la tabla en una sola transacción larga"""
+    eliminados = 0
+    while True:
+        ids = list(queryset.order_by().values_list('id', flat=True)[:tamano_lote])
+        if not ids:
+            return eliminados
+        eliminados += Evento.objects.filter(id__in=ids).delete()[0]
+
+
+def _archivar_mes(inicio, tamano_lote):
+    """Archiva los eventos del mes; retorna el ArchivoEventos creado o None si no había eventos"""
+    fin = _mes_siguiente(inicio)
+    eventos_mes = Evento.objects.filter(timestamp__gte=inicio, timestamp__lt=fin)
+
+    # Completar la eliminación de una ejecución anterior interrumpida después de crear el archivo
+    archivado = ArchivoEventos.objects.filter(mes=inicio.date()).aggregate(ultimo=Max('ultimo_id'))['ultimo']
+    if archivado is not None:
+        _eliminar(eventos_mes.filter(id__lte=archivado), tamano_lote)
+
+    tope = eventos_mes.aggregate(ultimo=Max('id'))['ultimo']
+    if tope is None:
+        return None
+    eventos = eventos_mes.filter(id__lte=tope)
+
+    cantidad = 0
+    with tempfile.TemporaryFile() as temporal:
+        with gzip.open(temporal, 'wt', encoding='utf-8', newline='') as comprimido:
+            for linea in generar_csv(filas_eventos(eventos, tamano_lote)):
+                comprimido.write(linea)
+                cantidad += 1
+        cantidad -= 1  # encabezado
+        tamano = temporal.tell()
+        temporal.seek(0)
+        ruta = almacenamiento().save(f'eventos/{inicio:%Y}/{inicio:%Y-%m}-{tope}.csv.gz', File(temporal))
+
+    archivo = ArchivoEventos.objects.create(
+        mes=inicio.date(), ruta=ruta, cantidad=cantidad, ultimo_id=tope, tamano=tamano
+    )
+    # Solo se elimina lo que quedó en el archivo (ID <= tope)
+    _eliminar(eventos, tamano_lote)
+    return archivo
+
+
+def archivar(dias=None, tamano_lote=5000):
+    """
+    Archiva mes a mes los eventos anteriores a fecha_corte(dias)
+    Retorna la lista de ArchivoEventos creados. Se puede ejecutar periódicamente (cron)
+    con `manage.py archivar_eventos`; repetirlo no duplica eventos
+    """
+    corte = fecha_corte(dias)
+    primero = Evento.objects.filter(timestamp__lt=corte).aggregate(primero=Min('timestamp'))['primero']
+    archivos = []
+    if primero is None:
+        return archivos
+    inicio = inicio_mes(primero)
+    while inicio < corte:
+        archivo = _archivar_mes(inicio, tamano_lote)
+        if archivo is not None:
+            archivos.append(archivo)
+        inicio = _mes_siguiente(inicio)
+    return archivos
+
+
+def _convertir(nombre, valor):
+    if nombre == 'timestamp':
+        return parse_datetime(valor)
+    if nombre in _COLUMNAS_ID:
+        return int(valor) if valor else None
+    if nombre in _COLUMNAS_NOMBRE:
+        return valor or None
+    return valor
+
+
+def leer_archivo(archivo):
+    """Filas (tuplas en el orden de COLUMNAS_EVENTO) de un ArchivoEventos"""
+    nombres = [nombre for nombre, _ in COLUMNAS_EVENTO]
+    with almacenamiento().open(archivo.ruta, 'rb') as contenido:
+        with gzip.open(contenido, 'rt', encoding='utf-8', newline='') as texto:
+            lector = csv.reader(texto)
+            next(lector, None)
+            for fila in lector:
+                yield tuple(_convertir(nombre, valor) for nombre, valor in zip(nombres, fila))
+
+
+def filtro_archivados(params):
+    """
+    Valida los filtros (los mismos del listado de eventos) y retorna (desde, hasta, predicado)
+    desde y hasta son obligatorios: determinan qué meses se leen
+    """
+    if not params.get('desde') or not params.get('hasta'):
+        raise ValidationError({'desde': 'Se requieren desde y hasta para consultar eventos archivados'})
+    desde = parse_fecha('desde', params['desde'])[0]
+    hasta, solo_fecha = parse_fecha('hasta', params['hasta'])
+    if solo_fecha:
+        hasta += timedelta(days=1) - timedelta(microseconds=1)
+
+    condiciones = [lambda fila: desde <= fila[1] <= hasta]
+    tipo = params.get('tipo')
+    if tipo:
+        tipos = set(tipo.split(','))
+        invalidos = tipos - set(Evento.TipoEvento.values)
+        if invalidos:
+            raise ValidationError({'tipo': f'Tipo de evento inválido: {", ".join(sorted(invalidos))}'})
+        condiciones.append(lambda fila: fila[2] in tipos)
+    nombres = [nombre for nombre, _ in COLUMNAS_EVENTO]
+    for campo in ('sensor', 'barrera', 'usuario_responsable'):
+        if params.get(campo):
+            indice, valor = nombres.index(campo), parse_id(campo, params[campo])
+            condiciones.append(lambda fila, indice=indice, valor=valor: fila[indice] == valor)
+
+    return desde, hasta, lambda fila: all(condicion(fila) for condicion in condiciones)
+
+
+def buscar(desde, hasta, predicado):
+    """Filas archivadas de los meses entre desde y hasta que cumplen el predicado"""
+    archivos = ArchivoEventos.objects.filter(
+        mes__gte=inicio_mes(desde).date(), mes__lte=inicio_mes(hasta).date()
+    )
+    for archivo in archivos:
+        for fila in leer_archivo(archivo):
+            if predicado(fila):
+                yield fila
@@ -0,0 +1,209 @@
+"""
+Vistas asíncronas (ASGI) de los flujos con más concurrencia: verificación de acceso,
+apertura/cierre manual de barreras y stream de notificaciones para pantallas de monitoreo
+Las vistas de DRF son síncronas y bajo ASGI ocupan un hilo mientras esperan a la base
+de datos; estas usan el ORM async (aget, acreate, asave) y la autenticación JWT async.
+Las respuestas son las mismas que las de las acciones equivalentes de views.py
+"""
+import asyncio
+import functools
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException, MethodNotAllowed, NotAuthenticated, NotFound, ParseError, Throttled,
+    ValidationError
+)
+
+from .acceso import evaluar_acceso
+from .authentication import CachedJWTAuthentication
+from .cache import cache_credenciales
+from .deduplicacion import deduplicador
+from .eventos import aregistrar_evento, registrar_eventos
+from .models import Barrera, Evento
+from .notificaciones import CANALES, broker
+from .serializers import BarreraSerializer
+from .throttling import VerificarAccesoThrottle
+from .utils import formatear_error
+
+_autenticacion = CachedJWTAuthentication()
+
+
+def _respuesta_error(exc):
+    """Respuesta con el mismo formato que custom_exception_handler"""
+    detalle = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = JsonResponse(formatear_error(exc.status_code, detalle), status=exc.status_code)
+    if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+        response['WWW-Authenticate'] = _autenticacion.authenticate_header(None)
+    if getattr(exc, 'wait', None) is not None:
+        response['Retry-After'] = str(math.ceil(exc.wait))
+    return response
+
+
+def vista_async(metodos=('POST',), token_en_query=False):
+    """
+    Decorador de las vistas async: valida el método HTTP y exige un usuario autenticado por JWT
+    Las vistas quedan exentas de CSRF, igual que las de DRF con autenticación por token
+    Con token_en_query también se acepta el token en ?token= (EventSource no permite headers)
+    """
+    def decorador(vista):
+        @csrf_exempt
+        @functools.wraps(vista)
+        async def envoltura(request, *args, **kwargs):
+            try:
+                if request.method not in metodos:
+                    raise MethodNotAllowed(request.method)
+                resultado = await _autenticacion.aauthenticate(request)
+                if resultado is None and token_en_query and request.GET.get('token'):
+                    token = _autenticacion.get_validated_token(request.GET['token'].encode())
+                    resultado = await _autenticacion.aget_user(token), token
+                if resultado is None:
+                    raise NotAuthenticated()
+                request.user, request.auth = resultado
+                return await vista(request, *args, **kwargs)
+            except APIException as exc:
+                return _respuesta_error(exc)
+        return envoltura
+    return decorador
+
+
+def _datos(request):
+    """Cuerpo de la petición en JSON o como formulario"""
+    if request.content_type == 'application/json':
+        try:
+            datos = json.loads(request.body or b'{}')
+        except ValueError:
+            raise ParseError('JSON inválido')
+        return datos if isinstance(datos, dict) else {}
+    return request.POST
+
+
+@vista_async()
+async def verificar_acceso(request):
+    """Versión async de SensorViewSet.verificar_acceso"""
+    throttle = VerificarAccesoThrottle()
+    if not throttle.allow_request(request):
+        raise Throttled(throttle.wait())
+    datos = _datos(request)
+    uid_mac = datos.get('uid_mac')
+    barrera_id = datos.get('barrera_id')
+
+    if not uid_mac:
+        return JsonResponse({'error': 'uid_mac es requerido'}, status=status.HTTP_400_BAD_REQUEST)
+
+    repetida, suprimidas = deduplicador.repetida(uid_mac, barrera_id)
+    if suprimidas:
+        await sync_to_async(registrar_eventos)(suprimidas)
+    if repetida is not None:
+        codigo, respuesta = repetida
+        return JsonResponse(respuesta, status=codigo)
+
+    sensor = await cache_credenciales.aobtener(uid_mac)
+    codigo, respuesta, evento_data = evaluar_acceso(uid_mac, sensor)
+
+    if codigo == status.HTTP_200_OK and barrera_id:
+        evento_data['barrera_id'] = (
+            await Barrera.objects.filter(id=barrera_id).values_list('id', flat=True).afirst()
+        )
+
+    await aregistrar_evento(**evento_data)
+    suprimidas = deduplicador.guardar(uid_mac, barrera_id, codigo, respuesta, evento_data)
+    if suprimidas:
+        await sync_to_async(registrar_eventos)(suprimidas)
+
+    return JsonResponse(respuesta, status=codigo)
+
+
+async def _obtener_barrera(pk):
+    try:
+        return await Barrera.objects.select_related('departamento').aget(pk=pk)
+    except Barrera.DoesNotExist:
+        raise NotFound('No encontrado.')
+
+
+@vista_async()
+async def abrir_barrera(request, pk):
+    """Versión async de BarreraViewSet.abrir"""
+    barrera = await _obtener_barrera(pk)
+    cambio = await barrera.aabrir()
+
+    if cambio:
+        await aregistrar_evento(
+            tipo=Evento.TipoEvento.APERTURA_MANUAL,
+            barrera_id=barrera.id,
+            usuario_responsable_id=request.user.pk,
+            descripcion=f'Apertura manual de barrera {barrera.nombre} por {request.user.username}'
+        )
+
+    return JsonResponse({
+        'status': 'barrera abierta',
+        'cambio': cambio,
+        'barrera': BarreraSerializer(barrera).data
+    })
+
+
+@vista_async()
+async def cerrar_barrera(request, pk):
+    """Versión async de BarreraViewSet.cerrar"""
+    barrera = await _obtener_barrera(pk)
+    cambio = await barrera.acerrar()
+
+    if cambio:
+        await aregistrar_evento(
+            tipo=Evento.TipoEvento.CIERRE_MANUAL,
+            barrera_id=barrera.id,
+            usuario_responsable_id=request.user.pk,
+            descripcion=f'Cierre manual de barrera {barrera.nombre} por {request.user.username}'
+        )
+
+    return JsonResponse({
+        'status': 'barrera cerrada',
+        'cambio': cambio,
+        'barrera': BarreraSerializer(barrera).data
+    })
+
+
+async def _flujo(suscripcion, heartbeat):
+    """Mensajes SSE de la suscripción, con un comentario periódico para mantener viva la conexión"""
+    try:
+        yield ': conectado\n\n'
+        while True:
+            try:
+                yield await asyncio.wait_for(suscripcion.cola.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+    finally:
+        # Se ejecuta también cuando el cliente se desconecta (la tarea se cancela)
+        broker.cancelar(suscripcion)
+
+
+@vista_async(metodos=('GET',), token_en_query=True)
+async def stream(request):
+    """
+    Stream SSE de cambios de estado de barreras y eventos registrados (ver notificaciones.py)
+    ?canales=barreras,eventos (por defecto, ambos)
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'error': 'El stream requiere un servidor ASGI'}, status=status.HTTP_501_NOT_IMPLEMENTED
+        )
+    canales = request.GET.get('canales')
+    canales = canales.split(',') if canales else CANALES
+    invalidos = set(canales) - set(CANALES)
+    if invalidos:
+        raise ValidationError({'canales': f'Canal inválido: {", ".join(sorted(invalidos))}'})
+
+    suscripcion = broker.suscribir(canales)
+    response = StreamingHttpResponse(
+        _flujo(suscripcion, settings.NOTIFICACIONES_HEARTBEAT), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Evitar que nginx acumule la respuesta antes de enviarla
+    response['X-Accel-Buffering'] = 'no'
+    return response
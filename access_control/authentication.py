@@ -0,0 +1,100 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .metricas import cache_aciertos, cache_fallos
+from .models import Usuario
+
+# Campos que usan los permisos y las vistas (en el orden de los campos del modelo, requerido por from_db)
+CAMPOS_USUARIO = [
+    campo.attname for campo in Usuario._meta.concrete_fields
+    if campo.attname in {'id', 'username', 'rol', 'is_active', 'is_staff', 'is_superuser'}
+]
+
+
+def clave_usuario(user_id):
+    return f'jwt_usuario:{user_id}'
+
+
+def invalidar_usuario(user_id):
+    """Elimina el usuario de la caché de autenticación (ver signals.py)"""
+    cache.delete(clave_usuario(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    Autenticación JWT que resuelve el usuario desde la caché de Django (TTL corto)
+    en lugar de consultar Usuario en cada petición
+    El usuario retornado solo tiene cargados CAMPOS_USUARIO; cualquier otro campo
+    se carga de forma diferida desde la base de datos si se llega a usar
+    Con LocMemCache la invalidación es por proceso: en despliegues con varios workers,
+    configurar una caché compartida (CACHE_REDIS_URL) o un TTL corto
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # La verificación de revocación necesita el hash de la contraseña
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('El token no contiene una identificación de usuario')
+
+        clave = clave_usuario(user_id)
+        valores = cache.get(clave)
+        (cache_aciertos if valores is not None else cache_fallos).incrementar('jwt_usuarios')
+        if valores is None:
+            valores = Usuario.objects.filter(
+                **{api_settings.USER_ID_FIELD: user_id}
+            ).values_list(*CAMPOS_USUARIO).first()
+            if valores is None:
+                raise AuthenticationFailed('Usuario no encontrado', code='user_not_found')
+            cache.set(clave, valores, settings.JWT_USUARIO_CACHE_TTL)
+
+        return self._usuario(valores)
+
+    async def aauthenticate(self, request):
+        """Versión asíncrona de authenticate() para las vistas async (ver async_views.py)"""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        # La validación del token es solo CPU (firma y expiración), sin consultas
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            return await sync_to_async(super().get_user)(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('El token no contiene una identificación de usuario')
+
+        clave = clave_usuario(user_id)
+        valores = await cache.aget(clave)
+        (cache_aciertos if valores is not None else cache_fallos).incrementar('jwt_usuarios')
+        if valores is None:
+            valores = await Usuario.objects.filter(
+                **{api_settings.USER_ID_FIELD: user_id}
+            ).values_list(*CAMPOS_USUARIO).afirst()
+            if valores is None:
+                raise AuthenticationFailed('Usuario no encontrado', code='user_not_found')
+            await cache.aset(clave, valores, settings.JWT_USUARIO_CACHE_TTL)
+
+        return self._usuario(valores)
+
+    def _usuario(self, valores):
+        user = Usuario.from_db('default', CAMPOS_USUARIO, valores)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed('Usuario inactivo', code='user_inactive')
+
+        return user
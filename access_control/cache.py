@@ -0,0 +1,205 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+
+from .models import Sensor
+
+
+class Credencial(namedtuple('Credencial', [
+    'id', 'uid_mac', 'nombre', 'estado', 'departamento_id', 'departamento_nombre', 'datos'
+])):
+    """
+    Datos mínimos de un sensor necesarios para decidir un acceso
+    `datos` contiene la representación del SensorSerializer para la respuesta
+    """
+    __slots__ = ()
+
+    def esta_activo(self):
+        """Verifica si el sensor está activo"""
+        return self.estado == Sensor.Estado.ACTIVO
+
+    def get_estado_display(self):
+        return Sensor.Estado(self.estado).label
+
+
+# Marca para los UID/MAC consultados que no existen en la base de datos
+NO_ENCONTRADO = object()
+
+
+class CacheCredenciales:
+    """
+    Caché LRU en memoria (por proceso) de credenciales de sensores, indexada por uid_mac
+    Se invalida desde las señales de guardado/eliminación de Sensor (ver signals.py), pero las
+    señales solo llegan al proceso que hizo el cambio: con varios workers, los demás siguen
+    usando su copia (p. ej. un sensor bloqueado, o NO_ENCONTRADO para uno recién registrado)
+    hasta que la entrada vence, `ttl` segundos después de leerla (CREDENCIALES_CACHE_TTL)
+    """
+    def __init__(self, max_tamano=10000, ttl=10):
+        self.max_tamano = max_tamano
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._datos = OrderedDict()
+        self._uid_por_id = {}
+        self._generacion = 0
+        self._lock = threading.Lock()
+
+    def obtener(self, uid_mac):
+        """
+        Retorna la Credencial del uid_mac, o NO_ENCONTRADO si el sensor no existe
+        Solo consulta la base de datos cuando el uid_mac no está en caché
+        """
+        credencial, generacion = self._buscar(uid_mac)
+        if credencial is None:
+            credencial = self._cargar(uid_mac)
+            self._guardar_vigente(uid_mac, credencial, generacion)
+        return credencial
+
+    async def aobtener(self, uid_mac):
+        """Versión asíncrona de obtener(): la consulta en caso de fallo usa el ORM async"""
+        credencial, generacion = self._buscar(uid_mac)
+        if credencial is None:
+            credencial = await self._acargar(uid_mac)
+            self._guardar_vigente(uid_mac, credencial, generacion)
+        return credencial
+
+    def obtener_varios(self, uids_mac):
+        """
+        Retorna un diccionario {uid_mac: Credencial o NO_ENCONTRADO}
+        Los uid_mac que no están en caché se resuelven con una sola consulta uid_mac__in
+        """
+        resultado = {}
+        faltantes = []
+        with self._lock:
+            ahora = time.monotonic()
+            for uid_mac in set(uids_mac):
+                credencial = self._vigente(uid_mac, ahora)
+                if credencial is not None:
+                    self.hits += 1
+                    resultado[uid_mac] = credencial
+                else:
+                    self.misses += 1
+                    faltantes.append(uid_mac)
+            generacion = self._generacion
+
+        if faltantes:
+            sensores = Sensor.objects.select_related('departamento', 'usuario').filter(
+                uid_mac__in=faltantes).order_by()
+            cargadas = {sensor.uid_mac: self._credencial(sensor) for sensor in sensores}
+            with self._lock:
+                for uid_mac in faltantes:
+                    resultado[uid_mac] = cargadas.get(uid_mac, NO_ENCONTRADO)
+                    if generacion == self._generacion:
+                        self._guardar(uid_mac, resultado[uid_mac])
+        return resultado
+
+    def invalidar(self, uid_mac=None, sensor_id=None):
+        """Elimina la credencial por uid_mac y/o por id de sensor"""
+        with self._lock:
+            self._generacion += 1
+            if sensor_id is not None:
+                uid_anterior = self._uid_por_id.pop(sensor_id, None)
+                if uid_anterior is not None:
+                    self._datos.pop(uid_anterior, None)
+            if uid_mac is not None:
+                credencial, _ = self._datos.pop(uid_mac, (None, None))
+                if isinstance(credencial, Credencial):
+                    self._uid_por_id.pop(credencial.id, None)
+
+    def limpiar(self):
+        """Vacía la caché completa (los contadores se mantienen)"""
+        with self._lock:
+            self._generacion += 1
+            self._datos.clear()
+            self._uid_por_id.clear()
+
+    def estadisticas(self):
+        """Contadores de aciertos/fallos y ocupación de la caché"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+                'tamano': len(self._datos),
+                'max_tamano': self.max_tamano,
+            }
+
+    def _buscar(self, uid_mac):
+        """Retorna (credencial o None si no está en caché, generación actual)"""
+        with self._lock:
+            credencial = self._vigente(uid_mac, time.monotonic())
+            if credencial is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return credencial, self._generacion
+
+    def _vigente(self, uid_mac, ahora):
+        """Credencial en caché no vencida (con el lock tomado); descarta la vencida"""
+        entrada = self._datos.get(uid_mac)
+        if entrada is None:
+            return None
+        credencial, expira = entrada
+        if expira <= ahora:
+            del self._datos[uid_mac]
+            if isinstance(credencial, Credencial):
+                self._uid_por_id.pop(credencial.id, None)
+            return None
+        self._datos.move_to_end(uid_mac)
+        return credencial
+
+    def _guardar_vigente(self, uid_mac, credencial, generacion):
+        with self._lock:
+            # Si hubo una invalidación mientras se consultaba, no guardar un dato posiblemente obsoleto
+            if generacion == self._generacion:
+                self._guardar(uid_mac, credencial)
+
+    def _cargar(self, uid_mac):
+        try:
+            sensor = Sensor.objects.select_related('departamento', 'usuario').get(uid_mac=uid_mac)
+        except Sensor.DoesNotExist:
+            return NO_ENCONTRADO
+        return self._credencial(sensor)
+
+    async def _acargar(self, uid_mac):
+        try:
+            sensor = await Sensor.objects.select_related('departamento', 'usuario').aget(uid_mac=uid_mac)
+        except Sensor.DoesNotExist:
+            return NO_ENCONTRADO
+        return self._credencial(sensor)
+
+    def _credencial(self, sensor):
+        # Importación local para evitar dependencias circulares con serializers
+        from .serializers import SensorSerializer
+
+        return Credencial(
+            id=sensor.id,
+            uid_mac=sensor.uid_mac,
+            nombre=sensor.nombre,
+            estado=sensor.estado,
+            departamento_id=sensor.departamento_id,
+            departamento_nombre=sensor.departamento.nombre if sensor.departamento else None,
+            datos=SensorSerializer(sensor).data,
+        )
+
+    def _guardar(self, uid_mac, credencial):
+        if self.max_tamano <= 0 or self.ttl <= 0:
+            return
+        self._datos[uid_mac] = (credencial, time.monotonic() + self.ttl)
+        self._datos.move_to_end(uid_mac)
+        if isinstance(credencial, Credencial):
+            self._uid_por_id[credencial.id] = uid_mac
+        # Desalojar las entradas menos usadas recientemente
+        while len(self._datos) > self.max_tamano:
+            uid_desalojado, (desalojada, _) = self._datos.popitem(last=False)
+            if isinstance(desalojada, Credencial):
+                self._uid_por_id.pop(desalojada.id, None)
+
+
+cache_credenciales = CacheCredenciales(
+    max_tamano=getattr(settings, 'CREDENCIALES_CACHE_TAMANO', 10000),
+    ttl=getattr(settings, 'CREDENCIALES_CACHE_TTL', 10),
+)
@@ -0,0 +1,51 @@
+"""
+Backend MySQL con pool de conexiones en memoria del proceso (ver access_control/db_pool.py)
+
+Se activa con DB_POOL=True (ver settings.py). Al cerrar, Django devuelve la conexión al pool
+en lugar de cerrarla, así cada petición evita el handshake TLS y la autenticación.
+Requiere CONN_MAX_AGE = 0: la conexión vuelve al pool al terminar cada petición.
+Opciones en DATABASES[alias]["POOL"]: TAMANO, DESBORDE, TIMEOUT, RECICLAR, VALIDAR_DESPUES.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.mysql import base
+
+from access_control.db_pool import obtener_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def _pool(self):
+        opciones = self.settings_dict.get('POOL', {})
+        return obtener_pool(
+            self.alias,
+            crear=lambda: base.DatabaseWrapper.get_new_connection(self, self.get_connection_params()),
+            cerrar=lambda conexion: conexion.close(),
+            validar=lambda conexion: conexion.ping(),
+            tamano=opciones.get('TAMANO', 10),
+            desborde=opciones.get('DESBORDE', 5),
+            timeout=opciones.get('TIMEOUT', 10.0),
+            reciclar=opciones.get('RECICLAR', 3600),
+            validar_despues=opciones.get('VALIDAR_DESPUES', 30),
+        )
+
+    def check_settings(self):
+        super().check_settings()
+        if self.settings_dict['CONN_MAX_AGE'] != 0:
+            raise ImproperlyConfigured('El backend mysql_pool requiere CONN_MAX_AGE = 0')
+
+    def get_new_connection(self, conn_params):
+        # Los parámetros los usa el pool al crear conexiones nuevas
+        return self._pool().obtener()
+
+    def _close(self):
+        if self.connection is None:
+            return
+        # Una conexión cerrada dentro de una transacción o con errores no se reutiliza
+        descartar = self.in_atomic_block or self.errors_occurred
+        if not descartar and not self.get_autocommit():
+            try:
+                with self.wrap_database_errors:
+                    self.connection.rollback()
+            except Exception:
+                descartar = True
+        self._pool().devolver(self.connection, descartar=descartar)
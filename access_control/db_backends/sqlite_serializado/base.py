@@ -0,0 +1,86 @@
+"""
+Backend SQLite con escrituras serializadas dentro del proceso (ver DB_SQLITE_OPTIMIZADO)
+
+SQLite admite un solo escritor a la vez: cuando varios hilos escriben, los que esperan el
+bloqueo del archivo reintentan con pausas crecientes (busy_timeout) y en ráfagas terminan
+con "database is locked". Aquí los hilos del proceso esperan su turno en un lock antes de
+pedir el bloqueo de SQLite, que así solo se disputa entre procesos (con WAL y busy_timeout).
+El lock se toma por transacción (BEGIN IMMEDIATE ... COMMIT/ROLLBACK) o, en autocommit,
+por cada sentencia de escritura.
+"""
+import threading
+
+from django.db.backends.sqlite3 import base
+
+SENTENCIAS_ESCRITURA = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def _lock_escritura(nombre):
+    """Un lock por archivo de base de datos, compartido por todas las conexiones del proceso"""
+    with _locks_lock:
+        return _locks.setdefault(str(nombre), threading.Lock())
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock_escritura = _lock_escritura(self.settings_dict['NAME'])
+        self._escribiendo = False
+        self.execute_wrappers.append(self._serializar_sentencia)
+
+    def _tomar_lock(self):
+        if self._escribiendo:
+            return False
+        # Mismo tiempo máximo de espera que el bloqueo de SQLite (OPTIONS["timeout"])
+        timeout = self.settings_dict['OPTIONS'].get('timeout', 5)
+        if not self._lock_escritura.acquire(timeout=timeout):
+            raise base.Database.OperationalError('database is locked (escrituras del proceso en espera)')
+        self._escribiendo = True
+        return True
+
+    def _liberar_lock(self):
+        if self._escribiendo:
+            self._escribiendo = False
+            self._lock_escritura.release()
+
+    def _serializar_sentencia(self, execute, sql, params, many, context):
+        if self._escribiendo or not sql.lstrip()[:7].upper().startswith(SENTENCIAS_ESCRITURA):
+            return execute(sql, params, many, context)
+        self._tomar_lock()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            # Una escritura en autocommit termina con la sentencia
+            if self.get_autocommit() and not self.in_atomic_block:
+                self._liberar_lock()
+
+    def _start_transaction_under_autocommit(self):
+        tomado = self._tomar_lock()
+        try:
+            super()._start_transaction_under_autocommit()
+        except Exception:
+            if tomado:
+                self._liberar_lock()
+            raise
+
+    def _commit(self):
+        try:
+            return super()._commit()
+        finally:
+            self._liberar_lock()
+
+    def _rollback(self):
+        try:
+            return super()._rollback()
+        finally:
+            self._liberar_lock()
+
+    def _close(self):
+        try:
+            return super()._close()
+        finally:
+            self._liberar_lock()
@@ -0,0 +1,140 @@
+"""
+Pool de conexiones en memoria del proceso (usado por el backend db_backends.mysql_pool)
+
+Mantiene hasta `tamano` conexiones abiertas para reutilizar y permite `desborde` conexiones
+adicionales en picos, que se cierran al devolverse. Si el pool está agotado, obtener()
+espera hasta `timeout` segundos. Las conexiones se renuevan después de `reciclar` segundos y
+se validan (p. ej. con ping) si estuvieron libres más de `validar_despues` segundos.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from .metricas import db_pool_agotado, db_pool_espera
+
+logger = logging.getLogger(__name__)
+
+
+class PoolAgotado(Exception):
+    pass
+
+
+class PoolConexiones:
+
+    def __init__(self, alias, crear, cerrar, validar=None, tamano=10, desborde=5, timeout=10.0,
+                 reciclar=3600, validar_despues=30):
+        self.alias = alias
+        self.tamano = tamano
+        self.desborde = desborde
+        self.timeout = timeout
+        self.reciclar = reciclar
+        self.validar_despues = validar_despues
+        self._crear = crear
+        self._cerrar = cerrar
+        self._validar = validar
+        # (conexión, instante en que se devolvió); se reutiliza la más reciente (LIFO)
+        self._libres = deque()
+        self._creadas = {}
+        self._abiertas = 0
+        self._cond = threading.Condition()
+
+    def obtener(self):
+        inicio = time.monotonic()
+        with self._cond:
+            while True:
+                if self._libres:
+                    conexion, devuelta = self._libres.pop()
+                    break
+                if self._abiertas < self.tamano + self.desborde:
+                    self._abiertas += 1
+                    conexion = None
+                    break
+                restante = self.timeout - (time.monotonic() - inicio)
+                if restante <= 0:
+                    db_pool_agotado.incrementar(self.alias)
+                    raise PoolAgotado(
+                        f'Pool de conexiones "{self.alias}" agotado ({self.tamano}+{self.desborde}) '
+                        f'después de esperar {self.timeout} s'
+                    )
+                self._cond.wait(restante)
+        db_pool_espera.observar(time.monotonic() - inicio, self.alias)
+
+        if conexion is not None and not self._vigente(conexion, devuelta):
+            self._descartar(conexion, reservar=True)
+            conexion = None
+        if conexion is None:
+            try:
+                conexion = self._crear()
+            except BaseException:
+                with self._cond:
+                    self._abiertas -= 1
+                    self._cond.notify()
+                raise
+            self._creadas[id(conexion)] = time.monotonic()
+        return conexion
+
+    def devolver(self, conexion, descartar=False):
+        """Devuelve la conexión al pool; las de desborde y las descartadas se cierran"""
+        with self._cond:
+            if not descartar and len(self._libres) < self.tamano:
+                self._libres.append((conexion, time.monotonic()))
+                self._cond.notify()
+                return
+        self._descartar(conexion)
+
+    def cerrar_todas(self):
+        with self._cond:
+            libres = [conexion for conexion, _ in self._libres]
+            self._libres.clear()
+        for conexion in libres:
+            self._descartar(conexion)
+
+    def estado(self):
+        with self._cond:
+            return {'abiertas': self._abiertas, 'libres': len(self._libres)}
+
+    def _vigente(self, conexion, devuelta):
+        ahora = time.monotonic()
+        if self.reciclar and ahora - self._creadas.get(id(conexion), ahora) > self.reciclar:
+            return False
+        if self._validar is not None and ahora - devuelta > self.validar_despues:
+            try:
+                self._validar(conexion)
+            except Exception:
+                logger.info('Conexión inválida en el pool "%s"; se reemplaza', self.alias)
+                return False
+        return True
+
+    def _descartar(self, conexion, reservar=False):
+        """Cierra la conexión; con reservar, su lugar queda para la que la reemplaza"""
+        self._creadas.pop(id(conexion), None)
+        try:
+            self._cerrar(conexion)
+        except Exception:
+            pass
+        if not reservar:
+            with self._cond:
+                self._abiertas -= 1
+                self._cond.notify()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def obtener_pool(alias, **opciones):
+    """Pool del alias en este proceso (cada worker tiene el suyo: no se comparten después de fork)"""
+    clave = (alias, os.getpid())
+    with _pools_lock:
+        pool = _pools.get(clave)
+        if pool is None:
+            pool = _pools[clave] = PoolConexiones(alias, **opciones)
+        return pool
+
+
+def pools():
+    pid = os.getpid()
+    with _pools_lock:
+        return {alias: pool for (alias, pool_pid), pool in _pools.items() if pool_pid == pid}
@@ -0,0 +1,67 @@
+"""
+Réplica de lectura opcional (alias 'replica' en DATABASES, ver settings.py)
+
+Las lecturas se envían a la réplica solo dentro de las peticiones que lo activan
+(GET de listados y reportes, ver mixins.ReplicaLecturaMixin); todo lo demás, incluidas las
+escrituras y verificar_acceso, usa la base de datos principal. Después de una escritura,
+las lecturas de la misma petición vuelven a la principal.
+"""
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+ALIAS_PRINCIPAL = 'default'
+ALIAS_REPLICA = 'replica'
+
+# Alias para las lecturas de la petición en curso (None: la base de datos principal)
+_lectura = ContextVar('db_lectura', default=None)
+
+
+def replica_configurada():
+    return ALIAS_REPLICA in settings.DATABASES
+
+
+def activar_replica():
+    """Envía a la réplica las lecturas del contexto actual; retorna el token para desactivar"""
+    return _lectura.set(ALIAS_REPLICA)
+
+
+def desactivar_replica(token):
+    _lectura.reset(token)
+
+
+def _clave_adherencia(user_id):
+    return f'replica:adherencia:{user_id}'
+
+
+def marcar_escritura(user_id):
+    """
+    Las lecturas del usuario van a la principal durante DB_REPLICA_ADHERENCIA segundos,
+    para que vea sus propios cambios aunque la réplica tenga retraso
+    (con varios workers, requiere una caché compartida: CACHE_REDIS_URL)
+    """
+    cache.set(_clave_adherencia(user_id), True, settings.DB_REPLICA_ADHERENCIA)
+
+
+def escritura_reciente(user_id):
+    return cache.get(_clave_adherencia(user_id), False)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        return _lectura.get()
+
+    def db_for_write(self, model, **hints):
+        if _lectura.get() is not None:
+            # Leer lo recién escrito en la misma petición
+            _lectura.set(None)
+        return ALIAS_PRINCIPAL
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Ambas bases de datos tienen los mismos datos
+        alias = {ALIAS_PRINCIPAL, ALIAS_REPLICA}
+        if obj1._state.db in alias and obj2._state.db in alias:
+            return True
+        return None
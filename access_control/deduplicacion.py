@@ -0,0 +1,163 @@
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils import timezone
+
+from .eventos import registrar_eventos
+from .metricas import lecturas_suprimidas
+from .models import Evento
+
+logger = logging.getLogger(__name__)
+
+
+def _clave(uid_mac, barrera_id):
+    # barrera_id puede llegar como entero (JSON) o texto (formulario)
+    return uid_mac, str(barrera_id or '')
+
+
+class _Decision:
+    __slots__ = ('codigo', 'respuesta', 'evento', 'expira', 'suprimidas', 'ultima')
+
+    def __init__(self, codigo, respuesta, evento, expira):
+        self.codigo = codigo
+        self.respuesta = respuesta
+        self.evento = evento
+        self.expira = expira
+        self.suprimidas = 0
+        self.ultima = None
+
+
+class Deduplicador:
+    """
+    Ventana de de-duplicación (por proceso) de lecturas de verificar_acceso por (uid_mac, barrera)
+    Una tarjeta apoyada en el lector genera muchas lecturas idénticas: dentro de la ventana
+    (VERIFICAR_ACCESO_VENTANA segundos desde la decisión) se responde la decisión guardada,
+    sin consultas ni eventos. Las lecturas suprimidas de una ventana vencida se registran en
+    un solo evento LECTURAS_SUPRIMIDAS con la siguiente lectura que llega al proceso (repetida
+    o guardar), al invalidar o limpiar las decisiones y al terminar el proceso (atexit)
+    """
+    def __init__(self):
+        # Ordenado por vencimiento (la ventana es fija desde la decisión)
+        self._decisiones = OrderedDict()
+        self._lock = threading.Lock()
+        self._atexit = False
+
+    @property
+    def ventana(self):
+        return getattr(settings, 'VERIFICAR_ACCESO_VENTANA', 0)
+
+    def repetida(self, uid_mac, barrera_id):
+        """
+        Retorna ((código, respuesta) o None, eventos agregados de las ventanas vencidas)
+        Con una decisión vigente cuenta la lectura suprimida; los eventos agregados se
+        registran con registrar_eventos
+        """
+        if self.ventana <= 0:
+            return None, []
+        ahora = time.monotonic()
+        with self._lock:
+            agregados = self._vencidas(ahora) if self._decisiones else []
+            decision = self._decisiones.get(_clave(uid_mac, barrera_id))
+            if decision is None or decision.expira <= ahora:
+                return None, agregados
+            decision.suprimidas += 1
+            decision.ultima = timezone.now()
+        lecturas_suprimidas.incrementar()
+        return (decision.codigo, decision.respuesta), agregados
+
+    def guardar(self, uid_mac, barrera_id, codigo, respuesta, evento):
+        """
+        Guarda una decisión nueva y retorna los eventos agregados de las ventanas vencidas
+        (para registrar con registrar_eventos)
+        """
+        if self.ventana <= 0:
+            return []
+        ahora = time.monotonic()
+        with self._lock:
+            if not self._atexit:
+                atexit.register(self.vaciar)
+                self._atexit = True
+            clave = _clave(uid_mac, barrera_id)
+            agregados = self._vencidas(ahora)
+            anterior = self._decisiones.pop(clave, None)
+            if anterior is not None:
+                agregados.extend(self._agregado(clave, anterior))
+            self._decisiones[clave] = _Decision(codigo, respuesta, evento, ahora + self.ventana)
+        return agregados
+
+    def invalidar(self, uid_mac=None, barrera_id=None, eliminado=False):
+        """
+        Descarta las decisiones del uid_mac o de la barrera (p. ej. al desactivar el sensor,
+        ver signals.py) y registra sus lecturas suprimidas; con eliminado, el evento agregado
+        no referencia al sensor o la barrera eliminados
+        """
+        with self._lock:
+            claves = [
+                clave for clave in self._decisiones
+                if clave[0] == uid_mac or (barrera_id is not None and clave[1] == str(barrera_id))
+            ]
+            agregados = []
+            for clave in claves:
+                for agregado in self._agregado(clave, self._decisiones.pop(clave)):
+                    if eliminado and uid_mac is not None:
+                        agregado['sensor_id'] = None
+                    if eliminado and barrera_id is not None:
+                        agregado['barrera_id'] = None
+                    agregados.append(agregado)
+        self._registrar(agregados)
+
+    def vaciar(self):
+        """Registra las lecturas suprimidas pendientes de todas las ventanas y las descarta"""
+        with self._lock:
+            agregados = self._vencidas(float('inf'))
+        self._registrar(agregados)
+
+    def limpiar(self):
+        """Descarta todas las decisiones (p. ej. al cambiar un usuario), sin perder las lecturas suprimidas"""
+        self.vaciar()
+
+    def descartar(self):
+        """Descarta las decisiones y sus lecturas suprimidas sin registrarlas (pruebas)"""
+        with self._lock:
+            self._decisiones.clear()
+
+    def _registrar(self, agregados):
+        if not agregados:
+            return
+        try:
+            registrar_eventos(agregados)
+        except Exception:
+            # Un error aquí no debe interrumpir la señal o la importación que limpia la ventana
+            logger.exception('No se pudieron registrar %s eventos de lecturas suprimidas', len(agregados))
+
+    def _vencidas(self, ahora):
+        agregados = []
+        while self._decisiones:
+            clave, decision = next(iter(self._decisiones.items()))
+            if decision.expira > ahora:
+                break
+            self._decisiones.popitem(last=False)
+            agregados.extend(self._agregado(clave, decision))
+        return agregados
+
+    def _agregado(self, clave, decision):
+        if not decision.suprimidas:
+            return []
+        uid_mac, _ = clave
+        return [{
+            'tipo': Evento.TipoEvento.LECTURAS_SUPRIMIDAS,
+            'sensor_id': decision.evento.get('sensor_id'),
+            'barrera_id': decision.evento.get('barrera_id'),
+            'timestamp': decision.ultima,
+            'descripcion': (
+                f'{decision.suprimidas} lecturas repetidas de UID/MAC {uid_mac} respondidas sin '
+                f'registrar (ventana de {self.ventana:g} s)'
+            ),
+        }]
+
+
+deduplicador = Deduplicador()
@@ -0,0 +1,197 @@
+"""
+Estadísticas pre-agregadas de acceso (tabla EstadisticaAcceso)
+Los contadores por hora y por día se incrementan al persistir eventos (ver eventos.py),
+de modo que los dashboards consultan una tabla pequeña en lugar de recorrer Evento
+"""
+import threading
+from collections import Counter
+from datetime import datetime, time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Min, Q
+from django.utils import timezone
+
+from .models import Barrera, Sensor, Evento, EstadisticaAcceso
+
+# Departamento de cada barrera (cambia muy poco); se limpia desde signals.py
+_departamento_barrera = {}
+_departamento_barrera_lock = threading.Lock()
+
+
+def limpiar_departamentos_barrera():
+    with _departamento_barrera_lock:
+        _departamento_barrera.clear()
+
+
+def periodos(timestamp):
+    """Inicio de la hora y del día (hora local) que contienen al timestamp"""
+    local = timezone.localtime(timestamp)
+    hora = local.replace(minute=0, second=0, microsecond=0)
+    dia = timezone.make_aware(datetime.combine(local.date(), time.min))
+    return (
+        (EstadisticaAcceso.Granularidad.HORA, hora),
+        (EstadisticaAcceso.Granularidad.DIA, dia),
+    )
+
+
+def _resolver_departamentos(eventos):
+    """Retorna ({barrera_id: departamento_id}, {sensor_id: departamento_id}) con consultas por lote"""
+    barreras = {campos.get('barrera_id') for campos in eventos} - {None}
+    with _departamento_barrera_lock:
+        faltantes = barreras - _departamento_barrera.keys()
+    if faltantes:
+        encontrados = dict(
+            Barrera.objects.filter(id__in=faltantes).order_by().values_list('id', 'departamento_id')
+        )
+        with _departamento_barrera_lock:
+            _departamento_barrera.update(encontrados)
+    with _departamento_barrera_lock:
+        por_barrera = {barrera_id: _departamento_barrera.get(barrera_id) for barrera_id in barreras}
+
+    # Solo los eventos sin barrera usan el departamento del sensor
+    sensores = {
+        campos.get('sensor_id') for campos in eventos if not campos.get('barrera_id')
+    } - {None}
+    por_sensor = dict(
+        Sensor.objects.filter(id__in=sensores).order_by().values_list('id', 'departamento_id')
+    ) if sensores else {}
+    return por_barrera, por_sensor
+
+
+def _contar(filas):
+    """filas: iterable de (timestamp, tipo, barrera_id, departamento_id)"""
+    contadores = Counter()
+    for timestamp, tipo, barrera_id, departamento_id in filas:
+        for granularidad, periodo in periodos(timestamp):
+            contadores[(granularidad, periodo, barrera_id, departamento_id, tipo)] += 1
+    return contadores
+
+
+def _incrementar(clave, cantidad):
+    granularidad, periodo, barrera_id, departamento_id, tipo = clave
+    filtro = {
+        'granularidad': granularidad, 'periodo': periodo, 'barrera_id': barrera_id,
+        'departamento_id': departamento_id, 'tipo': tipo,
+    }
+    if EstadisticaAcceso.objects.filter(**filtro).update(total=F('total') + cantidad):
+        return
+    try:
+        with transaction.atomic():
+            EstadisticaAcceso.objects.create(total=cantidad, **filtro)
+    except IntegrityError:
+        # Otro proceso creó la fila entre el UPDATE y el INSERT
+        EstadisticaAcceso.objects.filter(**filtro).update(total=F('total') + cantidad)
+
+
+def acumular(eventos):
+    """
+    Incrementa los contadores con eventos recién persistidos (diccionarios de campos)
+    Las filas con barrera o departamento nulos pueden quedar duplicadas bajo concurrencia,
+    por eso las consultas siempre suman `total`
+    """
+    if not eventos or not getattr(settings, 'ESTADISTICAS_HABILITADAS', True):
+        return
+    por_barrera, por_sensor = _resolver_departamentos(eventos)
+    filas = []
+    for campos in eventos:
+        barrera_id = campos.get('barrera_id')
+        if barrera_id:
+            departamento_id = por_barrera.get(barrera_id)
+        else:
+            departamento_id = por_sensor.get(campos.get('sensor_id'))
+        filas.append((campos['timestamp'], campos['tipo'], barrera_id, departamento_id))
+
+    with transaction.atomic():
+        for clave, cantidad in sorted(_contar(filas).items(), key=_orden_clave):
+            _incrementar(clave, cantidad)
+
+
+def _orden_clave(item):
+    # Orden estable de actualización para reducir bloqueos cruzados entre procesos
+    granularidad, periodo, barrera_id, departamento_id, tipo = item[0]
+    return (granularidad, periodo, barrera_id or 0, departamento_id or 0, tipo)
+
+
+def reasignar_barrera(barrera_id):
+    """
+    Al eliminar una barrera sus eventos quedan sin barrera (SET_NULL) y reconstruir() los
+    cuenta con el departamento del sensor: se mueven sus contadores de la misma forma
+    Los contadores anteriores al primer evento que queda (meses archivados) solo pierden la
+    barrera (SET_NULL en EstadisticaAcceso) y conservan el departamento
+    """
+    eventos = Evento.objects.filter(barrera_id=barrera_id).order_by()
+    primero = eventos.aggregate(primero=Min('timestamp'))['primero']
+    if primero is None:
+        return
+    inicio = timezone.make_aware(datetime.combine(timezone.localtime(primero).date(), time.min))
+    contadores = _contar(
+        (timestamp, tipo, None, departamento_id)
+        for timestamp, tipo, departamento_id in eventos.values_list(
+            'timestamp', 'tipo', 'sensor__departamento_id').iterator()
+    )
+    with transaction.atomic():
+        EstadisticaAcceso.objects.filter(barrera_id=barrera_id, periodo__gte=inicio).delete()
+        for clave, cantidad in sorted(contadores.items(), key=_orden_clave):
+            _incrementar(clave, cantidad)
+
+
+def reasignar_departamento(departamento_id):
+    """
+    Al eliminar un departamento sus sensores quedan sin departamento (SET_NULL) y reconstruir()
+    cuenta sus eventos sin departamento: se suman sus contadores a las filas sin departamento
+    Sus barreras se eliminan antes (CASCADE) y sus contadores ya pasaron por reasignar_barrera
+    """
+    with transaction.atomic():
+        filas = EstadisticaAcceso.objects.filter(departamento_id=departamento_id).order_by()
+        contadores = Counter()
+        for granularidad, periodo, barrera_id, tipo, total in filas.values_list(
+                'granularidad', 'periodo', 'barrera_id', 'tipo', 'total'):
+            contadores[(granularidad, periodo, barrera_id, None, tipo)] += total
+        filas.delete()
+        for clave, cantidad in sorted(contadores.items(), key=_orden_clave):
+            _incrementar(clave, cantidad)
+
+
+def reconstruir(desde=None, tamano_lote=5000):
+    """
+    Recalcula las estadísticas desde la tabla Evento (todas, o desde una fecha local)
+    Retorna la cantidad de eventos procesados
+    """
+    eventos = Evento.objects.all()
+    estadisticas = EstadisticaAcceso.objects.all()
+    if desde is not None:
+        inicio = timezone.make_aware(datetime.combine(desde, time.min))
+        eventos = eventos.filter(timestamp__gte=inicio)
+        estadisticas = estadisticas.filter(periodo__gte=inicio)
+
+    eventos = eventos.order_by('timestamp', 'id').values_list(
+        'id', 'timestamp', 'tipo', 'barrera_id', 'barrera__departamento_id', 'sensor__departamento_id'
+    )
+    contadores = Counter()
+    procesados = 0
+    ultimo = None
+    while True:
+        lote = eventos
+        if ultimo is not None:
+            lote = lote.filter(Q(timestamp__gt=ultimo[0]) | Q(timestamp=ultimo[0], id__gt=ultimo[1]))
+        filas = list(lote[:tamano_lote])
+        contadores.update(_contar(
+            (timestamp, tipo, barrera_id, dep_barrera if barrera_id else dep_sensor)
+            for _, timestamp, tipo, barrera_id, dep_barrera, dep_sensor in filas
+        ))
+        procesados += len(filas)
+        if len(filas) < tamano_lote:
+            break
+        ultimo = (filas[-1][1], filas[-1][0])
+
+    with transaction.atomic():
+        estadisticas.delete()
+        EstadisticaAcceso.objects.bulk_create([
+            EstadisticaAcceso(
+                granularidad=granularidad, periodo=periodo, barrera_id=barrera_id,
+                departamento_id=departamento_id, tipo=tipo, total=total,
+            )
+            for (granularidad, periodo, barrera_id, departamento_id, tipo), total in contadores.items()
+        ], batch_size=1000)
+    return procesados
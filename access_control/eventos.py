@@ -0,0 +1,339 @@
+"""
+Registro de eventos de acceso
+
+Modos (setting EVENTOS_MODO):
+- 'sincrono': cada evento se inserta dentro de la petición (por defecto, usado en pruebas)
+- 'diferido': los eventos se encolan en memoria y un hilo en segundo plano los inserta
+  con bulk_create por lotes (por tamaño o por tiempo). Cada evento encolado se escribe
+  antes en un archivo spool local, para no perderlo si el proceso termina abruptamente.
+"""
+import atexit
+import itertools
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .estadisticas import acumular
+from .metricas import escritura_eventos, eventos_escritos, medir
+from .models import Evento
+from .notificaciones import notificar_eventos
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo de archivos, la recuperación es manual
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MODO_SINCRONO = 'sincrono'
+MODO_DIFERIDO = 'diferido'
+
+
+def registrar_evento(**campos):
+    """
+    Registra un Evento con los campos indicados (usar *_id para las relaciones)
+    En modo diferido retorna None, ya que el evento se inserta más tarde
+    """
+    campos.setdefault('timestamp', timezone.now())
+    if getattr(settings, 'EVENTOS_MODO', MODO_SINCRONO) == MODO_DIFERIDO:
+        with medir(escritura_eventos, 'encolar'):
+            obtener_escritor().encolar(campos)
+        return None
+    with medir(escritura_eventos, 'insert'):
+        evento = Evento.objects.create(**campos)
+    eventos_escritos.incrementar('insert')
+    _despues_de_confirmar([campos])
+    return evento
+
+
+async def aregistrar_evento(**campos):
+    """Versión asíncrona de registrar_evento() para las vistas async (ver async_views.py)"""
+    campos.setdefault('timestamp', timezone.now())
+    if getattr(settings, 'EVENTOS_MODO', MODO_SINCRONO) == MODO_DIFERIDO:
+        escritor = obtener_escritor()
+        with medir(escritura_eventos, 'encolar'):
+            if escritor.fsync:
+                # fsync bloquea hasta que el disco confirma: no hacerlo en el event loop
+                await sync_to_async(escritor.encolar, thread_sensitive=False)(campos)
+            else:
+                escritor.encolar(campos)
+        return None
+    with medir(escritura_eventos, 'insert'):
+        evento = await Evento.objects.acreate(**campos)
+    eventos_escritos.incrementar('insert')
+    # Las estadísticas usan transacciones, que solo están disponibles en código síncrono
+    await sync_to_async(_despues_de_confirmar)([campos])
+    return evento
+
+
+def registrar_eventos(registros):
+    """
+    Registra varios eventos con un solo INSERT (bulk_create)
+    En modo diferido se encolan y retorna una lista vacía
+    """
+    for campos in registros:
+        campos.setdefault('timestamp', timezone.now())
+    if getattr(settings, 'EVENTOS_MODO', MODO_SINCRONO) == MODO_DIFERIDO:
+        escritor = obtener_escritor()
+        for campos in registros:
+            escritor.encolar(campos)
+        return []
+    with medir(escritura_eventos, 'bulk_create'):
+        eventos = Evento.objects.bulk_create([Evento(**campos) for campos in registros])
+    eventos_escritos.incrementar('bulk_create', cantidad=len(eventos))
+    _despues_de_confirmar(registros)
+    return eventos
+
+
+def _despues_de_confirmar(registros):
+    """
+    En modo síncrono las estadísticas y notificaciones se ejecutan al confirmar la transacción
+    del evento: no alargan ni revierten la escritura del evento, y no cuentan eventos revertidos
+    """
+    transaction.on_commit(lambda: _despues_de_guardar(registros))
+
+
+def _despues_de_guardar(registros):
+    """
+    Acciones derivadas de eventos ya persistidos (estadísticas pre-agregadas y notificaciones)
+    Un error aquí no debe afectar el registro del evento: se registra en el log y las
+    estadísticas se pueden reconstruir con `manage.py reconstruir_estadisticas`
+    """
+    try:
+        acumular(registros)
+    except Exception:
+        logger.exception('No se pudieron actualizar las estadísticas de %s eventos', len(registros))
+    try:
+        notificar_eventos(registros)
+    except Exception:
+        logger.exception('No se pudieron notificar %s eventos', len(registros))
+
+
+def _serializar(campos):
+    registro = dict(campos)
+    registro['timestamp'] = registro['timestamp'].isoformat()
+    return json.dumps(registro, ensure_ascii=False)
+
+
+def _deserializar(linea):
+    campos = json.loads(linea)
+    campos['timestamp'] = parse_datetime(campos['timestamp'])
+    return campos
+
+
+def _bloquear(archivo):
+    """Intenta tomar un bloqueo exclusivo del archivo sin esperar"""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+def recuperar_spool(directorio, tamano_lote=500):
+    """
+    Inserta los eventos de archivos spool huérfanos (de procesos terminados) y los elimina
+    Los archivos aún en uso por otro proceso están bloqueados y se omiten
+    Retorna la cantidad de eventos recuperados
+    """
+    recuperados = 0
+    for ruta in sorted(Path(directorio).glob('eventos-*.jsonl')):
+        with open(ruta, 'r+', encoding='utf-8') as archivo:
+            if not _bloquear(archivo):
+                continue
+            registros = [_deserializar(linea) for linea in archivo if linea.strip()]
+            if registros:
+                Evento.objects.bulk_create(
+                    [Evento(**campos) for campos in registros], batch_size=tamano_lote
+                )
+                _despues_de_guardar(registros)
+            recuperados += len(registros)
+        ruta.unlink()
+    if recuperados:
+        logger.warning('Recuperados %s eventos desde el spool %s', recuperados, directorio)
+    return recuperados
+
+
+class EscritorEventos:
+    """
+    Cola de escritura diferida de eventos (write-behind)
+    Los eventos pendientes se respaldan en segmentos spool: al tomar un lote se rota el
+    segmento actual, y los segmentos se eliminan solo después de un bulk_create exitoso
+    La entrega es "al menos una vez": una caída entre el INSERT y el borrado del
+    segmento puede duplicar ese lote al recuperarlo
+    """
+    def __init__(self, directorio, tamano_lote=500, intervalo=1.0, fsync=False):
+        self.directorio = Path(directorio)
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo
+        self.fsync = fsync
+        self._pendientes = []
+        self._segmento = None
+        self._segmentos_llenos = []
+        self._numeracion = itertools.count()
+        self._cond = threading.Condition()
+        self._hilo = None
+        self._pid = None
+        self._detener = False
+        self._forzar = False
+        self._escribiendo = False
+
+    def encolar(self, campos):
+        """Agrega un evento a la cola y lo respalda en el spool"""
+        with self._cond:
+            self._asegurar_hilo()
+            linea = _serializar(campos) + '\n'
+            self._segmento.write(linea)
+            self._segmento.flush()
+            if self.fsync:
+                os.fsync(self._segmento.fileno())
+            self._pendientes.append(campos)
+            if len(self._pendientes) >= self.tamano_lote:
+                self._cond.notify()
+
+    def vaciar(self, timeout=None):
+        """Fuerza la escritura de los eventos pendientes y espera a que termine"""
+        with self._cond:
+            if self._hilo is None:
+                return
+            self._forzar = True
+            self._cond.notify_all()
+            self._cond.wait_for(
+                lambda: not self._pendientes and not self._escribiendo, timeout=timeout
+            )
+
+    def detener(self, timeout=5.0):
+        """Escribe los pendientes y detiene el hilo (registrado con atexit)"""
+        with self._cond:
+            if self._hilo is None:
+                return
+            self._detener = True
+            self._cond.notify_all()
+            hilo = self._hilo
+        hilo.join(timeout)
+
+    def _asegurar_hilo(self):
+        # Tras un fork (p. ej. gunicorn --preload) el hilo no existe en el proceso hijo
+        if self._hilo is not None and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._pendientes = []
+        self._segmentos_llenos = []
+        self._detener = False
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self._segmento = self._nuevo_segmento()
+        self._hilo = threading.Thread(target=self._ejecutar, name='escritor-eventos', daemon=True)
+        self._hilo.start()
+
+    def _nuevo_segmento(self):
+        ruta = self.directorio / f'eventos-{self._pid}-{next(self._numeracion)}.jsonl'
+        segmento = open(ruta, 'a', encoding='utf-8')
+        _bloquear(segmento)
+        return segmento
+
+    def _ejecutar(self):
+        # Sin bloqueo de archivos no se distingue un spool huérfano de uno en uso
+        if fcntl is not None:
+            try:
+                recuperar_spool(self.directorio, self.tamano_lote)
+            except Exception:
+                logger.exception('No se pudo recuperar el spool de eventos')
+
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: len(self._pendientes) >= self.tamano_lote or self._detener or self._forzar,
+                    timeout=self.intervalo,
+                )
+                self._forzar = False
+                if not self._pendientes:
+                    self._cond.notify_all()
+                    if self._detener:
+                        self._segmento.close()
+                        os.unlink(self._segmento.name)
+                        break
+                    continue
+                lote, self._pendientes = self._pendientes, []
+                self._segmentos_llenos.append(self._segmento)
+                self._segmento = self._nuevo_segmento()
+                segmentos, self._segmentos_llenos = self._segmentos_llenos, []
+                self._escribiendo = True
+
+            try:
+                escrito = self._escribir(lote)
+            except Exception:
+                logger.exception('Error inesperado al escribir eventos; se reintentará')
+                escrito = False
+            if escrito:
+                for segmento in segmentos:
+                    segmento.close()
+                    os.unlink(segmento.name)
+                with self._cond:
+                    self._escribiendo = False
+                    self._cond.notify_all()
+            else:
+                # Devolver el lote a la cola; los segmentos se conservan hasta el próximo intento
+                with self._cond:
+                    self._pendientes = lote + self._pendientes
+                    self._segmentos_llenos = segmentos + self._segmentos_llenos
+                    self._escribiendo = False
+                    self._cond.wait(self.intervalo)
+
+        close_old_connections()
+
+    def _escribir(self, lote):
+        try:
+            with medir(escritura_eventos, 'lote_diferido'):
+                Evento.objects.bulk_create(
+                    [Evento(**campos) for campos in lote], batch_size=self.tamano_lote
+                )
+        except IntegrityError:
+            # Un registro inválido (p. ej. un sensor eliminado) no debe bloquear el lote completo
+            logger.warning('Lote de eventos con errores de integridad; se inserta fila por fila')
+            guardados = []
+            for campos in lote:
+                try:
+                    Evento.objects.create(**campos)
+                except IntegrityError:
+                    logger.error('Evento descartado por error de integridad: %s', campos)
+                else:
+                    guardados.append(campos)
+            eventos_escritos.incrementar('lote_diferido', cantidad=len(guardados))
+            _despues_de_guardar(guardados)
+        except Exception:
+            logger.exception('Error al insertar un lote de %s eventos; se reintentará', len(lote))
+            close_old_connections()
+            return False
+        else:
+            eventos_escritos.incrementar('lote_diferido', cantidad=len(lote))
+            _despues_de_guardar(lote)
+        return True
+
+
+_escritor = None
+_escritor_lock = threading.Lock()
+
+
+def obtener_escritor():
+    """Retorna el escritor diferido del proceso, creándolo según la configuración"""
+    global _escritor
+    with _escritor_lock:
+        if _escritor is None:
+            _escritor = EscritorEventos(
+                directorio=getattr(settings, 'EVENTOS_SPOOL_DIR', settings.BASE_DIR / 'spool'),
+                tamano_lote=getattr(settings, 'EVENTOS_LOTE_TAMANO', 500),
+                intervalo=getattr(settings, 'EVENTOS_LOTE_INTERVALO', 1.0),
+                fsync=getattr(settings, 'EVENTOS_SPOOL_FSYNC', False),
+            )
+            atexit.register(_escritor.detener)
+        return _escritor
@@ -0,0 +1,78 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+
+# Columnas exportadas: (nombre de la columna, campo de values_list)
+COLUMNAS_EVENTO = (
+    ('id', 'id'),
+    ('timestamp', 'timestamp'),
+    ('tipo', 'tipo'),
+    ('sensor', 'sensor_id'),
+    ('sensor_nombre', 'sensor__nombre'),
+    ('barrera', 'barrera_id'),
+    ('barrera_nombre', 'barrera__nombre'),
+    ('usuario_responsable', 'usuario_responsable_id'),
+    ('usuario_nombre', 'usuario_responsable__username'),
+    ('motivo_denegacion', 'motivo_denegacion'),
+    ('descripcion', 'descripcion'),
+)
+
+FORMATOS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+
+def filas_eventos(queryset, tamano_lote=2000):
+    """
+    Recorre los eventos como tuplas (values_list), en orden cronológico, por lotes
+    Cada lote continúa desde la última clave (timestamp, id) leída, por lo que la memoria
+    se mantiene constante también en MySQL, donde .iterator() no usa cursores del servidor
+    """
+    campos = [campo for _, campo in COLUMNAS_EVENTO]
+    queryset = queryset.order_by('timestamp', 'id').values_list(*campos)
+    ultimo = None
+    while True:
+        lote = queryset
+        if ultimo is not None:
+            timestamp, pk = ultimo
+            lote = lote.filter(Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=pk))
+        filas = list(lote[:tamano_lote])
+        for fila in filas:
+            # La hora se exporta en la zona horaria local, igual que en la API
+            yield fila[:1] + (timezone.localtime(fila[1]),) + fila[2:]
+        if len(filas) < tamano_lote:
+            return
+        ultimo = (filas[-1][1], filas[-1][0])
+
+
+class _Eco:
+    """Pseudo-buffer para csv.writer: retorna cada línea en lugar de almacenarla"""
+
+    def write(self, valor):
+        return valor
+
+
+def generar_csv(filas):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow([nombre for nombre, _ in COLUMNAS_EVENTO])
+    for fila in filas:
+        yield escritor.writerow(
+            [valor.isoformat() if hasattr(valor, 'isoformat') else valor for valor in fila]
+        )
+
+
+def generar_ndjson(filas):
+    nombres = [nombre for nombre, _ in COLUMNAS_EVENTO]
+    for fila in filas:
+        yield json.dumps(dict(zip(nombres, fila)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def generar_exportacion(formato, filas):
+    """Retorna el generador de líneas para el formato indicado ('csv' o 'ndjson')"""
+    if formato == 'ndjson':
+        return generar_ndjson(filas)
+    return generar_csv(filas)
@@ -0,0 +1,122 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .models import Evento, EstadisticaAcceso
+
+
+def parse_id(nombre, valor):
+    try:
+        return int(valor)
+    except ValueError:
+        raise ValidationError({nombre: 'Debe ser un ID numérico'})
+
+
+def parse_fecha(nombre, valor):
+    """
+    Acepta fecha-hora ISO 8601 o solo fecha (YYYY-MM-DD)
+    Retorna (fecha_hora, solo_fecha); con solo fecha, la hora es el inicio del día
+    """
+    try:
+        fecha = parse_date(valor)
+        solo_fecha = fecha is not None
+        if solo_fecha:
+            fecha_hora = datetime.combine(fecha, time.min)
+        else:
+            fecha_hora = parse_datetime(valor)
+            if fecha_hora is None:
+                raise ValueError
+    except ValueError:
+        raise ValidationError({nombre: 'Formato de fecha inválido, usar YYYY-MM-DD o ISO 8601'})
+    if timezone.is_naive(fecha_hora):
+        fecha_hora = timezone.make_aware(fecha_hora)
+    return fecha_hora, solo_fecha
+
+
+def filtrar_eventos(queryset, params):
+    """
+    Aplica los filtros de eventos desde los parámetros de consulta:
+    tipo (uno o varios separados por coma), sensor, barrera, usuario_responsable,
+    desde y hasta (rango de timestamp)
+    Cada filtro está respaldado por un índice compuesto (campo, timestamp) en Evento
+    """
+    tipo = params.get('tipo')
+    if tipo:
+        tipos = tipo.split(',')
+        invalidos = set(tipos) - set(Evento.TipoEvento.values)
+        if invalidos:
+            raise ValidationError({'tipo': f'Tipo de evento inválido: {", ".join(sorted(invalidos))}'})
+        queryset = queryset.filter(tipo__in=tipos) if len(tipos) > 1 else queryset.filter(tipo=tipo)
+
+    for campo in ('sensor', 'barrera', 'usuario_responsable'):
+        valor = params.get(campo)
+        if valor:
+            queryset = queryset.filter(**{f'{campo}_id': parse_id(campo, valor)})
+
+    desde = params.get('desde')
+    if desde:
+        queryset = queryset.filter(timestamp__gte=parse_fecha('desde', desde)[0])
+
+    hasta = params.get('hasta')
+    if hasta:
+        fecha_hora, solo_fecha = parse_fecha('hasta', hasta)
+        if solo_fecha:
+            # Incluir el día completo
+            queryset = queryset.filter(timestamp__lt=fecha_hora + timedelta(days=1))
+        else:
+            queryset = queryset.filter(timestamp__lte=fecha_hora)
+
+    return queryset
+
+
+class EventoFilterBackend(BaseFilterBackend):
+    """Filtro de DRF para el listado de eventos (ver filtrar_eventos)"""
+
+    def filter_queryset(self, request, queryset, view):
+        return filtrar_eventos(queryset, request.query_params)
+
+
+def filtrar_estadisticas(queryset, params, granularidad=EstadisticaAcceso.Granularidad.HORA):
+    """
+    Filtros de estadísticas: granularidad (HORA o DIA), barrera, departamento, tipo,
+    desde y hasta (sobre el inicio del período)
+    """
+    granularidad = params.get('granularidad', granularidad)
+    if granularidad not in EstadisticaAcceso.Granularidad.values:
+        raise ValidationError({'granularidad': 'Debe ser HORA o DIA'})
+    queryset = queryset.filter(granularidad=granularidad)
+
+    tipo = params.get('tipo')
+    if tipo:
+        if tipo not in Evento.TipoEvento.values:
+            raise ValidationError({'tipo': f'Tipo de evento inválido: {tipo}'})
+        queryset = queryset.filter(tipo=tipo)
+
+    for campo in ('barrera', 'departamento'):
+        valor = params.get(campo)
+        if valor:
+            queryset = queryset.filter(**{f'{campo}_id': parse_id(campo, valor)})
+
+    desde = params.get('desde')
+    if desde:
+        queryset = queryset.filter(periodo__gte=parse_fecha('desde', desde)[0])
+
+    hasta = params.get('hasta')
+    if hasta:
+        fecha_hora, solo_fecha = parse_fecha('hasta', hasta)
+        if solo_fecha:
+            queryset = queryset.filter(periodo__lt=fecha_hora + timedelta(days=1))
+        else:
+            queryset = queryset.filter(periodo__lte=fecha_hora)
+
+    return queryset
+
+
+class EstadisticaFilterBackend(BaseFilterBackend):
+    """Filtro de DRF para el listado de estadísticas (ver filtrar_estadisticas)"""
+
+    def filter_queryset(self, request, queryset, view):
+        return filtrar_estadisticas(queryset, request.query_params)
@@ -0,0 +1,240 @@
+"""
+Importación masiva de sensores desde CSV o XLSX (ver /api/sensores/importar/ y
+`manage.py importar_sensores`)
+
+Las filas se leen en streaming y se procesan por lotes: por cada lote, una consulta
+uid_mac__in detecta los UID/MAC ya registrados, los departamentos y usuarios se resuelven
+por nombre con una consulta por lote (solo los nombres no vistos antes) y las filas válidas
+se insertan con bulk_create. Las filas inválidas no detienen la importación: se informan
+con su número de fila en el reporte. Un archivo que no se puede leer (CSV que no está en
+UTF-8, XLSX dañado) responde 400; si el error aparece a mitad del archivo, los lotes
+anteriores ya quedaron insertados.
+"""
+import csv
+import io
+import zipfile
+from xml.etree import ElementTree
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+from rest_framework.exceptions import ValidationError
+
+from .cache import cache_credenciales
+from .deduplicacion import deduplicador
+from .models import Departamento, Sensor, Usuario
+
+COLUMNAS = ('uid_mac', 'nombre', 'estado', 'departamento', 'usuario', 'descripcion')
+COLUMNAS_REQUERIDAS = ('uid_mac', 'nombre')
+FORMATOS = ('csv', 'xlsx')
+
+
+def detectar_formato(nombre_archivo, formato=None):
+    formato = (formato or nombre_archivo.rsplit('.', 1)[-1]).lower()
+    if formato not in FORMATOS:
+        raise ValidationError({'formato': f'Formato no soportado (usar {" o ".join(FORMATOS)})'})
+    return formato
+
+
+def _encabezado(valores):
+    encabezado = [str(valor or '').strip().lower() for valor in valores]
+    faltantes = [columna for columna in COLUMNAS_REQUERIDAS if columna not in encabezado]
+    if faltantes:
+        raise ValidationError({'archivo': f'Faltan las columnas: {", ".join(faltantes)}'})
+    return encabezado
+
+
+def _fila(encabezado, valores):
+    return {
+        columna: str(valor).strip() if valor is not None else ''
+        for columna, valor in zip(encabezado, valores) if columna in COLUMNAS
+    }
+
+
+def _filas_csv(archivo):
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    try:
+        lector = csv.reader(texto)
+        encabezado = _encabezado(next(lector, []))
+        for numero, valores in enumerate(lector, start=2):
+            if any(valores):
+                yield numero, _fila(encabezado, valores)
+    except UnicodeDecodeError:
+        # Típico de los CSV exportados desde Excel en Latin-1/cp1252
+        raise ValidationError({'archivo': 'El archivo CSV debe estar codificado en UTF-8 (en Excel: "CSV UTF-8")'})
+    except csv.Error as exc:
+        raise ValidationError({'archivo': f'CSV inválido: {exc}'})
+    finally:
+        # No cerrar el archivo subido junto con el TextIOWrapper
+        texto.detach()
+
+
+def _filas_xlsx(archivo):
+    # openpyxl solo se necesita al importar planillas
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    # Archivo que no es un XLSX (renombrado, truncado o dañado); con read_only el contenido
+    # se descomprime y se lee al recorrer las filas
+    errores = (zipfile.BadZipFile, InvalidFileException, KeyError, ElementTree.ParseError, EOFError)
+    try:
+        libro = load_workbook(archivo, read_only=True, data_only=True)
+    except errores:
+        raise ValidationError({'archivo': 'El archivo no es un XLSX válido'})
+    try:
+        filas = libro.active.iter_rows(values_only=True)
+        encabezado = _encabezado(next(filas, ()))
+        for numero, valores in enumerate(filas, start=2):
+            if any(valor not in (None, '') for valor in valores):
+                yield numero, _fila(encabezado, valores)
+    except errores:
+        raise ValidationError({'archivo': 'El archivo no es un XLSX válido'})
+    finally:
+        libro.close()
+
+
+def leer_filas(archivo, formato):
+    """Filas del archivo como (número de fila, {columna: texto}); la fila 1 es el encabezado"""
+    if formato == 'xlsx':
+        return _filas_xlsx(archivo)
+    return _filas_csv(archivo)
+
+
+def _por_lotes(filas, tamano_lote):
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= tamano_lote:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+class ImportadorSensores:
+    """Valida e inserta sensores por lotes; acumula el reporte de la importación"""
+
+    def __init__(self, tamano_lote=1000, simular=False):
+        self.tamano_lote = tamano_lote
+        self.simular = simular
+        self.filas = 0
+        self.creados = 0
+        self.errores = []
+        self._uids_vistos = set()
+        self._departamentos = {}
+        self._usuarios = {}
+
+    def importar(self, filas):
+        for lote in _por_lotes(filas, self.tamano_lote):
+            self._procesar(lote)
+        if self.creados:
+            # bulk_create no envía señales: invalidar a mano lo que hacen los receptores de Sensor
+            cache_credenciales.limpiar()
+            deduplicador.limpiar()
+        return self.reporte()
+
+    def reporte(self):
+        return {
+            'filas': self.filas,
+            'creados': self.creados,
+            'con_errores': len(self.errores),
+            'simulacion': self.simular,
+            'errores': self.errores,
+        }
+
+    def _procesar(self, lote):
+        self.filas += len(lote)
+        uids = {datos.get('uid_mac') for _, datos in lote} - {''}
+        existentes = set(
+            Sensor.objects.filter(uid_mac__in=uids).order_by().values_list('uid_mac', flat=True)
+        )
+        self._resolver(self._departamentos, Departamento, 'nombre', lote, 'departamento')
+        self._resolver(self._usuarios, Usuario, 'username', lote, 'usuario')
+
+        validos = []
+        for numero, datos in lote:
+            sensor, errores = self._construir(datos, existentes)
+            if errores:
+                self.errores.append({'fila': numero, 'uid_mac': datos.get('uid_mac', ''), 'errores': errores})
+            else:
+                validos.append((numero, sensor))
+
+        if validos and not self.simular:
+            self._insertar(validos)
+        elif validos:
+            self.creados += len(validos)
+
+    def _resolver(self, conocidos, modelo, campo, lote, columna):
+        """Agrega a `conocidos` {nombre: id} los nombres del lote aún no consultados"""
+        nombres = {datos.get(columna) for _, datos in lote} - {'', None} - conocidos.keys()
+        if not nombres:
+            return
+        encontrados = dict(
+            modelo.objects.filter(**{f'{campo}__in': nombres}).order_by().values_list(campo, 'id')
+        )
+        for nombre in nombres:
+            conocidos[nombre] = encontrados.get(nombre)
+
+    def _construir(self, datos, existentes):
+        """Retorna (Sensor sin guardar, errores por campo)"""
+        errores = {}
+        uid_mac = datos.get('uid_mac', '')
+        if uid_mac in existentes:
+            errores['uid_mac'] = 'Ya existe un sensor con este UID/MAC'
+        elif uid_mac and uid_mac in self._uids_vistos:
+            errores['uid_mac'] = 'UID/MAC repetido en el archivo'
+
+        estado = datos.get('estado', '').upper() or Sensor.Estado.ACTIVO
+        if estado not in Sensor.Estado.values:
+            errores['estado'] = f'Estado inválido: {datos["estado"]}'
+
+        sensor = Sensor(
+            uid_mac=uid_mac, nombre=datos.get('nombre', ''), estado=estado,
+            descripcion=datos.get('descripcion', ''),
+        )
+        for columna, conocidos in (('departamento', self._departamentos), ('usuario', self._usuarios)):
+            nombre = datos.get(columna)
+            if not nombre:
+                continue
+            if conocidos.get(nombre) is None:
+                errores[columna] = f'No existe: {nombre}'
+            else:
+                setattr(sensor, f'{columna}_id', conocidos[nombre])
+
+        try:
+            # Largo, mínimo de caracteres y obligatorios; la unicidad ya se validó por lote
+            sensor.full_clean(exclude=['departamento', 'usuario'], validate_unique=False)
+        except DjangoValidationError as exc:
+            for campo, mensajes in exc.message_dict.items():
+                errores.setdefault(campo, ' '.join(mensajes))
+
+        if not errores:
+            self._uids_vistos.add(uid_mac)
+        return sensor, errores
+
+    def _insertar(self, validos):
+        sensores = [sensor for _, sensor in validos]
+        try:
+            with transaction.atomic():
+                Sensor.objects.bulk_create(sensores)
+            self.creados += len(sensores)
+        except IntegrityError:
+            # Otro proceso registró alguno de los UID/MAC después de validar: fila por fila
+            for numero, sensor in validos:
+                try:
+                    with transaction.atomic():
+                        sensor.save()
+                except IntegrityError:
+                    self.errores.append({
+                        'fila': numero, 'uid_mac': sensor.uid_mac,
+                        'errores': {'uid_mac': 'Ya existe un sensor con este UID/MAC'},
+                    })
+                else:
+                    self.creados += 1
+
+
+def importar_sensores(archivo, formato, tamano_lote=1000, simular=False):
+    """Importa los sensores del archivo y retorna el reporte (ver ImportadorSensores.reporte)"""
+    importador = ImportadorSensores(tamano_lote=tamano_lote, simular=simular)
+    reporte = importador.importar(leer_filas(archivo, formato))
+    reporte['errores'].sort(key=lambda error: error['fila'])
+    return reporte
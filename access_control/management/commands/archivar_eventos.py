@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from access_control.archivo import archivar, fecha_corte
+
+
+class Command(BaseCommand):
+    help = (
+        'Archiva en archivos CSV comprimidos los meses completos de eventos más antiguos que '
+        'EVENTOS_RETENCION_DIAS y los elimina de la tabla de eventos. Pensado para ejecutarse '
+        'periódicamente (p. ej. cron diario); repetirlo no duplica eventos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, help='Días de retención (por defecto, EVENTOS_RETENCION_DIAS)')
+        parser.add_argument('--lote', type=int, default=5000, help='Eventos leídos/eliminados por consulta')
+
+    def handle(self, *args, **options):
+        if options['dias'] is not None and options['dias'] < 0:
+            raise CommandError('--dias debe ser mayor o igual a 0')
+
+        corte = fecha_corte(options['dias'])
+        self.stdout.write(f"Archivando eventos anteriores a {corte:%Y-%m-%d}...")
+        archivos = archivar(dias=options['dias'], tamano_lote=options['lote'])
+        for archivo in archivos:
+            self.stdout.write(f"  {archivo.mes:%Y-%m}: {archivo.cantidad} eventos -> {archivo.ruta}")
+        total = sum(archivo.cantidad for archivo in archivos)
+        self.stdout.write(self.style.SUCCESS(f'✓ {total} eventos archivados en {len(archivos)} archivos'))
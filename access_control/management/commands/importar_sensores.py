@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from access_control.importacion import detectar_formato, importar_sensores
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa sensores desde un archivo CSV o XLSX con las columnas uid_mac, nombre y '
+        'opcionalmente estado, departamento (nombre), usuario (username) y descripcion. '
+        'Las filas inválidas se informan y no detienen la importación.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo CSV o XLSX')
+        parser.add_argument('--formato', choices=['csv', 'xlsx'], help='Por defecto, según la extensión')
+        parser.add_argument('--lote', type=int, default=settings.SENSORES_IMPORTAR_LOTE,
+                            help='Filas validadas e insertadas por lote')
+        parser.add_argument('--simular', action='store_true', help='Solo validar, sin insertar')
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser mayor a 0')
+        try:
+            formato = detectar_formato(options['archivo'], options['formato'])
+            with open(options['archivo'], 'rb') as archivo:
+                reporte = importar_sensores(
+                    archivo, formato, tamano_lote=options['lote'], simular=options['simular']
+                )
+        except OSError as exc:
+            raise CommandError(f'No se pudo leer el archivo: {exc}')
+        except ValidationError as exc:
+            raise CommandError('; '.join(f'{campo}: {mensaje}' for campo, mensaje in exc.detail.items()))
+
+        for error in reporte['errores']:
+            detalle = '; '.join(f'{campo}: {mensaje}' for campo, mensaje in error['errores'].items())
+            self.stdout.write(self.style.WARNING(f"  Fila {error['fila']} ({error['uid_mac']}): {detalle}"))
+        accion = 'válidos (simulación)' if options['simular'] else 'creados'
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {reporte['creados']} sensores {accion} de {reporte['filas']} filas, "
+            f"{reporte['con_errores']} con errores"
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from access_control.estadisticas import reconstruir
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula las estadísticas pre-agregadas (por hora y día) desde la tabla de eventos. '
+        'Ejecutar en un horario de bajo tráfico: los eventos registrados durante la '
+        'reconstrucción del mismo período pueden no quedar contados.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--desde',
+            help='Fecha (YYYY-MM-DD) desde la cual recalcular; por defecto, todo el historial'
+        )
+        parser.add_argument('--lote', type=int, default=5000, help='Eventos leídos por consulta')
+
+    def handle(self, *args, **options):
+        desde = None
+        if options['desde']:
+            desde = parse_date(options['desde'])
+            if desde is None:
+                raise CommandError('Fecha inválida, usar YYYY-MM-DD')
+
+        procesados = reconstruir(desde=desde, tamano_lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'✓ Estadísticas reconstruidas con {procesados} eventos'))
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from access_control.eventos import recuperar_spool
+
+
+class Command(BaseCommand):
+    help = (
+        'Inserta los eventos pendientes de los archivos spool del modo diferido. '
+        'En sistemas sin bloqueo de archivos (Windows) ejecutar con el servicio detenido.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directorio', default=settings.EVENTOS_SPOOL_DIR)
+
+    def handle(self, *args, **options):
+        recuperados = recuperar_spool(options['directorio'], settings.EVENTOS_LOTE_TAMANO)
+        self.stdout.write(self.style.SUCCESS(f'✓ Eventos recuperados: {recuperados}'))
@@ -0,0 +1,321 @@
+"""
+Métricas de la aplicación en formato de texto de Prometheus (ver /metrics)
+
+Los valores se mantienen en memoria de cada proceso: con varios workers, Prometheus debe
+consultar cada uno (o agregarlos con la etiqueta de instancia). La instrumentación es barata
+(un contador o un bisect bajo un lock), por lo que se puede dejar activa en producción.
+"""
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+BUCKETS_DURACION = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatear_etiquetas(nombres, valores, extra=()):
+    pares = [f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores)]
+    pares.extend(f'{nombre}="{valor}"' for nombre, valor in extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _formatear_numero(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Metrica:
+    tipo = None
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def exponer(self):
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} {self.tipo}']
+        with self._lock:
+            valores = sorted(self._copiar().items())
+        for clave, valor in valores:
+            lineas.extend(self._lineas(clave, valor))
+        return lineas
+
+    def limpiar(self):
+        with self._lock:
+            self._valores.clear()
+
+
+class Contador(Metrica):
+    tipo = 'counter'
+
+    def fijar(self, valor, *etiquetas):
+        """Para valores que ya se cuentan en otra parte (p. ej. los contadores de CacheCredenciales)"""
+        with self._lock:
+            self._valores[etiquetas] = valor
+
+    def incrementar(self, *etiquetas, cantidad=1):
+        with self._lock:
+            self._valores[etiquetas] = self._valores.get(etiquetas, 0) + cantidad
+
+    def valor(self, *etiquetas):
+        with self._lock:
+            return self._valores.get(etiquetas, 0)
+
+    def _copiar(self):
+        return dict(self._valores)
+
+    def _lineas(self, clave, valor):
+        yield f'{self.nombre}{_formatear_etiquetas(self.etiquetas, clave)} {_formatear_numero(valor)}'
+
+
+class Indicador(Contador):
+    tipo = 'gauge'
+
+
+class Histograma(Metrica):
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_DURACION):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(buckets)
+
+    def observar(self, valor, *etiquetas):
+        indice = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._valores.get(etiquetas)
+            if serie is None:
+                # [cantidad por bucket (no acumulada, el último es +Inf), suma]
+                serie = self._valores[etiquetas] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += valor
+
+    def cantidad(self, *etiquetas):
+        with self._lock:
+            serie = self._valores.get(etiquetas)
+            return sum(serie[0]) if serie else 0
+
+    def _copiar(self):
+        return {clave: (list(conteos), suma) for clave, (conteos, suma) in self._valores.items()}
+
+    def _lineas(self, clave, valor):
+        conteos, suma = valor
+        acumulado = 0
+        for limite, conteo in zip(self.buckets + (float('inf'),), conteos):
+            acumulado += conteo
+            etiquetas = _formatear_etiquetas(self.etiquetas, clave, [('le', _formatear_numero(limite))])
+            yield f'{self.nombre}_bucket{etiquetas} {acumulado}'
+        etiquetas = _formatear_etiquetas(self.etiquetas, clave)
+        yield f'{self.nombre}_sum{etiquetas} {_formatear_numero(suma)}'
+        yield f'{self.nombre}_count{etiquetas} {acumulado}'
+
+
+class Registro:
+    """Métricas de la aplicación y funciones que las actualizan al momento de exponerlas"""
+
+    def __init__(self):
+        self._metricas = []
+        self._actualizaciones = []
+
+    def contador(self, nombre, ayuda, etiquetas=()):
+        return self._agregar(Contador(nombre, ayuda, etiquetas))
+
+    def indicador(self, nombre, ayuda, etiquetas=()):
+        return self._agregar(Indicador(nombre, ayuda, etiquetas))
+
+    def histograma(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_DURACION):
+        return self._agregar(Histograma(nombre, ayuda, etiquetas, buckets))
+
+    def al_exponer(self, funcion):
+        """Registra una función que actualiza métricas antes de exponerlas (decorador)"""
+        self._actualizaciones.append(funcion)
+        return funcion
+
+    def exponer(self):
+        for actualizar in self._actualizaciones:
+            actualizar()
+        lineas = []
+        for metrica in self._metricas:
+            lineas.extend(metrica.exponer())
+        return '\n'.join(lineas) + '\n'
+
+    def limpiar(self):
+        for metrica in self._metricas:
+            metrica.limpiar()
+
+    def _agregar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+
+registro = Registro()
+
+peticiones = registro.contador(
+    'smartconnect_peticiones_total', 'Peticiones HTTP por vista, método y código de estado',
+    ('vista', 'metodo', 'codigo')
+)
+duracion_peticiones = registro.histograma(
+    'smartconnect_peticion_duracion_segundos', 'Duración de las peticiones HTTP por vista', ('vista',)
+)
+consultas_peticion = registro.histograma(
+    'smartconnect_peticion_consultas', 'Consultas SQL por petición', ('vista',), BUCKETS_CONSULTAS
+)
+duracion_consultas = registro.histograma(
+    'smartconnect_peticion_consultas_duracion_segundos',
+    'Tiempo total en consultas SQL por petición', ('vista',)
+)
+decisiones_acceso = registro.contador(
+    'smartconnect_decisiones_acceso_total', 'Decisiones de verificar acceso por resultado', ('resultado',)
+)
+lecturas_suprimidas = registro.contador(
+    'smartconnect_lecturas_suprimidas_total',
+    'Lecturas repetidas respondidas desde la ventana de de-duplicación'
+)
+cache_aciertos = registro.contador(
+    'smartconnect_cache_aciertos_total', 'Aciertos de cachés de la aplicación', ('cache',)
+)
+cache_fallos = registro.contador(
+    'smartconnect_cache_fallos_total', 'Fallos de cachés de la aplicación', ('cache',)
+)
+cache_entradas = registro.indicador(
+    'smartconnect_cache_entradas', 'Entradas en cachés en memoria de la aplicación', ('cache',)
+)
+escritura_eventos = registro.histograma(
+    'smartconnect_eventos_escritura_segundos',
+    'Duración de la escritura de eventos (INSERT, bulk_create, encolado o lote diferido)',
+    ('operacion',)
+)
+eventos_escritos = registro.contador(
+    'smartconnect_eventos_escritos_total', 'Eventos escritos por operación', ('operacion',)
+)
+db_pool_espera = registro.histograma(
+    'smartconnect_db_pool_espera_segundos', 'Espera para obtener una conexión del pool', ('alias',)
+)
+db_pool_agotado = registro.contador(
+    'smartconnect_db_pool_agotado_total', 'Conexiones no obtenidas por pool agotado', ('alias',)
+)
+db_pool_conexiones = registro.indicador(
+    'smartconnect_db_pool_conexiones', 'Conexiones del pool abiertas y libres', ('alias', 'estado')
+)
+
+
+@registro.al_exponer
+def _cache_credenciales():
+    # Importación local: cache.py importa los modelos
+    from .cache import cache_credenciales
+
+    estadisticas = cache_credenciales.estadisticas()
+    cache_aciertos.fijar(estadisticas['hits'], 'credenciales')
+    cache_fallos.fijar(estadisticas['misses'], 'credenciales')
+    cache_entradas.fijar(estadisticas['tamano'], 'credenciales')
+
+
+@registro.al_exponer
+def _pools_conexiones():
+    from .db_pool import pools
+
+    for alias, pool in pools().items():
+        estado = pool.estado()
+        db_pool_conexiones.fijar(estado['abiertas'], alias, 'abiertas')
+        db_pool_conexiones.fijar(estado['libres'], alias, 'libres')
+
+
+class medir:
+    """Context manager que observa la duración del bloque en un histograma"""
+    __slots__ = ('histograma', 'etiquetas', 'inicio')
+
+    def __init__(self, histograma, *etiquetas):
+        self.histograma = histograma
+        self.etiquetas = etiquetas
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histograma.observar(time.perf_counter() - self.inicio, *self.etiquetas)
+
+
+# [cantidad, segundos] de las consultas SQL de la petición en curso (None fuera de una petición)
+# Es una ContextVar para que las consultas hechas desde sync_to_async cuenten en la petición
+_consultas = ContextVar('consultas', default=None)
+
+
+def _medir_consulta(execute, sql, params, many, context):
+    acumulado = _consultas.get()
+    if acumulado is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        acumulado[0] += 1
+        acumulado[1] += time.perf_counter() - inicio
+
+
+def instrumentar_conexion(sender, connection, **kwargs):
+    """Receptor de connection_created (ver apps.py): mide las consultas de cada conexión"""
+    if _medir_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_medir_consulta)
+
+
+class MetricasMiddleware:
+    """
+    Registra peticiones, duración y consultas SQL por vista (nombre de la URL resuelta)
+    Debe ser el primer middleware para medir la petición completa
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICAS_HABILITADAS', True):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        acumulado, token, inicio = self._iniciar()
+        try:
+            response = self.get_response(request)
+        finally:
+            _consultas.reset(token)
+        self._registrar(request, response, acumulado, inicio)
+        return response
+
+    async def __acall__(self, request):
+        acumulado, token, inicio = self._iniciar()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _consultas.reset(token)
+        self._registrar(request, response, acumulado, inicio)
+        return response
+
+    def _iniciar(self):
+        acumulado = [0, 0.0]
+        return acumulado, _consultas.set(acumulado), time.perf_counter()
+
+    def _registrar(self, request, response, acumulado, inicio):
+        duracion = time.perf_counter() - inicio
+        coincidencia = getattr(request, 'resolver_match', None)
+        # Nombre de la URL (p. ej. sensor-verificar-acceso) y no la ruta: cardinalidad acotada
+        vista = (coincidencia.view_name or coincidencia._func_path) if coincidencia else 'sin_ruta'
+        peticiones.incrementar(vista, request.method, str(response.status_code))
+        duracion_peticiones.observar(duracion, vista)
+        consultas_peticion.observar(acumulado[0], vista)
+        duracion_consultas.observar(acumulado[1], vista)
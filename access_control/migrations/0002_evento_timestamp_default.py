@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 10:23
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='evento',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Fecha y hora'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 10:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0002_evento_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['timestamp', 'id'], name='evento_timestamp_id_idx'),
+        ),
+    ]
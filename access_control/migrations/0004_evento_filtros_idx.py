@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-18 10:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0003_evento_timestamp_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['tipo', 'timestamp'], name='evento_tipo_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['sensor', 'timestamp'], name='evento_sensor_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['barrera', 'timestamp'], name='evento_barrera_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['usuario_responsable', 'timestamp'], name='evento_usuario_timestamp_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 10:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0004_evento_filtros_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticaAcceso',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularidad', models.CharField(choices=[('HORA', 'Hora'), ('DIA', 'Día')], max_length=4, verbose_name='Granularidad')),
+                ('periodo', models.DateTimeField(verbose_name='Inicio del período')),
+                ('tipo', models.CharField(choices=[('ACCESO_PERMITIDO', 'Acceso Permitido'), ('ACCESO_DENEGADO', 'Acceso Denegado'), ('APERTURA_MANUAL', 'Apertura Manual'), ('CIERRE_MANUAL', 'Cierre Manual')], max_length=20, verbose_name='Tipo de evento')),
+                ('total', models.PositiveBigIntegerField(default=0, verbose_name='Total')),
+                ('barrera', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='estadisticas', to='access_control.barrera', verbose_name='Barrera')),
+                ('departamento', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='estadisticas', to='access_control.departamento', verbose_name='Departamento')),
+            ],
+            options={
+                'verbose_name': 'Estadística de acceso',
+                'verbose_name_plural': 'Estadísticas de acceso',
+                'ordering': ['-periodo'],
+                'indexes': [models.Index(fields=['granularidad', 'periodo'], name='estadistica_periodo_idx')],
+                'constraints': [models.UniqueConstraint(fields=('granularidad', 'periodo', 'barrera', 'departamento', 'tipo'), name='estadistica_acceso_unica')],
+            },
+        ),
+    ]
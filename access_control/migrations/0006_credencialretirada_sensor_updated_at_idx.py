@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-18 10:44
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0005_estadisticaacceso'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CredencialRetirada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uid_mac', models.CharField(max_length=50, verbose_name='UID/MAC')),
+                ('retirado_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Fecha de retiro')),
+            ],
+            options={
+                'verbose_name': 'Credencial retirada',
+                'verbose_name_plural': 'Credenciales retiradas',
+                'ordering': ['-retirado_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='sensor',
+            index=models.Index(fields=['updated_at'], name='sensor_updated_at_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-18 10:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0006_credencialretirada_sensor_updated_at_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivoEventos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(db_index=True, verbose_name='Mes')),
+                ('ruta', models.CharField(max_length=255, verbose_name='Ruta en el almacenamiento')),
+                ('cantidad', models.PositiveIntegerField(verbose_name='Cantidad de eventos')),
+                ('ultimo_id', models.BigIntegerField(verbose_name='Último ID archivado')),
+                ('tamano', models.PositiveBigIntegerField(verbose_name='Tamaño (bytes)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+            ],
+            options={
+                'verbose_name': 'Archivo de eventos',
+                'verbose_name_plural': 'Archivos de eventos',
+                'ordering': ['mes', 'id'],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 10:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0007_archivoeventos'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='estadisticaacceso',
+            name='tipo',
+            field=models.CharField(choices=[('ACCESO_PERMITIDO', 'Acceso Permitido'), ('ACCESO_DENEGADO', 'Acceso Denegado'), ('APERTURA_MANUAL', 'Apertura Manual'), ('CIERRE_MANUAL', 'Cierre Manual'), ('LECTURAS_SUPRIMIDAS', 'Lecturas Suprimidas')], max_length=20, verbose_name='Tipo de evento'),
+        ),
+        migrations.AlterField(
+            model_name='evento',
+            name='tipo',
+            field=models.CharField(choices=[('ACCESO_PERMITIDO', 'Acceso Permitido'), ('ACCESO_DENEGADO', 'Acceso Denegado'), ('APERTURA_MANUAL', 'Apertura Manual'), ('CIERRE_MANUAL', 'Cierre Manual'), ('LECTURAS_SUPRIMIDAS', 'Lecturas Suprimidas')], max_length=20, verbose_name='Tipo de evento'),
+        ),
+    ]
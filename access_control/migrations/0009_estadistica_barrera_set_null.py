@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 12:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0008_evento_tipo_lecturas_suprimidas'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='estadisticaacceso',
+            name='barrera',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='estadisticas', to='access_control.barrera', verbose_name='Barrera'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 12:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0009_estadistica_barrera_set_null'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='estadisticaacceso',
+            name='departamento',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='estadisticas', to='access_control.departamento', verbose_name='Departamento'),
+        ),
+    ]
@@ -0,0 +1,190 @@
+import hashlib
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import ListSerializer
+
+from .db_router import (
+    ALIAS_PRINCIPAL, ALIAS_REPLICA, activar_replica, desactivar_replica, escritura_reciente,
+    marcar_escritura, replica_configurada,
+)
+
+
+class ConditionalGetMixin:
+    """
+    GET condicional (ETag / Last-Modified) en list y retrieve
+    Los validadores salen de una sola consulta agregada: MAX(updated_at) de la tabla y de
+    las relaciones que aparecen en la respuesta (campos_modificacion) y la cantidad de filas,
+    que detecta eliminaciones. Con 304 no se ejecuta la consulta del listado ni el serializador.
+    Last-Modified no refleja eliminaciones: los clientes deben preferir If-None-Match
+    """
+    campos_modificacion = ('updated_at',)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self._respuesta_condicional(queryset, super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: kwargs[lookup]}
+        )
+        return self._respuesta_condicional(queryset, super().retrieve, request, *args, **kwargs)
+
+    def _validadores(self, queryset):
+        """Retorna (etag, epoch de la última modificación o None)"""
+        agregados = queryset.order_by().aggregate(
+            cantidad=Count('pk'),
+            **{f'modificado_{i}': Max(campo) for i, campo in enumerate(self.campos_modificacion)}
+        )
+        cantidad = agregados.pop('cantidad')
+        fechas = [fecha for fecha in agregados.values() if fecha is not None]
+        ultima = max(fechas) if fechas else None
+        # La misma colección puede verse distinta según la página, los filtros o el formato
+        firma = '|'.join([
+            ultima.isoformat() if ultima else '', str(cantidad),
+            self.request.get_full_path(), self.request.accepted_renderer.format,
+        ])
+        etag = f'"{hashlib.md5(firma.encode()).hexdigest()}"'
+        return etag, int(ultima.timestamp()) if ultima else None
+
+    def _respuesta_condicional(self, queryset, generar, request, *args, **kwargs):
+        etag, ultima = self._validadores(queryset)
+        response = get_conditional_response(request, etag=etag, last_modified=ultima)
+        if response is None:
+            response = generar(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if ultima is not None:
+                response['Last-Modified'] = http_date(ultima)
+        return response
+
+
+class ReplicaLecturaMixin:
+    """
+    Envía a la réplica de lectura (si está configurada, ver db_router.py) las consultas de las
+    acciones de lectura listadas en acciones_replica, salvo para los usuarios que escribieron
+    hace menos de DB_REPLICA_ADHERENCIA segundos. Las acciones de escritura exitosas marcan
+    al usuario, excepto las de acciones_sin_adherencia (p. ej. el registro de eventos de
+    verificar_acceso, que no se lee de vuelta)
+    Las respuestas en streaming deben usar self.db_lectura en su queryset, porque se leen
+    después de terminar la vista
+    """
+    acciones_replica = ('list', 'retrieve')
+    acciones_sin_adherencia = ()
+    db_lectura = ALIAS_PRINCIPAL
+    _token_replica = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (request.method in SAFE_METHODS and self.action in self.acciones_replica
+                and replica_configurada() and not escritura_reciente(request.user.pk)):
+            self.db_lectura = ALIAS_REPLICA
+            self._token_replica = activar_replica()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self._token_replica is not None:
+            desactivar_replica(self._token_replica)
+            self._token_replica = None
+        elif (request.method not in SAFE_METHODS and response.status_code < 400
+                and self.action not in self.acciones_sin_adherencia
+                and replica_configurada() and request.user.is_authenticated):
+            marcar_escritura(request.user.pk)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class CamposDinamicosMixin:
+    """
+    Selección de campos en list y retrieve: ?fields=id,nombre retorna solo esos campos y
+    ?omit=descripcion excluye los indicados
+    Además de recortar el serializador, la consulta carga solo las columnas de los campos
+    pedidos (only()) y hace JOIN solo con las relaciones que se muestran (p. ej. para
+    departamento_nombre). campos_requeridos son columnas que se cargan siempre porque las usa
+    la vista o la paginación. Si algún campo no sale directamente de columnas del modelo, la
+    consulta no se recorta
+    """
+    fields_query_param = 'fields'
+    omit_query_param = 'omit'
+    acciones_campos = ('list', 'retrieve')
+    campos_requeridos = ()
+    _seleccion = None
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        seleccion = self._campos_seleccionados()
+        if seleccion is None:
+            return queryset
+        columnas = self._columnas(queryset.model, seleccion)
+        if columnas is None:
+            return queryset
+        relaciones = {columna.rsplit('__', 1)[0] for columna in columnas if '__' in columna}
+        queryset = queryset.select_related(None)
+        if relaciones:
+            queryset = queryset.select_related(*relaciones)
+        return queryset.only(queryset.model._meta.pk.name, *columnas, *self.campos_requeridos)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        seleccion = self._campos_seleccionados()
+        if seleccion is not None:
+            campos = serializer.child.fields if isinstance(serializer, ListSerializer) else serializer.fields
+            for nombre in set(campos) - set(seleccion):
+                campos.pop(nombre)
+        return serializer
+
+    def _campos_seleccionados(self):
+        """Nombres de los campos a retornar, o None si se retornan todos"""
+        if self._seleccion is not None:
+            return self._seleccion[0]
+        params = self.request.query_params
+        if (self.action not in self.acciones_campos
+                or not {self.fields_query_param, self.omit_query_param} & params.keys()):
+            self._seleccion = (None,)
+            return None
+
+        campos = self.get_serializer_class()(context=self.get_serializer_context()).fields
+        disponibles = [nombre for nombre, campo in campos.items() if not campo.write_only]
+        seleccion = disponibles
+        if self.fields_query_param in params:
+            pedidos = self._lista_campos(self.fields_query_param, disponibles)
+            seleccion = [nombre for nombre in disponibles if nombre in pedidos]
+        if self.omit_query_param in params:
+            omitidos = self._lista_campos(self.omit_query_param, disponibles)
+            seleccion = [nombre for nombre in seleccion if nombre not in omitidos]
+        self._campos_serializador = campos
+        self._seleccion = (seleccion,)
+        return seleccion
+
+    def _lista_campos(self, parametro, disponibles):
+        nombres = {nombre.strip() for nombre in self.request.query_params[parametro].split(',')} - {''}
+        desconocidos = sorted(nombres - set(disponibles))
+        if desconocidos:
+            raise ValidationError({parametro: f'Campos desconocidos: {", ".join(desconocidos)}'})
+        return nombres
+
+    def _columnas(self, modelo_base, seleccion):
+        """Rutas para only() de los campos seleccionados (None si alguno no es una columna)"""
+        columnas = set()
+        for nombre in seleccion:
+            origen = self._campos_serializador[nombre].source_attrs
+            if not origen:
+                # source='*': el campo usa la instancia completa
+                return None
+            modelo = modelo_base
+            for i, atributo in enumerate(origen):
+                try:
+                    campo = modelo._meta.get_field(atributo)
+                except FieldDoesNotExist:
+                    return None
+                if campo.many_to_many or campo.one_to_many:
+                    return None
+                if i < len(origen) - 1:
+                    if not campo.is_relation:
+                        return None
+                    modelo = campo.related_model
+            columnas.add('__'.join(origen))
+        return columnas
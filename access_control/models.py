@@ -1,7 +1,10 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinLengthValidator
 
+from .notificaciones import notificar_barrera
+
 
 class Usuario(AbstractUser):
     """
@@ -130,10 +133,23 @@ class Sensor(models.Model):
         verbose_name = 'Sensor'
         verbose_name_plural = 'Sensores'
         ordering = ['-created_at']
+        indexes = [
+            # Cambios desde una versión de la lista de permitidos (ver permitidos.py)
+            models.Index(fields=['updated_at'], name='sensor_updated_at_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nombre} ({self.uid_mac})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # UID/MAC leído de la base de datos, para detectar cambios al guardar (ver signals.py)
+        # Se lee de __dict__: con only()/defer() acceder a un campo diferido haría una consulta
+        if 'uid_mac' in instance.__dict__:
+            instance._uid_mac_original = instance.__dict__['uid_mac']
+        return instance
+
     def esta_activo(self):
         """Verifica si el sensor está activo"""
         return self.estado == self.Estado.ACTIVO
@@ -182,14 +198,53 @@ class Barrera(models.Model):
         return f"{self.nombre} - {self.get_estado_display()}"
 
     def abrir(self):
-        """Abre la barrera"""
-        self.estado = self.Estado.ABIERTA
-        self.save()
+        """Abre la barrera; retorna True si estaba cerrada (ver cambiar_estado)"""
+        return self.cambiar_estado(self.Estado.ABIERTA)
 
     def cerrar(self):
-        """Cierra la barrera"""
-        self.estado = self.Estado.CERRADA
-        self.save()
+        """Cierra la barrera; retorna True si estaba abierta (ver cambiar_estado)"""
+        return self.cambiar_estado(self.Estado.CERRADA)
+
+    def cambiar_estado(self, estado):
+        """
+        Transición atómica: un solo UPDATE condicional (WHERE estado <> nuevo estado) de estado
+        y updated_at. Con peticiones concurrentes solo una realiza la transición; las demás
+        retornan False y la instancia queda con el estado actual de la base de datos
+        """
+        ahora = timezone.now()
+        cambio = bool(
+            Barrera.objects.filter(pk=self.pk).exclude(estado=estado).update(estado=estado, updated_at=ahora)
+        )
+        if cambio:
+            self.estado, self.updated_at = estado, ahora
+            # update() no emite post_save: notificar aquí a las pantallas (ver signals.py)
+            transaction.on_commit(lambda: notificar_barrera(self))
+        else:
+            self.refresh_from_db(fields=['estado', 'updated_at'])
+        return cambio
+
+    async def aabrir(self):
+        """Versión asíncrona de abrir()"""
+        return await self.acambiar_estado(self.Estado.ABIERTA)
+
+    async def acerrar(self):
+        """Versión asíncrona de cerrar()"""
+        return await self.acambiar_estado(self.Estado.CERRADA)
+
+    async def acambiar_estado(self, estado):
+        """Versión asíncrona de cambiar_estado() (fuera de transacciones, notifica de inmediato)"""
+        ahora = timezone.now()
+        cambio = bool(
+            await Barrera.objects.filter(pk=self.pk).exclude(estado=estado).aupdate(
+                estado=estado, updated_at=ahora
+            )
+        )
+        if cambio:
+            self.estado, self.updated_at = estado, ahora
+            notificar_barrera(self)
+        else:
+            await self.arefresh_from_db(fields=['estado', 'updated_at'])
+        return cambio
 
     def esta_abierta(self):
         """Verifica si la barrera está abierta"""
@@ -206,6 +261,7 @@ class Evento(models.Model):
         ACCESO_DENEGADO = 'ACCESO_DENEGADO', 'Acceso Denegado'
         APERTURA_MANUAL = 'APERTURA_MANUAL', 'Apertura Manual'
         CIERRE_MANUAL = 'CIERRE_MANUAL', 'Cierre Manual'
+        LECTURAS_SUPRIMIDAS = 'LECTURAS_SUPRIMIDAS', 'Lecturas Suprimidas'
 
     tipo = models.CharField(
         max_length=20,
@@ -244,12 +300,120 @@ class Evento(models.Model):
         blank=True,
         verbose_name='Descripción'
     )
-    timestamp = models.DateTimeField(auto_now_add=True, verbose_name='Fecha y hora')
+    # default (y no auto_now_add) para conservar la hora real del evento en escrituras diferidas
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, verbose_name='Fecha y hora')
 
     class Meta:
         verbose_name = 'Evento'
         verbose_name_plural = 'Eventos'
         ordering = ['-timestamp']
+        indexes = [
+            # Paginación por clave (timestamp, id) del listado de eventos
+            models.Index(fields=['timestamp', 'id'], name='evento_timestamp_id_idx'),
+            # Filtros del listado de eventos por campo y rango de tiempo
+            models.Index(fields=['tipo', 'timestamp'], name='evento_tipo_timestamp_idx'),
+            models.Index(fields=['sensor', 'timestamp'], name='evento_sensor_timestamp_idx'),
+            models.Index(fields=['barrera', 'timestamp'], name='evento_barrera_timestamp_idx'),
+            models.Index(fields=['usuario_responsable', 'timestamp'], name='evento_usuario_timestamp_idx'),
+        ]
 
     def __str__(self):
         return f"{self.get_tipo_display()} - {self.timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
+
+
+class CredencialRetirada(models.Model):
+    """
+    UID/MAC que dejó de identificar a un sensor (sensor eliminado o UID/MAC modificado)
+    Permite informar las bajas en la sincronización incremental de la lista de permitidos
+    """
+    uid_mac = models.CharField(max_length=50, verbose_name='UID/MAC')
+    retirado_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name='Fecha de retiro')
+
+    class Meta:
+        verbose_name = 'Credencial retirada'
+        verbose_name_plural = 'Credenciales retiradas'
+        ordering = ['-retirado_at']
+
+    def __str__(self):
+        return f"{self.uid_mac} ({self.retirado_at.strftime('%Y-%m-%d %H:%M:%S')})"
+
+
+class ArchivoEventos(models.Model):
+    """
+    Archivo CSV comprimido (gzip) con eventos de un mes retirados de la tabla Evento
+    Un mes puede tener varios archivos si se registraron eventos antiguos después de archivarlo
+    """
+    mes = models.DateField(db_index=True, verbose_name='Mes')
+    ruta = models.CharField(max_length=255, verbose_name='Ruta en el almacenamiento')
+    cantidad = models.PositiveIntegerField(verbose_name='Cantidad de eventos')
+    ultimo_id = models.BigIntegerField(verbose_name='Último ID archivado')
+    tamano = models.PositiveBigIntegerField(verbose_name='Tamaño (bytes)')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
+
+    class Meta:
+        verbose_name = 'Archivo de eventos'
+        verbose_name_plural = 'Archivos de eventos'
+        ordering = ['mes', 'id']
+
+    def __str__(self):
+        return f"{self.mes.strftime('%Y-%m')} ({self.cantidad} eventos)"
+
+
+class EstadisticaAcceso(models.Model):
+    """
+    Contador pre-agregado de eventos por período (hora o día), barrera, departamento y tipo
+    Se actualiza al registrar eventos y se reconstruye con `manage.py reconstruir_estadisticas`
+    El departamento es el de la barrera, o el del sensor si el evento no tiene barrera
+    """
+    class Granularidad(models.TextChoices):
+        HORA = 'HORA', 'Hora'
+        DIA = 'DIA', 'Día'
+
+    granularidad = models.CharField(
+        max_length=4,
+        choices=Granularidad.choices,
+        verbose_name='Granularidad'
+    )
+    periodo = models.DateTimeField(verbose_name='Inicio del período')
+    # SET_NULL como Evento.barrera: los eventos de una barrera eliminada se siguen contando
+    # (ver estadisticas.reasignar_barrera)
+    barrera = models.ForeignKey(
+        Barrera,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='estadisticas',
+        verbose_name='Barrera'
+    )
+    # SET_NULL como Sensor.departamento (ver estadisticas.reasignar_departamento)
+    departamento = models.ForeignKey(
+        Departamento,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='estadisticas',
+        verbose_name='Departamento'
+    )
+    tipo = models.CharField(
+        max_length=20,
+        choices=Evento.TipoEvento.choices,
+        verbose_name='Tipo de evento'
+    )
+    total = models.PositiveBigIntegerField(default=0, verbose_name='Total')
+
+    class Meta:
+        verbose_name = 'Estadística de acceso'
+        verbose_name_plural = 'Estadísticas de acceso'
+        ordering = ['-periodo']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularidad', 'periodo', 'barrera', 'departamento', 'tipo'],
+                name='estadistica_acceso_unica'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['granularidad', 'periodo'], name='estadistica_periodo_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_granularidad_display()} {self.periodo:%Y-%m-%d %H:%M} - {self.tipo}: {self.total}"
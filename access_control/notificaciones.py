@@ -0,0 +1,120 @@
+"""
+Notificaciones en tiempo real (Server-Sent Events) para las pantallas de monitoreo
+
+Un broker en memoria reparte cada mensaje a las conexiones suscritas del proceso:
+cambios de estado de barreras (canal 'barreras', ver signals.py) y eventos registrados
+(canal 'eventos', ver eventos.py). El stream se sirve en /api/stream/ (ver async_views.py)
+y requiere ASGI. Con varios procesos cada uno tiene su propio broker: los mensajes solo
+llegan a las pantallas conectadas al proceso donde ocurrió el cambio.
+"""
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+CANAL_BARRERAS = 'barreras'
+CANAL_EVENTOS = 'eventos'
+CANALES = (CANAL_BARRERAS, CANAL_EVENTOS)
+
+# Nombre del evento SSE enviado en cada canal
+_NOMBRE_EVENTO = {CANAL_BARRERAS: 'barrera', CANAL_EVENTOS: 'evento'}
+
+
+def formatear_sse(canal, datos):
+    """Mensaje SSE (event + data) listo para enviar"""
+    contenido = json.dumps(datos, cls=DjangoJSONEncoder, ensure_ascii=False)
+    return f'event: {_NOMBRE_EVENTO[canal]}\ndata: {contenido}\n\n'
+
+
+class Suscripcion:
+    """
+    Cola de mensajes pendientes de una conexión, ligada al event loop que la atiende
+    Si el cliente no consume a tiempo se descartan los mensajes más antiguos
+    """
+    def __init__(self, canales, max_pendientes):
+        self.canales = frozenset(canales)
+        self.loop = asyncio.get_running_loop()
+        self.cola = asyncio.Queue(max_pendientes)
+        self.descartados = 0
+
+    def _entregar(self, mensaje):
+        # Se ejecuta en el event loop de la suscripción (asyncio.Queue no es thread-safe)
+        if self.cola.full():
+            self.cola.get_nowait()
+            self.descartados += 1
+        self.cola.put_nowait(mensaje)
+
+
+class Broker:
+    """
+    Reparto en memoria: cada mensaje se serializa una sola vez y se entrega a todas las
+    suscripciones del canal. Se puede publicar desde cualquier hilo (vistas síncronas,
+    hilo del escritor diferido de eventos) o desde código async
+    """
+    def __init__(self, max_pendientes=100):
+        self.max_pendientes = max_pendientes
+        self._suscripciones = set()
+        self._lock = threading.Lock()
+
+    def suscribir(self, canales=CANALES):
+        """Crea una suscripción; debe llamarse desde el event loop que la consumirá"""
+        suscripcion = Suscripcion(canales, self.max_pendientes)
+        with self._lock:
+            self._suscripciones.add(suscripcion)
+        return suscripcion
+
+    def cancelar(self, suscripcion):
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+
+    def cantidad_suscripciones(self):
+        with self._lock:
+            return len(self._suscripciones)
+
+    def publicar(self, canal, datos):
+        """Envía un mensaje al canal; retorna la cantidad de suscripciones que lo recibirán"""
+        with self._lock:
+            destinos = [s for s in self._suscripciones if canal in s.canales]
+        if not destinos:
+            return 0
+        mensaje = formatear_sse(canal, datos)
+        for suscripcion in destinos:
+            try:
+                suscripcion.loop.call_soon_threadsafe(suscripcion._entregar, mensaje)
+            except RuntimeError:
+                # El event loop ya terminó: la conexión se cerró sin cancelar la suscripción
+                self.cancelar(suscripcion)
+        return len(destinos)
+
+
+broker = Broker(max_pendientes=getattr(settings, 'NOTIFICACIONES_MAX_PENDIENTES', 100))
+
+
+def notificar_barrera(barrera):
+    """Publica el estado actual de una barrera"""
+    broker.publicar(CANAL_BARRERAS, {
+        'id': barrera.pk,
+        'nombre': barrera.nombre,
+        'estado': barrera.estado,
+        'departamento': barrera.departamento_id,
+        'updated_at': timezone.localtime(barrera.updated_at) if barrera.updated_at else None,
+    })
+
+
+def notificar_eventos(registros):
+    """Publica eventos recién persistidos (diccionarios de campos, ver eventos.py)"""
+    if not broker.cantidad_suscripciones():
+        return
+    for campos in registros:
+        broker.publicar(CANAL_EVENTOS, {
+            'tipo': campos['tipo'],
+            'timestamp': timezone.localtime(campos['timestamp']),
+            'sensor': campos.get('sensor_id'),
+            'barrera': campos.get('barrera_id'),
+            'usuario_responsable': campos.get('usuario_responsable_id'),
+            'motivo_denegacion': campos.get('motivo_denegacion'),
+            'descripcion': campos.get('descripcion'),
+        })
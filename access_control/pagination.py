@@ -0,0 +1,133 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por clave (keyset) sobre (timestamp, id), en orden descendente
+    Cada página filtra por la posición del cursor en lugar de usar OFFSET, y no ejecuta COUNT(*),
+    por lo que el costo es el mismo en la primera página y en la página 100.000
+    El cursor es opaco para el cliente (base64 de la última posición y la dirección)
+    """
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    campo_orden = 'timestamp'
+    invalid_cursor_message = 'Cursor inválido'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = remove_query_param(request.build_absolute_uri(), 'page')
+        cursor = self.decode_cursor(request)
+
+        if cursor is None:
+            direccion, posicion = 'n', None
+        else:
+            direccion, posicion = cursor
+
+        if direccion == 'n':
+            queryset = queryset.order_by(f'-{self.campo_orden}', '-id')
+            if posicion is not None:
+                valor, pk = posicion
+                queryset = queryset.filter(
+                    Q(**{f'{self.campo_orden}__lt': valor})
+                    | Q(**{self.campo_orden: valor, 'id__lt': pk})
+                )
+        else:
+            valor, pk = posicion
+            queryset = queryset.order_by(self.campo_orden, 'id').filter(
+                Q(**{f'{self.campo_orden}__gt': valor})
+                | Q(**{self.campo_orden: valor, 'id__gt': pk})
+            )
+
+        resultados = list(queryset[:self.page_size + 1])
+        hay_mas = len(resultados) > self.page_size
+        resultados = resultados[:self.page_size]
+
+        if direccion == 'n':
+            self.has_next = hay_mas
+            self.has_previous = posicion is not None
+        else:
+            resultados.reverse()
+            self.has_next = True
+            self.has_previous = hay_mas
+
+        self.page = resultados
+        return resultados
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor('n', self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor('p', self.page[0])
+
+    def encode_cursor(self, direccion, objeto):
+        valor = getattr(objeto, self.campo_orden)
+        datos = json.dumps({'d': direccion, 'v': valor.isoformat(), 'id': objeto.pk})
+        cursor = base64.urlsafe_b64encode(datos.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            datos = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            direccion = datos['d']
+            valor = parse_datetime(datos['v'])
+            pk = int(datos['id'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if direccion not in ('n', 'p') or valor is None:
+            raise NotFound(self.invalid_cursor_message)
+        return direccion, (valor, pk)
+
+
+class EventoPagination(BasePagination):
+    """
+    Paginación de eventos:
+    - Por defecto, paginación por número de página (compatible con clientes existentes)
+    - Con ?paginacion=cursor o ?cursor=..., paginación por clave (KeysetPagination)
+    """
+    modo_query_param = 'paginacion'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (request.query_params.get(self.modo_query_param) == 'cursor'
+                or KeysetPagination.cursor_query_param in request.query_params):
+            self.paginador = KeysetPagination()
+        else:
+            self.paginador = PageNumberPagination()
+        return self.paginador.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginador.get_paginated_response(data)
@@ -0,0 +1,32 @@
+"""
+Parser JSON con orjson (opcional, ver API_JSON_RAPIDO en settings.py)
+
+Acepta lo mismo que JSONParser de DRF en modo estricto (rechaza NaN e Infinity). Si orjson
+no está instalado o el cuerpo no viene en UTF-8, se usa JSONParser sin cambios.
+"""
+import codecs
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from .renderers import ORJSONRenderer, orjson
+
+
+def _utf8(parser_context):
+    try:
+        return codecs.lookup(parser_context.get('encoding', settings.DEFAULT_CHARSET)).name == 'utf-8'
+    except LookupError:
+        return False
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None or not self.strict or not _utf8(parser_context or {}):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,210 @@
+"""
+Perfilado de SQL por petición (opcional)
+
+Una petición se perfila si lleva el header X-Perfilado con el valor de PERFILADO_TOKEN
+(o cualquier valor con DEBUG), o por muestreo aleatorio (PERFILADO_MUESTREO, p. ej. 0.01).
+Se registra cada consulta con su duración y el origen en el código del proyecto, y se
+marcan las consultas repetidas: idénticas (mismo SQL y parámetros) y similares (mismo SQL
+con otros parámetros, típico de N+1 en serializadores). Los parámetros (UID/MAC, hashes de
+contraseñas) no se registran: solo un hash con clave aleatoria del proceso para compararlos.
+Las peticiones perfiladas más lentas que PERFILADO_UMBRAL_MS (o pedidas con el header) se
+escriben como JSON, una por línea, en un log rotativo (PERFILADO_LOG). Con el header, la
+respuesta incluye además un resumen en Server-Timing y X-Perfilado-Consultas.
+Las peticiones no perfiladas solo pagan el sorteo del muestreo.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+
+HEADER = 'X-Perfilado'
+MAX_FRAMES_ORIGEN = 3
+
+# Clave del hash de parámetros: no se puede recuperar un valor probando candidatos
+_CLAVE_PARAMS = os.urandom(16)
+
+logger = logging.getLogger('smartconnect.perfilado')
+
+# Consultas de la petición perfilada en curso (None si no se perfila)
+_perfil = ContextVar('perfil', default=None)
+
+
+def _configurar_logger():
+    """Agrega el handler rotativo si LOGGING no configuró uno para este logger"""
+    if logger.handlers:
+        return
+    ruta = Path(settings.PERFILADO_LOG)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    handler = RotatingFileHandler(
+        ruta, maxBytes=settings.PERFILADO_LOG_BYTES, backupCount=settings.PERFILADO_LOG_ARCHIVOS,
+        encoding='utf-8', delay=True
+    )
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def _origen():
+    """Frames del proyecto (fuera de librerías y de este módulo) desde donde se ejecutó la consulta"""
+    base = str(settings.BASE_DIR)
+    frames = []
+    frame = sys._getframe(2)
+    while frame is not None and len(frames) < MAX_FRAMES_ORIGEN:
+        archivo = frame.f_code.co_filename
+        if (archivo.startswith(base) and archivo != __file__
+                and not archivo.startswith(sys.prefix) and 'site-packages' not in archivo):
+            frames.append(f'{Path(archivo).relative_to(base)}:{frame.f_lineno} en {frame.f_code.co_name}')
+        frame = frame.f_back
+    return frames
+
+
+def _hash_params(params):
+    return hashlib.blake2b(repr(params).encode(), digest_size=8, key=_CLAVE_PARAMS).hexdigest()
+
+
+def registrar_consulta(execute, sql, params, many, context):
+    """execute_wrapper de las conexiones (ver apps.py): solo actúa en peticiones perfiladas"""
+    perfil = _perfil.get()
+    if perfil is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duracion = time.perf_counter() - inicio
+        if len(perfil) < settings.PERFILADO_MAX_CONSULTAS:
+            perfil.append({
+                'sql': sql,
+                'params_hash': _hash_params(params),
+                'ms': round(duracion * 1000, 3),
+                'origen': _origen(),
+            })
+        else:
+            # Sobre el límite solo se cuenta la consulta, sin detalle
+            perfil.append({'sql': sql, 'params_hash': None, 'ms': round(duracion * 1000, 3), 'origen': []})
+
+
+def instrumentar_conexion(sender, connection, **kwargs):
+    """Receptor de connection_created (ver apps.py)"""
+    if registrar_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(registrar_consulta)
+
+
+def _repetidas(consultas, clave):
+    """Grupos de consultas con la misma clave que se ejecutaron más de una vez"""
+    grupos = defaultdict(list)
+    for consulta in consultas:
+        grupos[clave(consulta)].append(consulta)
+    return sorted((
+        {
+            'sql': grupo[0]['sql'],
+            'cantidad': len(grupo),
+            'ms': round(sum(consulta['ms'] for consulta in grupo), 3),
+            'origen': grupo[0]['origen'],
+        }
+        for grupo in grupos.values() if len(grupo) > 1
+    ), key=lambda grupo: grupo['cantidad'], reverse=True)
+
+
+def resumen(consultas):
+    """Totales y consultas repetidas (idénticas y similares) de una petición perfilada"""
+    return {
+        'consultas': len(consultas),
+        'sql_ms': round(sum(consulta['ms'] for consulta in consultas), 3),
+        'duplicadas': _repetidas(consultas, lambda consulta: (consulta['sql'], consulta['params_hash'])),
+        'similares': _repetidas(consultas, lambda consulta: consulta['sql']),
+    }
+
+
+class PerfiladoMiddleware:
+    """Perfilado de SQL por petición (ver la descripción del módulo)"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PERFILADO_MUESTREO and not settings.PERFILADO_TOKEN and not settings.DEBUG:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        forzado = self._forzado(request)
+        if not forzado and not self._muestreado():
+            return self.get_response(request)
+        consultas, token, inicio = self._iniciar()
+        try:
+            response = self.get_response(request)
+        finally:
+            _perfil.reset(token)
+        self._finalizar(request, response, consultas, inicio, forzado)
+        return response
+
+    async def __acall__(self, request):
+        forzado = self._forzado(request)
+        if not forzado and not self._muestreado():
+            return await self.get_response(request)
+        consultas, token, inicio = self._iniciar()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _perfil.reset(token)
+        self._finalizar(request, response, consultas, inicio, forzado)
+        return response
+
+    def _forzado(self, request):
+        valor = request.headers.get(HEADER)
+        if not valor:
+            return False
+        if settings.PERFILADO_TOKEN:
+            return hmac.compare_digest(valor.encode(), settings.PERFILADO_TOKEN.encode())
+        return settings.DEBUG
+
+    def _muestreado(self):
+        return settings.PERFILADO_MUESTREO > 0 and random.random() < settings.PERFILADO_MUESTREO
+
+    def _iniciar(self):
+        consultas = []
+        return consultas, _perfil.set(consultas), time.perf_counter()
+
+    def _finalizar(self, request, response, consultas, inicio, forzado):
+        duracion_ms = round((time.perf_counter() - inicio) * 1000, 3)
+        if not forzado and duracion_ms < settings.PERFILADO_UMBRAL_MS:
+            return
+        datos = resumen(consultas)
+        if forzado:
+            response['Server-Timing'] = (
+                f'total;dur={duracion_ms}, sql;dur={datos["sql_ms"]};desc="{datos["consultas"]} consultas"'
+            )
+            response['X-Perfilado-Consultas'] = str(datos['consultas'])
+        coincidencia = getattr(request, 'resolver_match', None)
+        registro = {
+            'timestamp': timezone.now().isoformat(),
+            'metodo': request.method,
+            'ruta': request.get_full_path(),
+            'vista': coincidencia.view_name if coincidencia else None,
+            'codigo': response.status_code,
+            'duracion_ms': duracion_ms,
+            'forzado': forzado,
+            **datos,
+            'detalle': [consulta for consulta in consultas if consulta['params_hash'] is not None],
+        }
+        _configurar_logger()
+        logger.info(json.dumps(registro, ensure_ascii=False, default=str))
@@ -0,0 +1,99 @@
+"""
+Lista de permitidos para lectores que deciden el acceso localmente
+
+La lista contiene un hash truncado de SHA-256 del uid_mac (PERMITIDOS_HASH_BYTES bytes) de
+cada sensor ACTIVO, concatenados en orden. Cada respuesta tiene una versión (microsegundos
+desde 1970 del último cambio en sensores o credenciales retiradas); con ella el lector pide
+solo los cambios: hashes a agregar (altas) y a quitar (bajas), aplicando primero las bajas.
+Los cambios incluyen un margen (PERMITIDOS_MARGEN) hacia atrás para no perder transacciones
+confirmadas después de calcular la versión; reaplicar un cambio no tiene efecto.
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+
+from .models import Sensor, CredencialRetirada
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def algoritmo():
+    return f'sha256/{settings.PERMITIDOS_HASH_BYTES}'
+
+
+def hash_uid(uid_mac):
+    """Hash del uid_mac que el lector debe calcular para cada lectura"""
+    return hashlib.sha256(uid_mac.encode()).digest()[:settings.PERMITIDOS_HASH_BYTES]
+
+
+def _a_version(fecha):
+    return (fecha - _EPOCH) // timedelta(microseconds=1)
+
+
+def _desde_version(version):
+    return _EPOCH + timedelta(microseconds=version)
+
+
+def version_actual():
+    """Versión global de la lista de permitidos (0 si no hay sensores)"""
+    fechas = [
+        Sensor.objects.aggregate(ultima=Max('updated_at'))['ultima'],
+        CredencialRetirada.objects.aggregate(ultima=Max('retirado_at'))['ultima'],
+    ]
+    fechas = [fecha for fecha in fechas if fecha is not None]
+    return _a_version(max(fechas)) if fechas else 0
+
+
+def _empaquetar(hashes):
+    return b''.join(sorted(hashes))
+
+
+def snapshot(departamento_id=None):
+    """
+    Retorna (versión, hashes concatenados) de los sensores ACTIVO (de un departamento, o todos)
+    La versión se calcula antes de leer los sensores, así ningún cambio posterior queda fuera
+    de la siguiente sincronización. El resultado se guarda en caché por versión
+    """
+    version = version_actual()
+    clave = f'permitidos:{departamento_id or "todos"}:{algoritmo()}:{version}'
+    hashes = cache.get(clave)
+    if hashes is None:
+        sensores = Sensor.objects.filter(estado=Sensor.Estado.ACTIVO)
+        if departamento_id is not None:
+            sensores = sensores.filter(departamento_id=departamento_id)
+        uids = sensores.order_by().values_list('uid_mac', flat=True).iterator(chunk_size=5000)
+        hashes = _empaquetar({hash_uid(uid_mac) for uid_mac in uids})
+        # TTL corto: una transacción confirmada tarde no cambia la versión máxima
+        cache.set(clave, hashes, settings.PERMITIDOS_CACHE_TTL)
+    return version, hashes
+
+
+def cambios(desde, departamento_id=None, version=None):
+    """
+    Retorna (versión, altas, bajas) desde una versión anterior (0 <= desde <= versión)
+    Un sensor modificado es alta si está ACTIVO (y en el departamento); si no, es baja
+    """
+    if version is None:
+        version = version_actual()
+    limite = _desde_version(desde) - timedelta(seconds=settings.PERMITIDOS_MARGEN)
+
+    altas, bajas = set(), set()
+    modificados = Sensor.objects.filter(updated_at__gt=limite).order_by().values_list(
+        'uid_mac', 'estado', 'departamento_id'
+    )
+    for uid_mac, estado, sensor_departamento in modificados:
+        permitido = estado == Sensor.Estado.ACTIVO and (
+            departamento_id is None or sensor_departamento == departamento_id
+        )
+        (altas if permitido else bajas).add(hash_uid(uid_mac))
+
+    retiradas = CredencialRetirada.objects.filter(retirado_at__gt=limite).order_by().values_list(
+        'uid_mac', flat=True
+    )
+    bajas.update(hash_uid(uid_mac) for uid_mac in retiradas)
+    # Un UID/MAC retirado y luego reasignado a un sensor activo sigue permitido
+    bajas -= altas
+    return version, _empaquetar(altas), _empaquetar(bajas)
@@ -0,0 +1,36 @@
+"""
+Renderer JSON con orjson (opcional, ver API_JSON_RAPIDO en settings.py)
+
+Produce el mismo JSON que JSONRenderer de DRF, serializando en C: los tipos que orjson no
+conoce (Decimal, timedelta, textos traducibles, QuerySet, etc.) se convierten con el mismo
+encoder de DRF. Si orjson no está instalado, o se pide JSON indentado (API navegable o
+`Accept: application/json; indent=4`) o ensure_ascii, se usa JSONRenderer sin cambios.
+"""
+from rest_framework.utils import encoders
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # Dependencia opcional: sin orjson se usa el módulo json estándar
+    orjson = None
+
+_encoder = encoders.JSONEncoder()
+
+
+class ORJSONRenderer(JSONRenderer):
+
+    opciones = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_encoder.default, option=self.opciones)
+        except orjson.JSONEncodeError:
+            # Enteros de más de 64 bits, referencias circulares, etc.: json estándar
+            return super().render(data, accepted_media_type, renderer_context)
+        # Igual que JSONRenderer: escapar U+2028/U+2029 (JSON válido como JavaScript)
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
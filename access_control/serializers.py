@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Usuario, Departamento, Sensor, Barrera, Evento
+from .models import Usuario, Departamento, Sensor, Barrera, Evento, EstadisticaAcceso
 
 
 class UsuarioSerializer(serializers.ModelSerializer):
@@ -89,3 +89,13 @@ class EventoSerializer(serializers.ModelSerializer):
         model = Evento
         fields = '__all__'
         read_only_fields = ['timestamp']
+
+
+class EstadisticaAccesoSerializer(serializers.ModelSerializer):
+    barrera_nombre = serializers.CharField(source='barrera.nombre', read_only=True)
+    departamento_nombre = serializers.CharField(source='departamento.nombre', read_only=True)
+
+    class Meta:
+        model = EstadisticaAcceso
+        fields = ['granularidad', 'periodo', 'tipo', 'barrera', 'barrera_nombre',
+                  'departamento', 'departamento_nombre', 'total']
@@ -0,0 +1,124 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .authentication import invalidar_usuario
+from .cache import cache_credenciales
+from .deduplicacion import deduplicador
+from .estadisticas import limpiar_departamentos_barrera, reasignar_barrera, reasignar_departamento
+from .models import Usuario, Departamento, Sensor, Barrera, CredencialRetirada
+from .notificaciones import notificar_barrera
+
+
+@receiver([post_save, post_delete], sender=Sensor)
+def invalidar_credencial_sensor(sender, instance, signal, **kwargs):
+    """Invalida la credencial en caché al modificar o eliminar un sensor"""
+    cache_credenciales.invalidar(uid_mac=instance.uid_mac, sensor_id=instance.pk)
+    deduplicador.invalidar(uid_mac=instance.uid_mac, eliminado=signal is post_delete)
+
+
+@receiver(pre_save, sender=Sensor)
+def detectar_uid_modificado(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Anota el UID/MAC anterior si el sensor cambia de UID/MAC (se retira en post_save)"""
+    instance._uid_mac_retirado = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and 'uid_mac' not in update_fields:
+        return
+    anterior = getattr(instance, '_uid_mac_original', None)
+    if anterior is None:
+        if 'uid_mac' in instance.get_deferred_fields():
+            # Sin cargar ni asignar: no cambió
+            return
+        # Instancia construida a mano (no leída con from_db)
+        anterior = Sensor.objects.filter(pk=instance.pk).values_list('uid_mac', flat=True).first()
+    if anterior is not None and anterior != instance.uid_mac:
+        instance._uid_mac_retirado = anterior
+
+
+@receiver(post_save, sender=Sensor)
+def retirar_uid_modificado(sender, instance, raw=False, **kwargs):
+    """Registra el UID/MAC anterior como retirado una vez guardado el cambio"""
+    if raw:
+        return
+    anterior = getattr(instance, '_uid_mac_retirado', None)
+    if anterior is not None:
+        CredencialRetirada.objects.create(uid_mac=anterior)
+        instance._uid_mac_retirado = None
+    if 'uid_mac' not in instance.get_deferred_fields():
+        instance._uid_mac_original = instance.uid_mac
+
+
+@receiver(post_delete, sender=Sensor)
+def retirar_uid_eliminado(sender, instance, **kwargs):
+    """Las bajas de la lista de permitidos incluyen los sensores eliminados"""
+    CredencialRetirada.objects.create(uid_mac=instance.uid_mac)
+
+
+@receiver(pre_delete, sender=Departamento)
+def marcar_sensores_departamento(sender, instance, **kwargs):
+    """
+    Al eliminar un departamento sus sensores quedan sin departamento (SET_NULL, con un UPDATE
+    que no modifica updated_at); se marcan como modificados para la lista de permitidos
+    """
+    Sensor.objects.filter(departamento=instance).update(updated_at=timezone.now())
+
+
+@receiver(pre_delete, sender=Departamento)
+def reasignar_estadisticas_departamento(sender, instance, **kwargs):
+    """Los contadores del departamento eliminado pasan a contarse sin departamento, como sus sensores"""
+    reasignar_departamento(instance.pk)
+
+
+@receiver(pre_delete, sender=Usuario)
+def marcar_sensores_usuario(sender, instance, **kwargs):
+    """
+    Igual que marcar_sensores_departamento: los sensores del usuario eliminado quedan sin
+    usuario (SET_NULL); se marcan como modificados para que cambie el ETag de /api/sensores/
+    """
+    Sensor.objects.filter(usuario=instance).update(updated_at=timezone.now())
+
+
+@receiver([post_save, post_delete], sender=Departamento)
+@receiver([post_save, post_delete], sender=Usuario)
+def invalidar_credenciales_relacionadas(sender, instance, **kwargs):
+    """
+    Las credenciales en caché incluyen el nombre del departamento y del usuario asignado,
+    por lo que cualquier cambio en ellos vacía la caché (y las decisiones recientes)
+    """
+    cache_credenciales.limpiar()
+    deduplicador.limpiar()
+
+
+@receiver([post_save, post_delete], sender=Barrera)
+def invalidar_departamento_barrera(sender, instance, **kwargs):
+    """El departamento de cada barrera se guarda en memoria para las estadísticas"""
+    limpiar_departamentos_barrera()
+
+
+@receiver(pre_delete, sender=Barrera)
+def reasignar_estadisticas_barrera(sender, instance, **kwargs):
+    """Los contadores de la barrera eliminada pasan a contarse sin barrera, como sus eventos"""
+    reasignar_barrera(instance.pk)
+
+
+@receiver(post_delete, sender=Barrera)
+def invalidar_decisiones_barrera(sender, instance, **kwargs):
+    """Registra las lecturas suprimidas en la barrera eliminada sin referenciarla"""
+    deduplicador.invalidar(barrera_id=instance.pk, eliminado=True)
+
+
+@receiver(post_save, sender=Barrera)
+def notificar_estado_barrera(sender, instance, **kwargs):
+    """Publica el estado de la barrera a las pantallas conectadas, una vez confirmado el cambio"""
+    transaction.on_commit(lambda: notificar_barrera(instance))
+
+
+@receiver([post_save, post_delete], sender=Usuario)
+def invalidar_usuario_autenticado(sender, instance, **kwargs):
+    """
+    Invalida el usuario en la caché de autenticación JWT
+    (p. ej. al cambiar su rol o desactivarlo desde UsuarioSerializer.update)
+    """
+    invalidar_usuario(instance.pk)
@@ -1,3 +1,1287 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import io
+import json
+import tempfile
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock, skipIf
+from urllib.parse import urlencode
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.utils import ConnectionHandler
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .archivo import inicio_mes
+from .cache import CacheCredenciales, cache_credenciales, NO_ENCONTRADO
+from .db_pool import PoolAgotado, PoolConexiones
+from .db_router import ReplicaRouter, escritura_reciente
+from .deduplicacion import deduplicador
+from .eventos import EscritorEventos, recuperar_spool, registrar_evento
+from .permitidos import hash_uid
+from .metricas import registro as registro_metricas
+from .perfilado import resumen
+from .notificaciones import CANAL_BARRERAS, CANAL_EVENTOS, broker
+from .parsers import ORJSONParser
+from .renderers import ORJSONRenderer, orjson
+from .serializers import EventoSerializer, UsuarioSerializer
+from .throttling import VerificarAccesoThrottle
+from .models import (
+    Usuario, Departamento, Sensor, Barrera, Evento, EstadisticaAcceso, ArchivoEventos, CredencialRetirada
+)
+
+
+class BaseAPITestCase(APITestCase):
+    """Datos comunes para las pruebas de la API"""
+
+    def setUp(self):
+        cache_credenciales.limpiar()
+        deduplicador.descartar()
+        self.addCleanup(deduplicador.descartar)
+        VerificarAccesoThrottle.limpiar()
+        self.admin = Usuario.objects.create_user(
+            username='admin', password='admin123', rol=Usuario.Rol.ADMIN
+        )
+        self.operador = Usuario.objects.create_user(
+            username='operador', password='operador123', rol=Usuario.Rol.OPERADOR
+        )
+        self.departamento = Departamento.objects.create(nombre='Recepción')
+        self.sensor = Sensor.objects.create(
+            uid_mac='RFID-001-AAA', nombre='Tarjeta Admin', departamento=self.departamento,
+            usuario=self.admin
+        )
+        self.barrera = Barrera.objects.create(nombre='Barrera Principal', departamento=self.departamento)
+        self.client.force_authenticate(self.operador)
+
+
+class CacheCredencialesTests(TestCase):
+
+    def setUp(self):
+        self.departamento = Departamento.objects.create(nombre='Almacén')
+        for i in range(3):
+            Sensor.objects.create(uid_mac=f'UID-{i}', nombre=f'Sensor {i}', departamento=self.departamento)
+        self.cache = CacheCredenciales(max_tamano=2)
+
+    def test_hits_y_misses(self):
+        with self.assertNumQueries(1):
+            self.cache.obtener('UID-0')
+            credencial = self.cache.obtener('UID-0')
+        self.assertEqual(credencial.departamento_nombre, 'Almacén')
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_no_encontrado_se_guarda(self):
+        self.assertIs(self.cache.obtener('NO-EXISTE'), NO_ENCONTRADO)
+        with self.assertNumQueries(0):
+            self.assertIs(self.cache.obtener('NO-EXISTE'), NO_ENCONTRADO)
+
+    def test_entradas_vencen(self):
+        # Un sensor registrado por otro worker (sin la señal en este proceso) se ve al vencer el TTL
+        cache = CacheCredenciales(ttl=5)
+        self.assertIs(cache.obtener('UID-NUEVO'), NO_ENCONTRADO)
+        Sensor.objects.bulk_create([Sensor(uid_mac='UID-NUEVO', nombre='Sensor nuevo')])
+        self.assertIs(cache.obtener('UID-NUEVO'), NO_ENCONTRADO)
+        with mock.patch('access_control.cache.time.monotonic', return_value=time.monotonic() + 6):
+            self.assertEqual(cache.obtener('UID-NUEVO').nombre, 'Sensor nuevo')
+
+    def test_desalojo_lru(self):
+        self.cache.obtener('UID-0')
+        self.cache.obtener('UID-1')
+        self.cache.obtener('UID-0')
+        self.cache.obtener('UID-2')
+        self.assertEqual(self.cache.estadisticas()['tamano'], 2)
+        with self.assertNumQueries(0):
+            self.cache.obtener('UID-0')
+        with self.assertNumQueries(1):
+            self.cache.obtener('UID-1')
+
+
+class VerificarAccesoTests(BaseAPITestCase):
+    url = '/api/sensores/verificar_acceso/'
+
+    def test_acceso_permitido(self):
+        response = self.client.post(self.url, {'uid_mac': 'RFID-001-AAA', 'barrera_id': self.barrera.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['acceso'], 'permitido')
+        self.assertTrue(Evento.objects.filter(
+            tipo=Evento.TipoEvento.ACCESO_PERMITIDO, sensor=self.sensor, barrera=self.barrera
+        ).exists())
+
+    def test_sensor_no_encontrado(self):
+        response = self.client.post(self.url, {'uid_mac': 'NO-EXISTE'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(Evento.objects.filter(tipo=Evento.TipoEvento.ACCESO_DENEGADO).count(), 1)
+
+    def test_desactivar_invalida_cache(self):
+        self.client.post(self.url, {'uid_mac': 'RFID-001-AAA'})
+        self.client.force_authenticate(self.admin)
+        self.client.post(f'/api/sensores/{self.sensor.id}/desactivar/')
+        response = self.client.post(self.url, {'uid_mac': 'RFID-001-AAA'})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.data['acceso'], 'denegado')
+
+    def test_lecturas_repetidas_suprimidas(self):
+        datos = {'uid_mac': 'RFID-001-AAA', 'barrera_id': self.barrera.id}
+        self.client.post(self.url, datos)
+        with self.assertNumQueries(0):
+            for _ in range(2):
+                response = self.client.post(self.url, datos)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data['acceso'], 'permitido')
+        self.assertEqual(Evento.objects.count(), 1)
+
+        # Al invalidar la decisión se registran las lecturas suprimidas
+        deduplicador.invalidar('RFID-001-AAA')
+        agregado = Evento.objects.get(tipo=Evento.TipoEvento.LECTURAS_SUPRIMIDAS)
+        self.assertEqual((agregado.sensor, agregado.barrera), (self.sensor, self.barrera))
+        self.assertTrue(agregado.descripcion.startswith('2 lecturas repetidas'))
+        self.client.post(self.url, datos)
+        self.assertEqual(Evento.objects.filter(tipo=Evento.TipoEvento.ACCESO_PERMITIDO).count(), 2)
+
+    def test_lecturas_suprimidas_no_se_pierden(self):
+        datos = {'uid_mac': 'RFID-001-AAA', 'barrera_id': self.barrera.id}
+        suprimidas = Evento.objects.filter(tipo=Evento.TipoEvento.LECTURAS_SUPRIMIDAS)
+        for _ in range(3):
+            self.client.post(self.url, datos)
+        # Guardar un usuario limpia las decisiones en memoria
+        self.operador.save()
+        self.assertTrue(suprimidas.get().descripcion.startswith('2 lecturas repetidas'))
+
+        # Una ventana vencida se registra con la siguiente lectura, aunque sea de otra tarjeta
+        for _ in range(2):
+            self.client.post(self.url, datos)
+        with mock.patch('access_control.deduplicacion.time.monotonic', return_value=time.monotonic() + 60):
+            self.client.post(self.url, {'uid_mac': 'NO-EXISTE'})
+        self.assertEqual(suprimidas.count(), 2)
+
+    @override_settings(VERIFICAR_ACCESO_VENTANA=0)
+    def test_ventana_desactivada(self):
+        for _ in range(2):
+            self.client.post(self.url, {'uid_mac': 'RFID-001-AAA'})
+        self.assertEqual(Evento.objects.count(), 2)
+
+    @override_settings(VERIFICAR_ACCESO_TASA=1, VERIFICAR_ACCESO_RAFAGA=2)
+    def test_limite_por_cliente(self):
+        codigos = [self.client.post(self.url, {'uid_mac': f'RFID-{i}'}).status_code for i in range(3)]
+        self.assertEqual(codigos, [404, 404, 429])
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.post(self.url, {'uid_mac': 'RFID-3'}).status_code, 404)
+
+
+class EscritorEventosTests(TransactionTestCase):
+
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+
+    def test_escritura_por_lotes(self):
+        escritor = EscritorEventos(self.directorio.name, tamano_lote=10, intervalo=60)
+        for i in range(25):
+            escritor.encolar({
+                'tipo': Evento.TipoEvento.ACCESO_DENEGADO,
+                'descripcion': f'Intento {i}',
+                'timestamp': timezone.now(),
+            })
+        escritor.vaciar(timeout=5)
+        escritor.detener()
+        self.assertEqual(Evento.objects.count(), 25)
+        self.assertEqual(list(Path(self.directorio.name).iterdir()), [])
+
+    def test_recuperar_spool(self):
+        timestamp = timezone.now()
+        ruta = Path(self.directorio.name) / 'eventos-999999-0.jsonl'
+        ruta.write_text(json.dumps({
+            'tipo': Evento.TipoEvento.CIERRE_MANUAL,
+            'descripcion': 'Pendiente',
+            'timestamp': timestamp.isoformat(),
+        }) + '\n', encoding='utf-8')
+        self.assertEqual(recuperar_spool(self.directorio.name), 1)
+        self.assertEqual(Evento.objects.get().timestamp, timestamp)
+        self.assertFalse(ruta.exists())
+
+
+class EventoPaginacionTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        ahora = timezone.now()
+        # Timestamps repetidos para verificar el desempate por id
+        Evento.objects.bulk_create([
+            Evento(tipo=Evento.TipoEvento.ACCESO_PERMITIDO, timestamp=ahora - timezone.timedelta(minutes=i // 2))
+            for i in range(25)
+        ])
+
+    def test_paginacion_por_cursor_recorre_todo_sin_repetir(self):
+        vistos = []
+        url = '/api/eventos/?paginacion=cursor'
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertNotIn('count', response.data)
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            vistos.extend(evento['id'] for evento in response.data['results'])
+            url = response.data['next']
+        esperados = list(Evento.objects.order_by('-timestamp', '-id').values_list('id', flat=True))
+        self.assertEqual(vistos, esperados)
+
+    def test_cursor_anterior(self):
+        primera = self.client.get('/api/eventos/?paginacion=cursor').data
+        segunda = self.client.get(primera['next']).data
+        anterior = self.client.get(segunda['previous']).data
+        self.assertEqual(anterior['results'], primera['results'])
+        self.assertIsNone(anterior['previous'])
+
+    def test_cursor_invalido(self):
+        response = self.client.get('/api/eventos/?cursor=no-es-un-cursor')
+        self.assertEqual(response.status_code, 404)
+
+    def test_paginacion_por_pagina_por_defecto(self):
+        response = self.client.get('/api/eventos/?page=2')
+        self.assertEqual(response.data['count'], 25)
+
+
+class ConsultasListadoTests(BaseAPITestCase):
+    """La cantidad de consultas de los listados no debe depender del tamaño de la página"""
+
+    def crear_filas(self, desde, hasta):
+        for i in range(desde, hasta):
+            usuario = Usuario.objects.create(username=f'usuario{i}')
+            departamento = Departamento.objects.create(nombre=f'Departamento {i}')
+            sensor = Sensor.objects.create(
+                uid_mac=f'UID-{i}', nombre=f'Sensor {i}', departamento=departamento, usuario=usuario
+            )
+            barrera = Barrera.objects.create(nombre=f'Barrera {i}', departamento=departamento)
+            Evento.objects.create(
+                tipo=Evento.TipoEvento.APERTURA_MANUAL, sensor=sensor, barrera=barrera,
+                usuario_responsable=usuario
+            )
+
+    def listar(self, url, consultas):
+        with self.assertNumQueries(consultas):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(response.data['results'])
+
+    def test_consultas_constantes(self):
+        # COUNT(*) + SELECT con JOIN, más el agregado del ETag en los catálogos
+        urls = (('/api/eventos/', 2), ('/api/sensores/', 3), ('/api/barreras/', 3))
+        self.crear_filas(0, 1)
+        for url, consultas in urls:
+            with self.subTest(url=url):
+                self.listar(url, consultas)
+        self.crear_filas(1, 12)
+        for url, consultas in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.listar(url, consultas), 10)
+
+
+class CamposDinamicosTests(BaseAPITestCase):
+
+    def listar(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        # La consulta del listado es la que trae las filas (la última)
+        return response, consultas.captured_queries[-1]['sql']
+
+    def test_fields_recorta_respuesta_y_columnas(self):
+        response, sql = self.listar('/api/sensores/?fields=id,nombre,estado')
+        self.assertEqual(list(response.data['results'][0]), ['id', 'nombre', 'estado'])
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('descripcion', sql)
+
+    def test_omit_y_relaciones_mostradas(self):
+        response, sql = self.listar('/api/sensores/?omit=descripcion,usuario_nombre,usuario')
+        fila = response.data['results'][0]
+        self.assertNotIn('descripcion', fila)
+        self.assertEqual(fila['departamento_nombre'], 'Recepción')
+        self.assertIn('access_control_departamento', sql)
+        self.assertNotIn('access_control_usuario', sql)
+        # Sin consultas adicionales por fila para los nombres
+        Sensor.objects.create(uid_mac='RFID-002-BBB', nombre='Otra tarjeta', departamento=self.departamento)
+        with self.assertNumQueries(3):
+            self.client.get('/api/sensores/?fields=id,departamento_nombre')
+
+    def test_detalle_y_cursor(self):
+        response = self.client.get(f'/api/barreras/{self.barrera.id}/?fields=id,nombre')
+        self.assertEqual(response.data, {'id': self.barrera.id, 'nombre': 'Barrera Principal'})
+        for _ in range(11):
+            Evento.objects.create(tipo=Evento.TipoEvento.APERTURA_MANUAL, barrera=self.barrera)
+        # El timestamp se carga aunque no se pida, para armar el cursor sin consultas extra
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/eventos/?paginacion=cursor&fields=id,tipo')
+        self.assertEqual(list(response.data['results'][0]), ['id', 'tipo'])
+        self.assertEqual(len(self.client.get(response.data['next']).data['results']), 1)
+
+    def test_campo_desconocido(self):
+        response = self.client.get('/api/eventos/?fields=id,clave')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('clave', response.data['details']['fields'])
+        response = self.client.get('/api/usuarios/?fields=password')
+        self.assertEqual(response.status_code, 400)
+
+
+class EventoFiltrosTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        ahora = timezone.now()
+        otra = Barrera.objects.create(nombre='Barrera Almacén', departamento=self.departamento)
+        Evento.objects.bulk_create([
+            Evento(tipo=Evento.TipoEvento.ACCESO_DENEGADO, barrera=self.barrera, timestamp=ahora),
+            Evento(tipo=Evento.TipoEvento.ACCESO_DENEGADO, barrera=self.barrera,
+                   timestamp=ahora - timezone.timedelta(hours=3)),
+            Evento(tipo=Evento.TipoEvento.ACCESO_PERMITIDO, barrera=self.barrera, sensor=self.sensor,
+                   timestamp=ahora),
+            Evento(tipo=Evento.TipoEvento.ACCESO_DENEGADO, barrera=otra, timestamp=ahora),
+        ])
+        self.hace_una_hora = (ahora - timezone.timedelta(hours=1)).isoformat()
+
+    def test_denegados_en_barrera_ultima_hora(self):
+        response = self.client.get('/api/eventos/', {
+            'tipo': 'ACCESO_DENEGADO', 'barrera': self.barrera.id, 'desde': self.hace_una_hora
+        })
+        self.assertEqual(response.data['count'], 1)
+
+    def test_varios_tipos_y_sensor(self):
+        response = self.client.get('/api/eventos/', {'tipo': 'ACCESO_PERMITIDO,CIERRE_MANUAL'})
+        self.assertEqual(response.data['count'], 1)
+        response = self.client.get('/api/eventos/', {'sensor': self.sensor.id})
+        self.assertEqual(response.data['count'], 1)
+
+    def test_hasta_solo_fecha_incluye_el_dia(self):
+        hoy = timezone.localdate().isoformat()
+        response = self.client.get('/api/eventos/', {'desde': hoy, 'hasta': hoy})
+        self.assertEqual(response.data['count'], Evento.objects.filter(
+            timestamp__date=timezone.localdate()).count())
+
+    def test_parametros_invalidos(self):
+        for params in ({'tipo': 'OTRO'}, {'barrera': 'abc'}, {'desde': 'ayer'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/eventos/', params).status_code, 400)
+
+
+class VerificarAccesoLoteTests(BaseAPITestCase):
+    url = '/api/sensores/verificar_acceso_lote/'
+
+    @override_settings(ESTADISTICAS_HABILITADAS=False)
+    def test_lote_en_orden_con_consultas_constantes(self):
+        Sensor.objects.create(uid_mac='RFID-BLOQ', nombre='Bloqueado', estado=Sensor.Estado.BLOQUEADO)
+        timestamp = (timezone.now() - timezone.timedelta(hours=2)).replace(microsecond=0)
+        lecturas = [
+            {'uid_mac': 'RFID-001-AAA', 'barrera_id': self.barrera.id, 'timestamp': timestamp.isoformat()},
+            {'uid_mac': 'RFID-BLOQ', 'barrera_id': self.barrera.id},
+            {'uid_mac': 'NO-EXISTE'},
+            {'barrera_id': self.barrera.id},
+            {'uid_mac': 'RFID-001-AAA', 'barrera_id': 999999},
+        ]
+        # Sensores (uid_mac__in) + barreras (id__in) + un INSERT
+        with self.assertNumQueries(3):
+            response = self.client.post(self.url, lecturas, format='json')
+        self.assertEqual(response.status_code, 200)
+        decisiones = [r.get('acceso', r.get('error')) for r in response.data['resultados']]
+        self.assertEqual(decisiones, ['permitido', 'denegado', 'denegado', 'uid_mac es requerido', 'permitido'])
+        self.assertEqual(Evento.objects.count(), 4)
+        evento = Evento.objects.get(timestamp=timestamp)
+        self.assertEqual((evento.sensor, evento.barrera), (self.sensor, self.barrera))
+        self.assertFalse(Evento.objects.filter(barrera_id=999999).exists())
+
+    def test_lote_vacio_o_excedido(self):
+        self.assertEqual(self.client.post(self.url, [], format='json').status_code, 400)
+        with self.settings(VERIFICAR_ACCESO_LOTE_MAX=1):
+            response = self.client.post(self.url, {'lecturas': [{'uid_mac': 'A'}, {'uid_mac': 'B'}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class EventoExportarTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        ahora = timezone.now()
+        Evento.objects.bulk_create([
+            Evento(tipo=Evento.TipoEvento.ACCESO_PERMITIDO, sensor=self.sensor, barrera=self.barrera,
+                   descripcion=f'Evento, "{i}"', timestamp=ahora - timezone.timedelta(minutes=i))
+            for i in range(5)
+        ] + [Evento(tipo=Evento.TipoEvento.ACCESO_DENEGADO, timestamp=ahora)])
+
+    def contenido(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_exportar_csv_por_lotes(self):
+        with self.settings(EVENTOS_EXPORTAR_LOTE=2):
+            response = self.client.get('/api/eventos/exportar/', {'tipo': 'ACCESO_PERMITIDO'})
+            lineas = list(csv.reader(io.StringIO(self.contenido(response))))
+        self.assertEqual(lineas[0][:3], ['id', 'timestamp', 'tipo'])
+        self.assertEqual(len(lineas), 6)
+        self.assertEqual(lineas[1][4], 'Tarjeta Admin')
+        self.assertEqual(lineas[1][10], 'Evento, "4"')
+        # Orden cronológico
+        self.assertEqual([l[1] for l in lineas[1:]], sorted(l[1] for l in lineas[1:]))
+
+    def test_exportar_ndjson(self):
+        response = self.client.get('/api/eventos/exportar/', {'formato': 'ndjson'})
+        filas = [json.loads(linea) for linea in self.contenido(response).splitlines()]
+        self.assertEqual(len(filas), 6)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+    def test_formato_invalido(self):
+        self.assertEqual(self.client.get('/api/eventos/exportar/', {'formato': 'xml'}).status_code, 400)
+
+
+@override_settings(VERIFICAR_ACCESO_VENTANA=0)
+class EstadisticasTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        url = '/api/sensores/verificar_acceso/'
+        # Los contadores se actualizan al confirmar la transacción del evento
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'uid_mac': 'RFID-001-AAA', 'barrera_id': self.barrera.id})
+            self.client.post(url, {'uid_mac': 'RFID-001-AAA', 'barrera_id': self.barrera.id})
+            self.sensor.estado = Sensor.Estado.BLOQUEADO
+            self.sensor.save()
+            self.client.post(url, {'uid_mac': 'RFID-001-AAA'})
+
+    def totales(self):
+        return sorted(EstadisticaAcceso.objects.values_list(
+            'granularidad', 'periodo', 'barrera_id', 'departamento_id', 'tipo', 'total'
+        ), key=lambda fila: (fila[0], fila[1], fila[2] or 0, fila[3] or 0, fila[4]))
+
+    def test_contadores_incrementales(self):
+        horas = {
+            (fila['tipo'], fila['barrera']): fila['total']
+            for fila in self.client.get('/api/estadisticas/').data['results']
+        }
+        self.assertEqual(horas, {
+            (Evento.TipoEvento.ACCESO_PERMITIDO, self.barrera.id): 2,
+            (Evento.TipoEvento.ACCESO_DENEGADO, None): 1,
+        })
+
+    def test_reconstruir_coincide_con_incremental(self):
+        incrementales = self.totales()
+        EstadisticaAcceso.objects.all().delete()
+        call_command('reconstruir_estadisticas', stdout=io.StringIO())
+        self.assertEqual(self.totales(), incrementales)
+
+    def test_eliminar_barrera_coincide_con_reconstruir(self):
+        # Una barrera de otro departamento que el sensor: sin barrera, cuenta el del sensor
+        bodega = Departamento.objects.create(nombre='Bodega')
+        barrera = Barrera.objects.create(nombre='Barrera Bodega', departamento=bodega)
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_evento(tipo=Evento.TipoEvento.APERTURA_MANUAL, sensor_id=self.sensor.id, barrera_id=barrera.id)
+        barrera_id = barrera.id
+        barrera.delete()
+        incrementales = self.totales()
+        self.assertNotIn(barrera_id, [fila[2] for fila in incrementales])
+        call_command('reconstruir_estadisticas', stdout=io.StringIO())
+        self.assertEqual(self.totales(), incrementales)
+
+    def test_eliminar_departamento_coincide_con_reconstruir(self):
+        # Un sensor de otro departamento leyendo en la barrera del departamento eliminado
+        bodega = Departamento.objects.create(nombre='Bodega')
+        otro = Sensor.objects.create(uid_mac='RFID-002-BBB', nombre='Tarjeta Bodega', departamento=bodega)
+        # Ya hay contadores sin departamento: los del departamento eliminado se suman a ellos
+        sin_departamento = Sensor.objects.create(uid_mac='RFID-003-CCC', nombre='Tarjeta sin departamento')
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_evento(tipo=Evento.TipoEvento.APERTURA_MANUAL, sensor_id=otro.id, barrera_id=self.barrera.id)
+            registrar_evento(tipo=Evento.TipoEvento.ACCESO_DENEGADO, sensor_id=sin_departamento.id)
+        departamento_id = self.departamento.id
+        self.departamento.delete()
+        incrementales = self.totales()
+        self.assertNotIn(departamento_id, [fila[3] for fila in incrementales])
+        self.assertEqual(sum(fila[5] for fila in incrementales), 2 * Evento.objects.count())
+        call_command('reconstruir_estadisticas', stdout=io.StringIO())
+        self.assertEqual(self.totales(), incrementales)
+
+    def test_contadores_al_confirmar(self):
+        filtro = EstadisticaAcceso.objects.filter(tipo=Evento.TipoEvento.APERTURA_MANUAL)
+        # Un evento revertido no se cuenta
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            registrar_evento(tipo=Evento.TipoEvento.APERTURA_MANUAL, barrera_id=self.barrera.id)
+            transaction.set_rollback(True)
+        self.assertFalse(filtro.exists())
+        with self.captureOnCommitCallbacks() as callbacks:
+            registrar_evento(tipo=Evento.TipoEvento.APERTURA_MANUAL, barrera_id=self.barrera.id)
+            self.assertFalse(filtro.exists())
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertEqual(filtro.count(), 2)  # hora y día
+
+    def test_resumen_por_departamento(self):
+        response = self.client.get('/api/estadisticas/resumen/')
+        self.assertEqual(response.data['resultados'], [{
+            'departamento': self.departamento.id, 'departamento_nombre': 'Recepción', 'total': 3,
+            'permitidos': 2, 'denegados': 1, 'tasa_denegacion': 0.3333,
+        }])
+
+
+class CachedJWTAuthenticationTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client.force_authenticate(None)
+        token = self.client.post('/api/token/', {'username': 'operador', 'password': 'operador123'}).data
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token["access"]}')
+
+    def test_usuario_desde_cache(self):
+        with self.assertNumQueries(2):  # usuario + COUNT(*)
+            self.client.get('/api/eventos/')
+        with self.assertNumQueries(1):  # solo COUNT(*)
+            response = self.client.get('/api/eventos/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_permisos_con_usuario_en_cache(self):
+        self.client.get('/api/eventos/')
+        response = self.client.post('/api/departamentos/', {'nombre': 'Bodega'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_invalidacion_al_desactivar(self):
+        self.client.get('/api/eventos/')
+        serializer = UsuarioSerializer(self.operador, data={'is_active': False}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertEqual(self.client.get('/api/eventos/').status_code, 401)
+
+    def test_invalidacion_al_cambiar_rol(self):
+        self.client.get('/api/eventos/')
+        self.operador.rol = Usuario.Rol.ADMIN
+        self.operador.save()
+        response = self.client.post('/api/departamentos/', {'nombre': 'Bodega'})
+        self.assertEqual(response.status_code, 201)
+
+
+class VistasAsyncTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        token = AccessToken.for_user(self.operador)
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    async def test_verificar_acceso_permitido(self):
+        response = await self.async_client.post(
+            '/api/async/sensores/verificar_acceso/',
+            {'uid_mac': 'RFID-001-AAA', 'barrera_id': self.barrera.id},
+            content_type='application/json', headers=self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['acceso'], 'permitido')
+        evento = await Evento.objects.aget()
+        self.assertEqual(evento.tipo, Evento.TipoEvento.ACCESO_PERMITIDO)
+        self.assertEqual(evento.barrera_id, self.barrera.id)
+
+    async def test_verificar_acceso_sensor_inexistente(self):
+        response = await self.async_client.post(
+            '/api/async/sensores/verificar_acceso/', {'uid_mac': 'NO-EXISTE'}, headers=self.headers
+        )
+        self.assertEqual(response.status_code, 404)
+        evento = await Evento.objects.aget()
+        self.assertEqual(evento.tipo, Evento.TipoEvento.ACCESO_DENEGADO)
+
+    async def test_requiere_autenticacion(self):
+        response = await self.async_client.post(
+            '/api/async/sensores/verificar_acceso/', {'uid_mac': 'RFID-001-AAA'}
+        )
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['status_code'], 401)
+        self.assertFalse(await Evento.objects.aexists())
+
+    async def test_metodo_no_permitido(self):
+        response = await self.async_client.get(
+            f'/api/async/barreras/{self.barrera.id}/abrir/', headers=self.headers
+        )
+        self.assertEqual(response.status_code, 405)
+
+    async def test_abrir_y_cerrar_barrera(self):
+        response = await self.async_client.post(
+            f'/api/async/barreras/{self.barrera.id}/abrir/', headers=self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['barrera']['estado'], Barrera.Estado.ABIERTA)
+        evento = await Evento.objects.aget()
+        self.assertEqual(evento.tipo, Evento.TipoEvento.APERTURA_MANUAL)
+        self.assertEqual(evento.usuario_responsable_id, self.operador.id)
+
+        response = await self.async_client.post(
+            f'/api/async/barreras/{self.barrera.id}/cerrar/', headers=self.headers
+        )
+        await self.barrera.arefresh_from_db()
+        self.assertEqual(self.barrera.estado, Barrera.Estado.CERRADA)
+
+    async def test_barrera_inexistente(self):
+        response = await self.async_client.post('/api/async/barreras/999/abrir/', headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+
+class MetricasTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        registro_metricas.limpiar()
+
+    @override_settings(DEBUG=True)
+    def test_metricas_de_verificar_acceso(self):
+        self.client.post('/api/sensores/verificar_acceso/', {'uid_mac': 'RFID-001-AAA'})
+        self.client.post('/api/sensores/verificar_acceso/', {'uid_mac': 'NO-EXISTE'})
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        lineas = response.content.decode().splitlines()
+        for linea in [
+            'smartconnect_decisiones_acceso_total{resultado="permitido"} 1',
+            'smartconnect_decisiones_acceso_total{resultado="no_encontrado"} 1',
+            'smartconnect_peticiones_total{vista="sensor-verificar-acceso",metodo="POST",codigo="200"} 1',
+            'smartconnect_peticion_consultas_count{vista="sensor-verificar-acceso"} 2',
+            'smartconnect_eventos_escritos_total{operacion="insert"} 2',
+        ]:
+            self.assertIn(linea, lineas)
+        self.assertIn('smartconnect_cache_aciertos_total{cache="credenciales"}', response.content.decode())
+        # Cada verificación hace al menos el INSERT del evento
+        self.assertIn(
+            'smartconnect_peticion_consultas_bucket{vista="sensor-verificar-acceso",le="0"} 0', lineas
+        )
+
+    @override_settings(METRICAS_TOKEN='secreto')
+    def test_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        response = self.client.get('/metrics', headers={'Authorization': 'Bearer secreto'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_sin_token_fuera_de_debug(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+
+@override_settings(PERFILADO_TOKEN='secreto')
+class PerfiladoTests(BaseAPITestCase):
+
+    def test_perfilado_con_header(self):
+        with self.assertLogs('smartconnect.perfilado') as logs:
+            response = self.client.get('/api/sensores/', headers={'X-Perfilado': 'secreto'})
+        self.assertEqual(response['X-Perfilado-Consultas'], '3')
+        self.assertIn('sql;dur=', response['Server-Timing'])
+        registro = json.loads(logs.records[0].getMessage())
+        self.assertEqual((registro['vista'], registro['consultas']), ('sensor-list', 3))
+        self.assertTrue(registro['detalle'][0]['origen'][0].startswith('access_control/'))
+
+    def test_log_sin_parametros(self):
+        with self.assertLogs('smartconnect.perfilado') as logs:
+            self.client.post(
+                '/api/sensores/verificar_acceso/', {'uid_mac': 'RFID-001-AAA'}, headers={'X-Perfilado': 'secreto'}
+            )
+            self.client.get('/api/sensores/', headers={'X-Perfilado': 'secreto'})
+            self.client.get('/api/sensores/', headers={'X-Perfilado': 'secreto'})
+        self.assertNotIn('RFID-001-AAA', logs.records[0].getMessage())
+        primero, segundo = (json.loads(record.getMessage()) for record in logs.records[1:])
+        self.assertNotIn('params', primero['detalle'][0])
+        # El mismo SQL con los mismos parámetros tiene el mismo hash
+        self.assertEqual(
+            [consulta['params_hash'] for consulta in primero['detalle']],
+            [consulta['params_hash'] for consulta in segundo['detalle']],
+        )
+
+    @override_settings(PERFILADO_UMBRAL_MS=60000)
+    def test_sin_header_no_se_perfila(self):
+        for valor in (None, 'otro'):
+            headers = {'X-Perfilado': valor} if valor else {}
+            response = self.client.get('/api/sensores/', headers=headers)
+            self.assertNotIn('X-Perfilado-Consultas', response)
+
+    def test_consultas_repetidas(self):
+        consultas = [
+            {'sql': 'SELECT a WHERE id = %s', 'params_hash': 'a1', 'ms': 1.0, 'origen': []},
+            {'sql': 'SELECT a WHERE id = %s', 'params_hash': 'b2', 'ms': 1.0, 'origen': []},
+            {'sql': 'SELECT a WHERE id = %s', 'params_hash': 'b2', 'ms': 1.0, 'origen': []},
+            {'sql': 'SELECT b', 'params_hash': 'c3', 'ms': 0.5, 'origen': []},
+        ]
+        datos = resumen(consultas)
+        self.assertEqual((datos['consultas'], datos['sql_ms']), (4, 3.5))
+        self.assertEqual([grupo['cantidad'] for grupo in datos['duplicadas']], [2])
+        self.assertEqual([grupo['cantidad'] for grupo in datos['similares']], [3])
+
+
+@skipIf(orjson is None, 'orjson no está instalado')
+class ORJSONTests(BaseAPITestCase):
+
+    def datos(self):
+        Evento.objects.create(tipo=Evento.TipoEvento.ACCESO_PERMITIDO, sensor=self.sensor, barrera=self.barrera)
+        return {
+            'eventos': EventoSerializer(Evento.objects.all(), many=True).data,
+            'fechas': [timezone.now(), timezone.now().replace(tzinfo=None), date(2026, 1, 31)],
+            'otros': [Decimal('10.50'), uuid.uuid4(), timedelta(minutes=5), gettext_lazy('Recepción')],
+            1: 'clave numérica',
+            'separador': 'línea\u2028párrafo\u2029',
+        }
+
+    def test_mismo_json_que_drf(self):
+        datos = self.datos()
+        rapido = ORJSONRenderer().render(datos, 'application/json')
+        self.assertEqual(json.loads(rapido), json.loads(JSONRenderer().render(datos, 'application/json')))
+        self.assertIn(b'\\u2028', rapido)
+        # Con indentación (API navegable) y sin orjson se usa JSONRenderer
+        self.assertEqual(
+            ORJSONRenderer().render(datos, 'application/json; indent=4'),
+            JSONRenderer().render(datos, 'application/json; indent=4'),
+        )
+        with mock.patch('access_control.renderers.orjson', None):
+            self.assertEqual(ORJSONRenderer().render(datos), JSONRenderer().render(datos))
+
+    def test_parser(self):
+        parser = ORJSONParser()
+        contexto = {'encoding': 'utf-8'}
+        self.assertEqual(
+            parser.parse(io.BytesIO('{"uid_mac": "ñ-1", "barrera_id": 2}'.encode()), None, contexto),
+            {'uid_mac': 'ñ-1', 'barrera_id': 2},
+        )
+        for cuerpo in (b'{"uid_mac": ', b'{"valor": NaN}'):
+            with self.subTest(cuerpo=cuerpo), self.assertRaises(ParseError):
+                parser.parse(io.BytesIO(cuerpo), None, contexto)
+        self.assertEqual(
+            parser.parse(io.BytesIO('{"nombre": "Recepción"}'.encode('latin-1')), None, {'encoding': 'latin-1'}),
+            {'nombre': 'Recepción'},
+        )
+
+
+class NotificacionesTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.token = str(AccessToken.for_user(self.operador))
+
+    async def _siguiente(self, contenido):
+        return (await asyncio.wait_for(anext(contenido), 2)).decode()
+
+    async def test_stream_recibe_mensajes_del_canal(self):
+        response = await self.async_client.get(f'/api/stream/?canales=barreras&token={self.token}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        contenido = aiter(response.streaming_content)
+        try:
+            self.assertTrue((await self._siguiente(contenido)).startswith(':'))
+            self.assertEqual(broker.publicar(CANAL_EVENTOS, {'tipo': 'ACCESO_PERMITIDO'}), 0)
+            self.assertEqual(broker.publicar(CANAL_BARRERAS, {'id': 1, 'estado': 'ABIERTA'}), 1)
+            mensaje = await self._siguiente(contenido)
+        finally:
+            await contenido.aclose()
+        self.assertTrue(mensaje.startswith('event: barrera\ndata: '))
+        self.assertEqual(json.loads(mensaje.split('data: ')[1])['estado'], 'ABIERTA')
+
+    async def test_stream_requiere_token(self):
+        response = await self.async_client.get('/api/stream/')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_stream_canal_invalido(self):
+        response = await self.async_client.get(f'/api/stream/?canales=sensores&token={self.token}')
+        self.assertEqual(response.status_code, 400)
+
+    def test_abrir_barrera_publica_estado_y_evento(self):
+        with mock.patch.object(broker, 'publicar') as publicar, \
+                mock.patch.object(broker, 'cantidad_suscripciones', return_value=1), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/barreras/{self.barrera.id}/abrir/')
+        mensajes = {canal: datos for (canal, datos), _ in publicar.call_args_list}
+        self.assertEqual(mensajes[CANAL_BARRERAS]['estado'], Barrera.Estado.ABIERTA)
+        self.assertEqual(mensajes[CANAL_EVENTOS]['tipo'], Evento.TipoEvento.APERTURA_MANUAL)
+
+
+class ConditionalGetTests(BaseAPITestCase):
+
+    def test_lista_no_modificada(self):
+        response = self.client.get('/api/sensores/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(1):  # solo el agregado, sin listado ni serialización
+            response = self.client.get('/api/sensores/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+    def test_etag_cambia_al_modificar(self):
+        etag = self.client.get('/api/barreras/')['ETag']
+        self.departamento.nombre = 'Recepción Norte'
+        self.departamento.save()
+        response = self.client.get('/api/barreras/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['departamento_nombre'], 'Recepción Norte')
+
+    def test_etag_cambia_al_eliminar(self):
+        Departamento.objects.create(nombre='Bodega')
+        etag = self.client.get('/api/departamentos/')['ETag']
+        Departamento.objects.filter(nombre='Bodega').delete()
+        response = self.client.get('/api/departamentos/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_cambia_al_eliminar_usuario_asignado(self):
+        etag = self.client.get('/api/sensores/')['ETag']
+        self.admin.delete()
+        response = self.client.get('/api/sensores/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['results'][0].get('usuario_nombre'))
+
+    def test_etag_depende_de_la_pagina(self):
+        self.assertNotEqual(
+            self.client.get('/api/sensores/')['ETag'], self.client.get('/api/sensores/?page=1')['ETag']
+        )
+
+    def test_detalle(self):
+        url = f'/api/sensores/{self.sensor.id}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.sensor.estado = Sensor.Estado.BLOQUEADO
+        self.sensor.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get('/api/sensores/999/').status_code, 404)
+
+
+class ImportarSensoresTests(BaseAPITestCase):
+    url = '/api/sensores/importar/'
+    contenido = (
+        'uid_mac,nombre,estado,departamento,usuario\n'
+        'RFID-100,Tarjeta Nueva,,Recepción,admin\n'
+        'RFID-001-AAA,Tarjeta Repetida,,,\n'
+        'RFID-101,Tarjeta Bloqueada,bloqueado,,\n'
+        'RFID-101,Tarjeta Duplicada,,,\n'
+        'RFID-102,AB,,,\n'
+        'RFID-103,Tarjeta Sin Depto,,Bodega,\n'
+        'RFID-104,Tarjeta Estado,ROTO,,\n'
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+
+    def subir(self, contenido=None, nombre='sensores.csv', **params):
+        archivo = io.BytesIO(contenido if contenido is not None else self.contenido.encode())
+        archivo.name = nombre
+        return self.client.post(f'{self.url}?{urlencode(params)}', {'archivo': archivo}, format='multipart')
+
+    def test_importar_csv(self):
+        # Un UID/MAC desconocido queda en caché como no encontrado hasta la importación
+        verificar = '/api/sensores/verificar_acceso/'
+        self.assertEqual(self.client.post(verificar, {'uid_mac': 'RFID-100'}).status_code, 404)
+
+        response = self.subir()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['filas'], response.data['creados']), (7, 2))
+        errores = {error['fila']: error['errores'] for error in response.data['errores']}
+        self.assertEqual(sorted(errores), [3, 5, 6, 7, 8])
+        self.assertIn('uid_mac', errores[3])
+        self.assertEqual(errores[5]['uid_mac'], 'UID/MAC repetido en el archivo')
+        self.assertIn('nombre', errores[6])
+        self.assertEqual(errores[7]['departamento'], 'No existe: Bodega')
+        self.assertIn('estado', errores[8])
+
+        sensor = Sensor.objects.get(uid_mac='RFID-100')
+        self.assertEqual((sensor.departamento, sensor.usuario), (self.departamento, self.admin))
+        self.assertEqual(Sensor.objects.get(uid_mac='RFID-101').estado, Sensor.Estado.BLOQUEADO)
+        self.assertEqual(self.client.post(verificar, {'uid_mac': 'RFID-100'}).status_code, 200)
+
+    def test_consultas_por_lote(self):
+        # UID/MAC existentes, departamentos, usuarios e INSERT (con su savepoint)
+        with self.assertNumQueries(6):
+            self.subir()
+
+    def test_simular(self):
+        response = self.subir(simular='true')
+        self.assertEqual((response.data['creados'], response.data['con_errores']), (2, 5))
+        self.assertFalse(Sensor.objects.filter(uid_mac='RFID-100').exists())
+
+    def test_columnas_requeridas(self):
+        self.contenido = 'uid_mac,estado\nRFID-100,ACTIVO\n'
+        response = self.subir()
+        self.assertEqual(response.status_code, 400)
+
+    def test_solo_admin(self):
+        self.client.force_authenticate(self.operador)
+        self.assertEqual(self.subir().status_code, 403)
+
+    def test_archivo_ilegible(self):
+        response = self.subir(self.contenido.encode('cp1252'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('UTF-8', response.data['details']['archivo'])
+        self.assertFalse(Sensor.objects.filter(uid_mac='RFID-100').exists())
+
+        from openpyxl import Workbook
+
+        planilla = io.BytesIO()
+        libro = Workbook()
+        libro.active.append(['uid_mac', 'nombre'])
+        libro.save(planilla)
+        truncada = planilla.getvalue()[:len(planilla.getvalue()) // 2]
+        response = self.subir(truncada, nombre='sensores.xlsx')
+        self.assertEqual(response.status_code, 400)
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = Path(directorio) / 'sensores.xlsx'
+            ruta.write_bytes(truncada)
+            with self.assertRaisesMessage(CommandError, 'XLSX válido'):
+                call_command('importar_sensores', str(ruta), stdout=io.StringIO())
+
+    def test_comando_xlsx(self):
+        from openpyxl import Workbook
+
+        libro = Workbook()
+        for fila in csv.reader(io.StringIO(self.contenido)):
+            libro.active.append(fila)
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = Path(directorio) / 'sensores.xlsx'
+            libro.save(ruta)
+            salida = io.StringIO()
+            call_command('importar_sensores', str(ruta), '--lote', '2', stdout=salida)
+        self.assertIn('2 sensores creados de 7 filas, 5 con errores', salida.getvalue())
+        self.assertEqual(Sensor.objects.filter(uid_mac__in=['RFID-100', 'RFID-101']).count(), 2)
+
+
+class ReplicaLecturaTests(BaseAPITestCase):
+    """La réplica se simula con el alias 'default' para registrar el ruteo de cada lectura"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        for modulo in ('access_control.db_router', 'access_control.mixins'):
+            patcher = mock.patch(f'{modulo}.ALIAS_REPLICA', 'default')
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.lecturas = []
+        original = ReplicaRouter.db_for_read
+
+        def registrar(router, model, **hints):
+            alias = original(router, model, **hints)
+            self.lecturas.append(alias)
+            return alias
+
+        patcher = mock.patch.object(ReplicaRouter, 'db_for_read', autospec=True, side_effect=registrar)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_listados_y_reportes_en_replica(self):
+        for url in ('/api/eventos/', '/api/estadisticas/resumen/', '/api/sensores/'):
+            self.lecturas.clear()
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertTrue(self.lecturas)
+            self.assertEqual(set(self.lecturas), {'default'}, url)
+
+    def test_verificar_acceso_en_principal(self):
+        self.client.post('/api/sensores/verificar_acceso/', {'uid_mac': 'RFID-001-AAA'})
+        self.client.get('/api/sensores/permitidos/')
+        self.assertEqual(set(self.lecturas), {None})
+        self.assertFalse(escritura_reciente(self.operador.pk))
+
+    def test_leer_lo_escrito(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.patch(f'/api/barreras/{self.barrera.id}/', {'nombre': 'Barrera Norte'})
+        self.assertEqual(response.status_code, 200)
+        self.lecturas.clear()
+        self.assertEqual(self.client.get('/api/barreras/').data['results'][0]['nombre'], 'Barrera Norte')
+        self.assertEqual(set(self.lecturas), {None})
+
+
+class PoolConexionesTests(TestCase):
+
+    class Conexion:
+        def __init__(self):
+            self.cerrada = False
+            self.valida = True
+
+        def ping(self):
+            if not self.valida:
+                raise OSError('conexión perdida')
+
+    def crear_pool(self, **opciones):
+        self.creadas = []
+
+        def crear():
+            self.creadas.append(self.Conexion())
+            return self.creadas[-1]
+
+        opciones = {'tamano': 1, 'desborde': 1, 'timeout': 0.05, **opciones}
+        return PoolConexiones(
+            'prueba', crear=crear, cerrar=lambda conexion: setattr(conexion, 'cerrada', True),
+            validar=lambda conexion: conexion.ping(), **opciones
+        )
+
+    def test_reutiliza_y_cierra_desborde(self):
+        pool = self.crear_pool()
+        primera, segunda = pool.obtener(), pool.obtener()
+        with self.assertRaises(PoolAgotado):
+            pool.obtener()
+        pool.devolver(primera)
+        pool.devolver(segunda)
+        # Solo se mantienen `tamano` conexiones libres; la de desborde se cierra
+        self.assertEqual(pool.estado(), {'abiertas': 1, 'libres': 1})
+        self.assertTrue(segunda.cerrada)
+        self.assertIs(pool.obtener(), primera)
+        self.assertEqual(len(self.creadas), 2)
+
+    def test_espera_conexion_devuelta(self):
+        pool = self.crear_pool(desborde=0, timeout=5)
+        conexion = pool.obtener()
+        threading.Timer(0.05, pool.devolver, [conexion]).start()
+        self.assertIs(pool.obtener(), conexion)
+
+    def test_reemplaza_conexion_invalida_o_descartada(self):
+        pool = self.crear_pool(validar_despues=0)
+        conexion = pool.obtener()
+        pool.devolver(conexion)
+        conexion.valida = False
+        nueva = pool.obtener()
+        self.assertIsNot(nueva, conexion)
+        self.assertTrue(conexion.cerrada)
+        pool.devolver(nueva, descartar=True)
+        self.assertTrue(nueva.cerrada)
+        self.assertEqual(pool.estado(), {'abiertas': 0, 'libres': 0})
+
+
+class SqliteSerializadoTests(TestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.conexiones = ConnectionHandler({'default': {
+            'ENGINE': 'access_control.db_backends.sqlite_serializado',
+            'NAME': str(Path(directorio.name) / 'prueba.sqlite3'),
+            'OPTIONS': {
+                'init_command': 'PRAGMA journal_mode=WAL;PRAGMA synchronous=NORMAL;PRAGMA busy_timeout=100',
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 5,
+            },
+        }})
+        self.addCleanup(self.conexiones.close_all)
+        with self.conexiones['default'].cursor() as cursor:
+            cursor.execute('CREATE TABLE lectura (id INTEGER PRIMARY KEY, hilo INTEGER, n INTEGER)')
+
+    def test_aplica_pragmas(self):
+        with self.conexiones['default'].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_escrituras_concurrentes_sin_bloqueos(self):
+        errores = []
+
+        def escribir(hilo):
+            conexion = self.conexiones['default']
+            try:
+                for n in range(20):
+                    if n % 2:
+                        with conexion.cursor() as cursor:
+                            cursor.execute('INSERT INTO lectura (hilo, n) VALUES (%s, %s)', [hilo, n])
+                        continue
+                    # Lectura y escritura en la misma transacción (BEGIN IMMEDIATE)
+                    conexion.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+                    with conexion.cursor() as cursor:
+                        cursor.execute('SELECT COUNT(*) FROM lectura WHERE hilo = %s', [hilo])
+                        cursor.execute('INSERT INTO lectura (hilo, n) VALUES (%s, %s)', [hilo, cursor.fetchone()[0]])
+                    conexion.commit()
+                    conexion.set_autocommit(True)
+            except Exception as exc:
+                errores.append(exc)
+            finally:
+                conexion.close()
+
+        hilos = [threading.Thread(target=escribir, args=(hilo,)) for hilo in range(6)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        with self.conexiones['default'].cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM lectura')
+            self.assertEqual(cursor.fetchone()[0], 120)
+        self.assertFalse(self.conexiones['default']._lock_escritura.locked())
+
+
+class PermitidosTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.otro_departamento = Departamento.objects.create(nombre='Bodega')
+        self.inactivo = Sensor.objects.create(
+            uid_mac='RFID-002-BBB', nombre='Tarjeta Inactiva', departamento=self.departamento,
+            estado=Sensor.Estado.INACTIVO
+        )
+        self.bodega = Sensor.objects.create(
+            uid_mac='RFID-003-CCC', nombre='Tarjeta Bodega', departamento=self.otro_departamento
+        )
+
+    def hashes(self, valor):
+        datos = base64.b64decode(valor)
+        tamano = len(hash_uid('x'))
+        return {datos[i:i + tamano] for i in range(0, len(datos), tamano)}
+
+    def test_snapshot_por_barrera(self):
+        response = self.client.get(f'/api/sensores/permitidos/?barrera={self.barrera.id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['departamento'], self.departamento.id)
+        self.assertEqual(response.data['cantidad'], 1)
+        self.assertEqual(self.hashes(response.data['hashes']), {hash_uid('RFID-001-AAA')})
+
+        response = self.client.get('/api/sensores/permitidos/')
+        self.assertEqual(
+            self.hashes(response.data['hashes']), {hash_uid('RFID-001-AAA'), hash_uid('RFID-003-CCC')}
+        )
+
+    def test_snapshot_binario_ordenado(self):
+        response = self.client.get('/api/sensores/permitidos/?formato=binario')
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+        self.assertEqual(
+            response.content, b''.join(sorted([hash_uid('RFID-001-AAA'), hash_uid('RFID-003-CCC')]))
+        )
+        self.assertTrue(response['X-Permitidos-Version'])
+
+    @override_settings(PERMITIDOS_MARGEN=0)
+    def test_cambios_desde_version(self):
+        version = self.client.get('/api/sensores/permitidos/').data['version']
+        url = f'/api/sensores/permitidos/cambios/?departamento={self.departamento.id}&desde={version}'
+        response = self.client.get(url)
+        self.assertEqual((response.data['altas'], response.data['bajas']), ('', ''))
+
+        self.inactivo.estado = Sensor.Estado.ACTIVO
+        self.inactivo.save()
+        self.sensor.uid_mac = 'RFID-001-NUEVO'
+        self.sensor.save()
+        self.bodega.delete()
+
+        response = self.client.get(url)
+        self.assertGreater(response.data['version'], version)
+        self.assertEqual(
+            self.hashes(response.data['altas']), {hash_uid('RFID-002-BBB'), hash_uid('RFID-001-NUEVO')}
+        )
+        self.assertEqual(
+            self.hashes(response.data['bajas']), {hash_uid('RFID-001-AAA'), hash_uid('RFID-003-CCC')}
+        )
+
+    def test_cambios_version_fuera_de_rango(self):
+        version = self.client.get('/api/sensores/permitidos/').data['version']
+        for desde in (-1, version + 1, 10 ** 30):
+            response = self.client.get(f'/api/sensores/permitidos/cambios/?desde={desde}')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('desde', response.data['details'])
+
+    def test_retiro_de_uid_modificado(self):
+        retiradas = CredencialRetirada.objects.filter(uid_mac='RFID-001-AAA')
+        # Con el UID/MAC diferido, from_db no lo carga con una consulta por fila
+        with self.assertNumQueries(1):
+            list(Sensor.objects.only('nombre'))
+        # Leído de la base de datos: guardar sin cambiar el UID/MAC no consulta el anterior
+        sensor = Sensor.objects.get(pk=self.sensor.pk)
+        sensor.estado = Sensor.Estado.INACTIVO
+        with self.assertNumQueries(1):
+            sensor.save()
+        # Un guardado que falla no deja la baja registrada
+        sensor.uid_mac = 'RFID-002-BBB'
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            sensor.save()
+        self.assertFalse(retiradas.exists())
+        sensor.uid_mac = 'RFID-009-ZZZ'
+        sensor.save()
+        self.assertEqual(retiradas.count(), 1)
+
+    def test_cambios_requiere_version(self):
+        self.assertEqual(self.client.get('/api/sensores/permitidos/cambios/').status_code, 400)
+        self.assertEqual(self.client.get('/api/sensores/permitidos/?barrera=999').status_code, 404)
+
+
+class ArchivoEventosTests(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        almacenamiento = override_settings(STORAGES={
+            'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+            'archivo_eventos': {
+                'BACKEND': 'django.core.files.storage.FileSystemStorage',
+                'OPTIONS': {'location': directorio.name},
+            },
+        })
+        almacenamiento.enable()
+        self.addCleanup(almacenamiento.disable)
+
+        ahora = timezone.now()
+        # Mitad de un mes antiguo, para que ambos eventos queden en el mismo archivo
+        self.antiguo = inicio_mes(ahora - timezone.timedelta(days=400)) + timezone.timedelta(days=14)
+        Evento.objects.bulk_create([
+            Evento(tipo=Evento.TipoEvento.ACCESO_PERMITIDO, sensor=self.sensor, barrera=self.barrera,
+                   timestamp=self.antiguo),
+            Evento(tipo=Evento.TipoEvento.ACCESO_DENEGADO, descripcion='Intento, "antiguo"',
+                   timestamp=self.antiguo + timezone.timedelta(minutes=1)),
+            Evento(tipo=Evento.TipoEvento.ACCESO_PERMITIDO, sensor=self.sensor, timestamp=ahora),
+        ])
+
+    def test_archivar_y_buscar(self):
+        out = io.StringIO()
+        call_command('archivar_eventos', '--dias', '180', '--lote', '1', stdout=out)
+        self.assertIn('2 eventos archivados', out.getvalue())
+        self.assertEqual(Evento.objects.count(), 1)
+        archivo = ArchivoEventos.objects.get()
+        self.assertEqual(archivo.cantidad, 2)
+
+        # Repetir no crea archivos ni elimina eventos recientes
+        call_command('archivar_eventos', '--dias', '180', stdout=io.StringIO())
+        self.assertEqual((ArchivoEventos.objects.count(), Evento.objects.count()), (1, 1))
+
+        params = {
+            'formato': 'ndjson',
+            'desde': (self.antiguo - timezone.timedelta(days=1)).date().isoformat(),
+            'hasta': (self.antiguo + timezone.timedelta(days=1)).date().isoformat(),
+        }
+        response = self.client.get('/api/eventos/archivados/', params)
+        filas = [json.loads(linea) for linea in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(filas), 2)
+        self.assertEqual(filas[0]['sensor'], self.sensor.id)
+        self.assertEqual(filas[0]['sensor_nombre'], 'Tarjeta Admin')
+        self.assertEqual(filas[1]['descripcion'], 'Intento, "antiguo"')
+        self.assertIsNone(filas[1]['sensor'])
+
+        response = self.client.get('/api/eventos/archivados/', {**params, 'tipo': 'ACCESO_DENEGADO'})
+        self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 1)
+
+        response = self.client.get('/api/eventos/archivos/')
+        self.assertEqual(response.data['resultados'][0]['cantidad'], 2)
+
+    def test_archivados_requiere_rango(self):
+        response = self.client.get('/api/eventos/archivados/', {'desde': '2025-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+
+class BarreraTransicionesTests(BaseAPITestCase):
+
+    def test_clics_repetidos_registran_un_evento(self):
+        url = f'/api/barreras/{self.barrera.id}/abrir/'
+        self.assertTrue(self.client.post(url).data['cambio'])
+        response = self.client.post(url)
+        self.assertFalse(response.data['cambio'])
+        self.assertEqual(response.data['barrera']['estado'], Barrera.Estado.ABIERTA)
+        self.assertEqual(Evento.objects.filter(tipo=Evento.TipoEvento.APERTURA_MANUAL).count(), 1)
+
+    def test_transicion_con_instancia_desactualizada(self):
+        primera = Barrera.objects.get(pk=self.barrera.pk)
+        segunda = Barrera.objects.get(pk=self.barrera.pk)
+        with self.assertNumQueries(1):  # un solo UPDATE condicional
+            self.assertTrue(primera.abrir())
+        self.assertFalse(segunda.abrir())
+        self.assertEqual(segunda.estado, Barrera.Estado.ABIERTA)
+        self.assertEqual(segunda.updated_at, primera.updated_at)
+        self.assertTrue(segunda.cerrar())
+        self.barrera.refresh_from_db()
+        self.assertEqual(self.barrera.estado, Barrera.Estado.CERRADA)
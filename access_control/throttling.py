@@ -0,0 +1,76 @@
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+
+class TokenBucket:
+    """Cubeta de tokens: se recarga a `tasa` tokens por segundo hasta `capacidad`"""
+    __slots__ = ('tokens', 'actualizado')
+
+    def __init__(self, capacidad, ahora):
+        self.tokens = capacidad
+        self.actualizado = ahora
+
+    def recargar(self, tasa, capacidad, ahora):
+        self.tokens = min(capacidad, self.tokens + (ahora - self.actualizado) * tasa)
+        self.actualizado = ahora
+
+
+class VerificarAccesoThrottle(BaseThrottle):
+    """
+    Limita las lecturas por cliente (usuario + IP) de verificar_acceso con una cubeta de tokens
+    en memoria del proceso: permite ráfagas de VERIFICAR_ACCESO_RAFAGA lecturas y un promedio de
+    VERIFICAR_ACCESO_TASA por segundo. Con tasa 0 no se limita
+    """
+    _cubetas = {}
+    _lock = threading.Lock()
+    _proxima_limpieza = 0.0
+
+    def __init__(self):
+        self.espera = None
+
+    def get_cache_key(self, request):
+        usuario = getattr(request, 'user', None)
+        pk = usuario.pk if usuario is not None and usuario.is_authenticated else 'anonimo'
+        return f'{pk}:{self.get_ident(request)}'
+
+    def allow_request(self, request, view=None):
+        tasa = settings.VERIFICAR_ACCESO_TASA
+        if tasa <= 0:
+            return True
+        capacidad = max(settings.VERIFICAR_ACCESO_RAFAGA, 1)
+        clave = self.get_cache_key(request)
+        ahora = time.monotonic()
+        with self._lock:
+            self._limpiar(tasa, capacidad, ahora)
+            cubeta = self._cubetas.get(clave)
+            if cubeta is None:
+                cubeta = self._cubetas[clave] = TokenBucket(capacidad, ahora)
+            else:
+                cubeta.recargar(tasa, capacidad, ahora)
+            if cubeta.tokens >= 1:
+                cubeta.tokens -= 1
+                return True
+            self.espera = (1 - cubeta.tokens) / tasa
+            return False
+
+    def wait(self):
+        return self.espera
+
+    @classmethod
+    def _limpiar(cls, tasa, capacidad, ahora):
+        """Descarta periódicamente las cubetas que ya se recargaron por completo (clientes inactivos)"""
+        if ahora < cls._proxima_limpieza:
+            return
+        cls._proxima_limpieza = ahora + capacidad / tasa
+        for clave, cubeta in list(cls._cubetas.items()):
+            if cubeta.tokens + (ahora - cubeta.actualizado) * tasa >= capacidad:
+                del cls._cubetas[clave]
+
+    @classmethod
+    def limpiar(cls):
+        with cls._lock:
+            cls._cubetas.clear()
+            cls._proxima_limpieza = 0.0
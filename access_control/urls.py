@@ -1,8 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import (
     api_info, UsuarioViewSet, DepartamentoViewSet,
-    SensorViewSet, BarreraViewSet, EventoViewSet
+    SensorViewSet, BarreraViewSet, EventoViewSet, EstadisticaAccesoViewSet
 )
 
 router = DefaultRouter()
@@ -11,8 +12,14 @@ router.register(r'departamentos', DepartamentoViewSet)
 router.register(r'sensores', SensorViewSet)
 router.register(r'barreras', BarreraViewSet)
 router.register(r'eventos', EventoViewSet)
+router.register(r'estadisticas', EstadisticaAccesoViewSet)
 
 urlpatterns = [
     path('info/', api_info, name='api-info'),
+    # Flujos de lectores/barreras en vistas async (ASGI), ver async_views.py
+    path('async/sensores/verificar_acceso/', async_views.verificar_acceso, name='async-verificar-acceso'),
+    path('async/barreras/<int:pk>/abrir/', async_views.abrir_barrera, name='async-barrera-abrir'),
+    path('async/barreras/<int:pk>/cerrar/', async_views.cerrar_barrera, name='async-barrera-cerrar'),
+    path('stream/', async_views.stream, name='stream'),
     path('', include(router.urls)),
 ]
@@ -3,6 +3,35 @@ from rest_framework.response import Response
 from rest_framework import status
 
 
+def formatear_error(status_code, details):
+    """
+    Cuerpo de respuesta de error común de la API
+    Usado por custom_exception_handler y por las vistas async, que no pasan por DRF
+    """
+    custom_response_data = {
+        'error': True,
+        'status_code': status_code,
+        'message': None,
+        'details': details
+    }
+
+    # Mensajes personalizados según el código de estado
+    if status_code == status.HTTP_400_BAD_REQUEST:
+        custom_response_data['message'] = 'Error de validación'
+    elif status_code == status.HTTP_401_UNAUTHORIZED:
+        custom_response_data['message'] = 'No autenticado. Debe proporcionar credenciales válidas.'
+    elif status_code == status.HTTP_403_FORBIDDEN:
+        custom_response_data['message'] = 'No tiene permisos para realizar esta acción.'
+    elif status_code == status.HTTP_404_NOT_FOUND:
+        custom_response_data['message'] = 'Recurso no encontrado.'
+    elif status_code == status.HTTP_405_METHOD_NOT_ALLOWED:
+        custom_response_data['message'] = 'Método no permitido.'
+    else:
+        custom_response_data['message'] = 'Error en la solicitud.'
+
+    return custom_response_data
+
+
 def custom_exception_handler(exc, context):
     """
     Manejador de excepciones personalizado para REST Framework
@@ -10,27 +39,6 @@ def custom_exception_handler(exc, context):
     response = exception_handler(exc, context)
 
     if response is not None:
-        custom_response_data = {
-            'error': True,
-            'status_code': response.status_code,
-            'message': None,
-            'details': response.data
-        }
-
-        # Mensajes personalizados según el código de estado
-        if response.status_code == status.HTTP_400_BAD_REQUEST:
-            custom_response_data['message'] = 'Error de validación'
-        elif response.status_code == status.HTTP_401_UNAUTHORIZED:
-            custom_response_data['message'] = 'No autenticado. Debe proporcionar credenciales válidas.'
-        elif response.status_code == status.HTTP_403_FORBIDDEN:
-            custom_response_data['message'] = 'No tiene permisos para realizar esta acción.'
-        elif response.status_code == status.HTTP_404_NOT_FOUND:
-            custom_response_data['message'] = 'Recurso no encontrado.'
-        elif response.status_code == status.HTTP_405_METHOD_NOT_ALLOWED:
-            custom_response_data['message'] = 'Método no permitido.'
-        else:
-            custom_response_data['message'] = 'Error en la solicitud.'
-
-        response.data = custom_response_data
+        response.data = formatear_error(response.status_code, response.data)
 
     return response
@@ -1,13 +1,37 @@
+import base64
+import hmac
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_GET
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from .models import Usuario, Departamento, Sensor, Barrera, Evento
+from django.db.models import Q, Sum
+from .models import Usuario, Departamento, Sensor, Barrera, Evento, EstadisticaAcceso, ArchivoEventos
 from .serializers import (
     UsuarioSerializer, DepartamentoSerializer, SensorSerializer,
-    BarreraSerializer, EventoSerializer
+    BarreraSerializer, EventoSerializer, EstadisticaAccesoSerializer
 )
 from .permissions import IsAdminOrReadOnly, IsAdmin
+from .mixins import CamposDinamicosMixin, ConditionalGetMixin, ReplicaLecturaMixin
+from .cache import cache_credenciales
+from .deduplicacion import deduplicador
+from .eventos import registrar_evento, registrar_eventos
+from .acceso import evaluar_acceso
+from .metricas import registro as registro_metricas
+from .pagination import EventoPagination
+from .throttling import VerificarAccesoThrottle
+from .filters import (
+    EventoFilterBackend, EstadisticaFilterBackend, filtrar_eventos, filtrar_estadisticas, parse_id
+)
+from .exportacion import FORMATOS, filas_eventos, generar_exportacion
+from . import archivo, importacion, permitidos
 
 
 @api_view(['GET'])
@@ -25,7 +49,25 @@ def api_info(request):
     })
 
 
-class UsuarioViewSet(viewsets.ModelViewSet):
+@require_GET
+def metricas(request):
+    """
+    Endpoint /metrics - Métricas en formato de texto de Prometheus (ver metricas.py)
+    Exige el header Authorization: Bearer <METRICAS_TOKEN>; sin token, solo con DEBUG
+    """
+    token = settings.METRICAS_TOKEN
+    if not settings.METRICAS_HABILITADAS or not (token or settings.DEBUG):
+        raise Http404()
+    if token and not hmac.compare_digest(
+        request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()
+    ):
+        return HttpResponse('No autorizado\n', status=401, content_type='text/plain')
+    return HttpResponse(
+        registro_metricas.exponer(), content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+class UsuarioViewSet(ReplicaLecturaMixin, CamposDinamicosMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar usuarios
     Admin: CRUD completo
@@ -36,26 +78,36 @@ class UsuarioViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAdminOrReadOnly]
 
 
-class DepartamentoViewSet(viewsets.ModelViewSet):
+class DepartamentoViewSet(ReplicaLecturaMixin, ConditionalGetMixin, CamposDinamicosMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar departamentos
     Admin: CRUD completo
     Operador: Solo lectura
+    GET condicional con ETag/Last-Modified (ver ConditionalGetMixin)
     """
     queryset = Departamento.objects.all()
     serializer_class = DepartamentoSerializer
     permission_classes = [IsAdminOrReadOnly]
 
 
-class SensorViewSet(viewsets.ModelViewSet):
+class SensorViewSet(ReplicaLecturaMixin, ConditionalGetMixin, CamposDinamicosMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar sensores RFID
     Admin: CRUD completo
     Operador: Solo lectura
+    GET condicional con ETag/Last-Modified (ver ConditionalGetMixin)
     """
-    queryset = Sensor.objects.all()
+    # select_related + only(): una sola consulta con las columnas que usa SensorSerializer
+    queryset = Sensor.objects.select_related('departamento', 'usuario').only(
+        'uid_mac', 'nombre', 'estado', 'departamento', 'usuario', 'descripcion',
+        'created_at', 'updated_at', 'departamento__nombre', 'usuario__username',
+    )
     serializer_class = SensorSerializer
     permission_classes = [IsAdminOrReadOnly]
+    # La respuesta incluye el nombre del departamento y del usuario
+    campos_modificacion = ('updated_at', 'departamento__updated_at', 'usuario__updated_at')
+    # Los lectores no leen de vuelta los eventos que registran
+    acciones_sin_adherencia = ('verificar_acceso', 'verificar_acceso_lote')
 
     @action(detail=True, methods=['post'], permission_classes=[IsAdmin])
     def activar(self, request, pk=None):
@@ -73,7 +125,10 @@ class SensorViewSet(viewsets.ModelViewSet):
         sensor.save()
         return Response({'status': 'sensor desactivado', 'sensor': SensorSerializer(sensor).data})
 
-    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    @action(
+        detail=False, methods=['post'], permission_classes=[IsAuthenticated],
+        throttle_classes=[VerificarAccesoThrottle]
+    )
     def verificar_acceso(self, request):
         """
         Verifica si un sensor puede acceder
@@ -88,84 +143,207 @@ class SensorViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        try:
-            sensor = Sensor.objects.get(uid_mac=uid_mac)
-        except Sensor.DoesNotExist:
-            # Registrar evento de acceso denegado
-            Evento.objects.create(
-                tipo=Evento.TipoEvento.ACCESO_DENEGADO,
-                motivo_denegacion='Sensor no encontrado',
-                descripcion=f'Intento de acceso con UID/MAC: {uid_mac}'
+        # Lectura repetida dentro de la ventana: misma decisión, sin consultas ni evento
+        repetida, suprimidas = deduplicador.repetida(uid_mac, barrera_id)
+        if suprimidas:
+            registrar_eventos(suprimidas)
+        if repetida is not None:
+            codigo, respuesta = repetida
+            return Response(respuesta, status=codigo)
+
+        # La credencial se resuelve desde la caché en memoria (sin consulta en el caso común)
+        sensor = cache_credenciales.obtener(uid_mac)
+        codigo, respuesta, evento_data = evaluar_acceso(uid_mac, sensor)
+
+        if codigo == status.HTTP_200_OK and barrera_id:
+            # Solo se asocia la barrera si existe (el id se normaliza a entero)
+            evento_data['barrera_id'] = (
+                Barrera.objects.filter(id=barrera_id).values_list('id', flat=True).first()
+            )
+
+        registrar_evento(**evento_data)
+        suprimidas = deduplicador.guardar(uid_mac, barrera_id, codigo, respuesta, evento_data)
+        if suprimidas:
+            registrar_eventos(suprimidas)
+
+        return Response(respuesta, status=codigo)
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def verificar_acceso_lote(self, request):
+        """
+        Verifica un lote de lecturas almacenadas por un lector sin conexión
+        Body: lista de {uid_mac, barrera_id, timestamp} (o {"lecturas": [...]})
+        Resuelve sensores y barreras con una consulta cada uno, registra todos los eventos
+        con un solo INSERT y retorna las decisiones en el mismo orden
+        """
+        lecturas = request.data
+        if isinstance(lecturas, dict):
+            lecturas = lecturas.get('lecturas')
+        if not isinstance(lecturas, list) or not lecturas:
+            return Response(
+                {'error': 'Se requiere una lista de lecturas'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            return Response({
-                'acceso': 'denegado',
-                'motivo': 'Sensor no encontrado'
-            }, status=status.HTTP_404_NOT_FOUND)
-
-        # Verificar estado del sensor
-        if not sensor.esta_activo():
-            motivo = f'Sensor en estado: {sensor.get_estado_display()}'
-            Evento.objects.create(
-                tipo=Evento.TipoEvento.ACCESO_DENEGADO,
-                sensor=sensor,
-                motivo_denegacion=motivo,
-                descripcion=f'Sensor {sensor.nombre} intentó acceder'
+        maximo = settings.VERIFICAR_ACCESO_LOTE_MAX
+        if len(lecturas) > maximo:
+            return Response(
+                {'error': f'El lote no puede superar {maximo} lecturas'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            return Response({
-                'acceso': 'denegado',
-                'motivo': motivo,
-                'sensor': SensorSerializer(sensor).data
-            }, status=status.HTTP_403_FORBIDDEN)
-
-        # Acceso permitido
-        evento_data = {
-            'tipo': Evento.TipoEvento.ACCESO_PERMITIDO,
-            'sensor': sensor,
-            'descripcion': f'Acceso permitido para sensor {sensor.nombre}'
-        }
-
-        if barrera_id:
+
+        # Validar cada lectura antes de consultar la base de datos
+        validas = []
+        resultados = [None] * len(lecturas)
+        for indice, lectura in enumerate(lecturas):
+            uid_mac = lectura.get('uid_mac') if isinstance(lectura, dict) else None
+            if not uid_mac or not isinstance(uid_mac, str):
+                resultados[indice] = {'uid_mac': None, 'error': 'uid_mac es requerido'}
+                continue
             try:
-                barrera = Barrera.objects.get(id=barrera_id)
-                evento_data['barrera'] = barrera
-            except Barrera.DoesNotExist:
-                pass
+                barrera_id = int(lectura['barrera_id']) if lectura.get('barrera_id') else None
+                timestamp = parse_datetime(lectura['timestamp']) if lectura.get('timestamp') else timezone.now()
+                if timestamp is None:
+                    raise ValueError
+            except (TypeError, ValueError):
+                resultados[indice] = {'uid_mac': uid_mac, 'error': 'barrera_id o timestamp inválido'}
+                continue
+            if timezone.is_naive(timestamp):
+                timestamp = timezone.make_aware(timestamp)
+            validas.append((indice, uid_mac, barrera_id, timestamp))
+
+        sensores = cache_credenciales.obtener_varios([uid_mac for _, uid_mac, _, _ in validas])
+        ids_barreras = {barrera_id for _, _, barrera_id, _ in validas if barrera_id}
+        barreras_existentes = set(
+            Barrera.objects.filter(id__in=ids_barreras).order_by().values_list('id', flat=True)
+        ) if ids_barreras else set()
 
-        Evento.objects.create(**evento_data)
+        eventos = []
+        for indice, uid_mac, barrera_id, timestamp in validas:
+            codigo, respuesta, evento_data = evaluar_acceso(uid_mac, sensores[uid_mac])
+            if codigo == status.HTTP_200_OK and barrera_id in barreras_existentes:
+                evento_data['barrera_id'] = barrera_id
+            evento_data['timestamp'] = timestamp
+            eventos.append(evento_data)
+            # Respuesta compacta por lectura (sin la representación completa del sensor)
+            resultados[indice] = {
+                'uid_mac': uid_mac,
+                'acceso': respuesta['acceso'],
+                'motivo': respuesta.get('motivo'),
+                'sensor_id': evento_data.get('sensor_id'),
+            }
 
+        if eventos:
+            registrar_eventos(eventos)
+
+        return Response({'resultados': resultados}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdmin], parser_classes=[MultiPartParser])
+    def importar(self, request):
+        """
+        Importación masiva de sensores desde un archivo CSV o XLSX (campo `archivo`)
+        Retorna la cantidad de sensores creados y los errores por fila (ver importacion.py)
+        ?simular=true solo valida
+        """
+        archivo_subido = request.FILES.get('archivo')
+        if archivo_subido is None:
+            raise ValidationError({'archivo': 'Se requiere un archivo CSV o XLSX'})
+        formato = importacion.detectar_formato(archivo_subido.name, request.query_params.get('formato'))
+        reporte = importacion.importar_sensores(
+            archivo_subido, formato, tamano_lote=settings.SENSORES_IMPORTAR_LOTE,
+            simular=request.query_params.get('simular') in ('true', '1'),
+        )
+        return Response(reporte)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def permitidos(self, request):
+        """
+        Lista de permitidos (hashes de los sensores ACTIVO) para decisión local en los lectores
+        ?departamento= o ?barrera= limita la lista; ?formato=binario retorna los hashes crudos
+        """
+        departamento_id = self._departamento_permitidos(request)
+        version, hashes = permitidos.snapshot(departamento_id)
+        if request.query_params.get('formato') == 'binario':
+            response = HttpResponse(hashes, content_type='application/octet-stream')
+            response['X-Permitidos-Version'] = version
+            response['X-Permitidos-Hash'] = permitidos.algoritmo()
+            return response
         return Response({
-            'acceso': 'permitido',
-            'sensor': SensorSerializer(sensor).data,
-            'mensaje': 'Acceso concedido'
-        }, status=status.HTTP_200_OK)
+            'version': version,
+            'departamento': departamento_id,
+            'hash': permitidos.algoritmo(),
+            'cantidad': len(hashes) // settings.PERMITIDOS_HASH_BYTES,
+            'hashes': base64.b64encode(hashes).decode(),
+        })
+
+    @action(detail=False, methods=['get'], url_path='permitidos/cambios',
+            permission_classes=[IsAuthenticated])
+    def permitidos_cambios(self, request):
+        """Altas y bajas de la lista de permitidos desde una versión (?desde=)"""
+        desde = request.query_params.get('desde')
+        if not desde:
+            raise ValidationError({'desde': 'Se requiere la versión de la última sincronización'})
+        desde = parse_id('desde', desde)
+        departamento_id = self._departamento_permitidos(request)
+        version = permitidos.version_actual()
+        # Una versión posterior a la actual no salió de esta lista (p. ej. base restaurada)
+        if not 0 <= desde <= version:
+            raise ValidationError({'desde': 'Versión fuera de rango: volver a descargar la lista completa'})
+        version, altas, bajas = permitidos.cambios(desde, departamento_id, version)
+        return Response({
+            'version': version,
+            'desde': desde,
+            'departamento': departamento_id,
+            'hash': permitidos.algoritmo(),
+            'altas': base64.b64encode(altas).decode(),
+            'bajas': base64.b64encode(bajas).decode(),
+        })
 
+    def _departamento_permitidos(self, request):
+        """Departamento de ?departamento= o de la barrera en ?barrera= (None: todos)"""
+        barrera = request.query_params.get('barrera')
+        if barrera:
+            departamento_id = Barrera.objects.filter(id=parse_id('barrera', barrera)).values_list(
+                'departamento_id', flat=True).first()
+            if departamento_id is None:
+                raise NotFound('Barrera no encontrada')
+            return departamento_id
+        departamento = request.query_params.get('departamento')
+        return parse_id('departamento', departamento) if departamento else None
 
-class BarreraViewSet(viewsets.ModelViewSet):
+
+class BarreraViewSet(ReplicaLecturaMixin, ConditionalGetMixin, CamposDinamicosMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar barreras
     Admin: CRUD completo
     Operador: Solo lectura
+    GET condicional con ETag/Last-Modified (ver ConditionalGetMixin)
     """
-    queryset = Barrera.objects.all()
+    queryset = Barrera.objects.select_related('departamento').only(
+        'nombre', 'estado', 'departamento', 'descripcion', 'created_at', 'updated_at',
+        'departamento__nombre',
+    )
     serializer_class = BarreraSerializer
     permission_classes = [IsAdminOrReadOnly]
+    campos_modificacion = ('updated_at', 'departamento__updated_at')
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def abrir(self, request, pk=None):
         """Abre la barrera manualmente"""
         barrera = self.get_object()
-        barrera.abrir()
+        cambio = barrera.abrir()
         
-        # Registrar evento
-        Evento.objects.create(
-            tipo=Evento.TipoEvento.APERTURA_MANUAL,
-            barrera=barrera,
-            usuario_responsable=request.user,
-            descripcion=f'Apertura manual de barrera {barrera.nombre} por {request.user.username}'
-        )
+        # Solo una transición real genera un evento (los clics repetidos no)
+        if cambio:
+            registrar_evento(
+                tipo=Evento.TipoEvento.APERTURA_MANUAL,
+                barrera_id=barrera.id,
+                usuario_responsable_id=request.user.pk,
+                descripcion=f'Apertura manual de barrera {barrera.nombre} por {request.user.username}'
+            )
         
         return Response({
             'status': 'barrera abierta',
+            'cambio': cambio,
             'barrera': BarreraSerializer(barrera).data
         })
 
@@ -173,27 +351,142 @@ class BarreraViewSet(viewsets.ModelViewSet):
     def cerrar(self, request, pk=None):
         """Cierra la barrera manualmente"""
         barrera = self.get_object()
-        barrera.cerrar()
+        cambio = barrera.cerrar()
         
-        # Registrar evento
-        Evento.objects.create(
-            tipo=Evento.TipoEvento.CIERRE_MANUAL,
-            barrera=barrera,
-            usuario_responsable=request.user,
-            descripcion=f'Cierre manual de barrera {barrera.nombre} por {request.user.username}'
-        )
+        # Solo una transición real genera un evento (los clics repetidos no)
+        if cambio:
+            registrar_evento(
+                tipo=Evento.TipoEvento.CIERRE_MANUAL,
+                barrera_id=barrera.id,
+                usuario_responsable_id=request.user.pk,
+                descripcion=f'Cierre manual de barrera {barrera.nombre} por {request.user.username}'
+            )
         
         return Response({
             'status': 'barrera cerrada',
+            'cambio': cambio,
             'barrera': BarreraSerializer(barrera).data
         })
 
 
-class EventoViewSet(viewsets.ReadOnlyModelViewSet):
+class EventoViewSet(ReplicaLecturaMixin, CamposDinamicosMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet para consultar eventos (solo lectura)
     Todos los usuarios autenticados pueden ver eventos
+    Soporta paginación por cursor con ?paginacion=cursor (ver EventoPagination)
+    Filtros: tipo, sensor, barrera, usuario_responsable, desde, hasta
+    Selección de campos con ?fields= / ?omit= (ver CamposDinamicosMixin)
     """
-    queryset = Evento.objects.all()
+    queryset = Evento.objects.select_related('sensor', 'barrera', 'usuario_responsable').only(
+        'tipo', 'sensor', 'barrera', 'usuario_responsable', 'motivo_denegacion', 'descripcion',
+        'timestamp', 'sensor__nombre', 'barrera__nombre', 'usuario_responsable__username',
+    )
     serializer_class = EventoSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = EventoPagination
+    filter_backends = [EventoFilterBackend]
+    acciones_replica = ('list', 'retrieve', 'exportar', 'archivados', 'archivos')
+    # La paginación por cursor lee el timestamp de la primera y la última fila
+    campos_requeridos = ('timestamp',)
+
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        """
+        Exporta eventos en CSV o NDJSON (?formato=csv|ndjson) como respuesta en streaming
+        Acepta los mismos filtros que el listado y no pasa por EventoSerializer
+        """
+        formato = request.query_params.get('formato', 'csv')
+        if formato not in FORMATOS:
+            return Response(
+                {'error': f'Formato no soportado, usar: {", ".join(FORMATOS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        # Validar filtros antes de iniciar el streaming, para poder responder 400
+        queryset = filtrar_eventos(Evento.objects.using(self.db_lectura), request.query_params)
+        filas = filas_eventos(queryset, settings.EVENTOS_EXPORTAR_LOTE)
+
+        return self._respuesta_exportacion(formato, filas, 'eventos')
+
+    @action(detail=False, methods=['get'])
+    def archivados(self, request):
+        """
+        Busca en los eventos archivados (ver archivo.py) y los retorna como exportar
+        Requiere desde y hasta; acepta los filtros tipo, sensor, barrera y usuario_responsable
+        Lee completos los archivos de los meses del rango
+        """
+        formato = request.query_params.get('formato', 'csv')
+        if formato not in FORMATOS:
+            return Response(
+                {'error': f'Formato no soportado, usar: {", ".join(FORMATOS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        desde, hasta, predicado = archivo.filtro_archivados(request.query_params)
+        return self._respuesta_exportacion(
+            formato, archivo.buscar(desde, hasta, predicado), 'eventos_archivados'
+        )
+
+    @action(detail=False, methods=['get'])
+    def archivos(self, request):
+        """Meses archivados: cantidad de eventos y tamaño de cada archivo"""
+        return Response({'resultados': [
+            {'mes': mes.strftime('%Y-%m'), 'cantidad': cantidad, 'tamano': tamano}
+            for mes, cantidad, tamano in ArchivoEventos.objects.values_list('mes', 'cantidad', 'tamano')
+        ]})
+
+    def _respuesta_exportacion(self, formato, filas, nombre):
+        content_type, extension = FORMATOS[formato]
+        response = StreamingHttpResponse(generar_exportacion(formato, filas), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{nombre}.{extension}"'
+        return response
+
+
+class EstadisticaAccesoViewSet(ReplicaLecturaMixin, CamposDinamicosMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet de estadísticas pre-agregadas (solo lectura)
+    Filtros: granularidad (HORA por defecto o DIA), barrera, departamento, tipo, desde, hasta
+    """
+    queryset = EstadisticaAcceso.objects.select_related('barrera', 'departamento').only(
+        'granularidad', 'periodo', 'tipo', 'barrera', 'departamento', 'total',
+        'barrera__nombre', 'departamento__nombre',
+    )
+    serializer_class = EstadisticaAccesoSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [EstadisticaFilterBackend]
+    acciones_replica = ('list', 'retrieve', 'resumen')
+
+    @action(detail=False, methods=['get'])
+    def resumen(self, request):
+        """
+        Totales y tasa de denegación agrupados por departamento o barrera (?agrupar=)
+        Usa la granularidad DIA por defecto
+        """
+        agrupar = request.query_params.get('agrupar', 'departamento')
+        if agrupar not in ('departamento', 'barrera'):
+            return Response(
+                {'error': 'agrupar debe ser departamento o barrera'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        queryset = filtrar_estadisticas(
+            EstadisticaAcceso.objects.all(), request.query_params,
+            granularidad=EstadisticaAcceso.Granularidad.DIA
+        )
+        filas = queryset.values(agrupar, f'{agrupar}__nombre').annotate(
+            suma_total=Sum('total'),
+            permitidos=Sum('total', filter=Q(tipo=Evento.TipoEvento.ACCESO_PERMITIDO)),
+            denegados=Sum('total', filter=Q(tipo=Evento.TipoEvento.ACCESO_DENEGADO)),
+        ).order_by(agrupar)
+
+        resultados = []
+        for fila in filas:
+            permitidos = fila['permitidos'] or 0
+            denegados = fila['denegados'] or 0
+            intentos = permitidos + denegados
+            resultados.append({
+                agrupar: fila[agrupar],
+                f'{agrupar}_nombre': fila[f'{agrupar}__nombre'],
+                'total': fila['suma_total'],
+                'permitidos': permitidos,
+                'denegados': denegados,
+                'tasa_denegacion': round(denegados / intentos, 4) if intentos else 0.0,
+            })
+        return Response({'resultados': resultados})
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de latencia y throughput de la API (en proceso, con el cliente de pruebas de Django)
+
+Mide p50/p95/p99, requests por segundo y consultas SQL por endpoint, y genera un JSON
+comparable entre commits.
+
+Uso:
+    # 1. Crear un dataset (se recomienda una base de datos dedicada, p. ej. DB_NAME=bench.sqlite3)
+    python scripts/crear_datos_iniciales.py --departamentos 20 --sensores 10000 --barreras 100 --eventos 1000000
+    # 2. Ejecutar el benchmark
+    python scripts/benchmark_api.py --iteraciones 300 --salida bench_actual.json
+    # 3. Comparar contra una ejecución anterior
+    python scripts/benchmark_api.py --salida bench_nuevo.json --comparar bench_actual.json
+
+ADVERTENCIA: registra eventos y abre/cierra barreras en la base de datos configurada.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smartconnect.settings')
+# Sin límite por cliente ni ventana de lecturas repetidas: cada petición de verificar_acceso
+# se evalúa y registra (se pueden sobrescribir con las variables de entorno)
+os.environ.setdefault('VERIFICAR_ACCESO_TASA', '0')
+os.environ.setdefault('VERIFICAR_ACCESO_VENTANA', '0')
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.db import connection, close_old_connections  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from access_control.models import Departamento, Sensor, Barrera, Evento  # noqa: E402
+
+
+def escenarios(dataset):
+    """Lista de (nombre, función que retorna (método, ruta, datos))"""
+    uids = dataset['uids']
+    barreras = dataset['barreras']
+    hace_una_hora = (timezone.now() - timezone.timedelta(hours=1)).isoformat()
+
+    def verificar():
+        return 'post', '/api/sensores/verificar_acceso/', {
+            'uid_mac': random.choice(uids), 'barrera_id': random.choice(barreras)
+        }
+
+    def verificar_lote():
+        return 'post', '/api/sensores/verificar_acceso_lote/', [
+            {'uid_mac': random.choice(uids), 'barrera_id': random.choice(barreras)} for _ in range(50)
+        ]
+
+    return [
+        ('verificar_acceso', verificar),
+        ('verificar_acceso_lote_50', verificar_lote),
+        ('barrera_abrir', lambda: ('post', f'/api/barreras/{random.choice(barreras)}/abrir/', None)),
+        ('barrera_cerrar', lambda: ('post', f'/api/barreras/{random.choice(barreras)}/cerrar/', None)),
+        ('eventos_lista', lambda: ('get', '/api/eventos/', None)),
+        ('eventos_pagina_profunda', lambda: ('get', f'/api/eventos/?page={dataset["pagina_profunda"]}', None)),
+        ('eventos_cursor', lambda: ('get', '/api/eventos/?paginacion=cursor', None)),
+        ('eventos_filtrados', lambda: ('get', '/api/eventos/', {
+            'tipo': 'ACCESO_DENEGADO', 'barrera': random.choice(barreras), 'desde': hace_una_hora
+        })),
+        ('sensores_lista', lambda: ('get', '/api/sensores/', None)),
+        ('barreras_lista', lambda: ('get', '/api/barreras/', None)),
+        ('estadisticas_resumen', lambda: ('get', '/api/estadisticas/resumen/', None)),
+    ]
+
+
+def obtener_token(usuario, password):
+    response = Client().post('/api/token/', {'username': usuario, 'password': password})
+    if response.status_code != 200:
+        sys.exit(f'No se pudo obtener el token JWT para {usuario} ({response.status_code})')
+    return response.json()['access']
+
+
+def ejecutar(client, generador):
+    metodo, ruta, datos = generador()
+    with CaptureQueriesContext(connection) as consultas:
+        inicio = time.perf_counter()
+        if metodo == 'post':
+            response = client.post(ruta, datos, content_type='application/json')
+        else:
+            response = client.get(ruta, datos)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        duracion = time.perf_counter() - inicio
+    return duracion, len(consultas), response.status_code
+
+
+def medir(nombre, generador, token, iteraciones, calentamiento, hilos):
+    def trabajador(cantidad):
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+        for _ in range(calentamiento):
+            ejecutar(client, generador)
+        resultados = [ejecutar(client, generador) for _ in range(cantidad)]
+        close_old_connections()
+        return resultados
+
+    por_hilo = max(1, iteraciones // hilos)
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as executor:
+        muestras = [m for parte in executor.map(trabajador, [por_hilo] * hilos) for m in parte]
+    total = time.perf_counter() - inicio
+
+    duraciones = sorted(d * 1000 for d, _, _ in muestras)
+    consultas = [c for _, c, _ in muestras]
+    estados = {}
+    for _, _, codigo in muestras:
+        estados[str(codigo)] = estados.get(str(codigo), 0) + 1
+    percentiles = statistics.quantiles(duraciones, n=100, method='inclusive') if len(duraciones) > 1 \
+        else duraciones * 99
+    return {
+        'n': len(muestras),
+        'p50_ms': round(percentiles[49], 3),
+        'p95_ms': round(percentiles[94], 3),
+        'p99_ms': round(percentiles[98], 3),
+        'media_ms': round(statistics.fmean(duraciones), 3),
+        'max_ms': round(duraciones[-1], 3),
+        'rps': round(len(muestras) / total, 1),
+        'consultas_media': round(statistics.fmean(consultas), 2),
+        'consultas_max': max(consultas),
+        'estados': estados,
+        'no_2xx': sum(cantidad for codigo, cantidad in estados.items() if not codigo.startswith('2')),
+    }
+
+
+def commit_actual():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(actual, anterior):
+    print(f"\n{'endpoint':<28}{'p95 antes':>12}{'p95 ahora':>12}{'cambio':>10}{'consultas':>12}{'no 2xx':>10}")
+    for nombre, datos in actual['endpoints'].items():
+        previo = anterior.get('endpoints', {}).get(nombre)
+        if not previo:
+            continue
+        cambio = (datos['p95_ms'] - previo['p95_ms']) / previo['p95_ms'] * 100 if previo['p95_ms'] else 0
+        print(f"{nombre:<28}{previo['p95_ms']:>12.2f}{datos['p95_ms']:>12.2f}{cambio:>+9.1f}%"
+              f"{previo['consultas_media']:>6.1f}→{datos['consultas_media']:<5.1f}"
+              f"{previo.get('no_2xx', '-'):>5}→{datos['no_2xx']:<4}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de la API SmartConnect')
+    parser.add_argument('--iteraciones', type=int, default=200, help='Peticiones medidas por endpoint')
+    parser.add_argument('--calentamiento', type=int, default=10, help='Peticiones previas no medidas (por hilo)')
+    parser.add_argument('--hilos', type=int, default=1, help='Clientes concurrentes')
+    parser.add_argument('--endpoints', help='Lista separada por coma (por defecto, todos)')
+    parser.add_argument('--usuario', default='admin')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--salida', help='Archivo JSON de resultados (por defecto, stdout)')
+    parser.add_argument('--comparar', help='JSON de una ejecución anterior para comparar')
+    args = parser.parse_args()
+
+    random.seed(args.semilla)
+    uids = list(Sensor.objects.values_list('uid_mac', flat=True)[:5000])
+    barreras = list(Barrera.objects.values_list('id', flat=True)[:1000])
+    if not uids or not barreras:
+        sys.exit('Sin datos: ejecutar primero scripts/crear_datos_iniciales.py')
+    total_eventos = Evento.objects.count()
+    dataset = {
+        'uids': uids,
+        'barreras': barreras,
+        'pagina_profunda': max(1, min(total_eventos // 10, 10000)),
+    }
+
+    token = obtener_token(args.usuario, args.password)
+    seleccion = set(args.endpoints.split(',')) if args.endpoints else None
+
+    resultados = {}
+    for nombre, generador in escenarios(dataset):
+        if seleccion and nombre not in seleccion:
+            continue
+        print(f"→ {nombre}...", file=sys.stderr)
+        resultados[nombre] = medir(nombre, generador, token, args.iteraciones, args.calentamiento, args.hilos)
+        if resultados[nombre]['no_2xx']:
+            print(f"  ⚠ {resultados[nombre]['no_2xx']} respuestas no 2xx: {resultados[nombre]['estados']}",
+                  file=sys.stderr)
+
+    reporte = {
+        'commit': commit_actual(),
+        'fecha': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'base_de_datos': connection.vendor,
+        'parametros': {'iteraciones': args.iteraciones, 'hilos': args.hilos, 'semilla': args.semilla},
+        'configuracion': {
+            'VERIFICAR_ACCESO_TASA': settings.VERIFICAR_ACCESO_TASA,
+            'VERIFICAR_ACCESO_VENTANA': settings.VERIFICAR_ACCESO_VENTANA,
+            'EVENTOS_MODO': settings.EVENTOS_MODO,
+        },
+        'dataset': {
+            'departamentos': Departamento.objects.count(),
+            'sensores': Sensor.objects.count(),
+            'barreras': Barrera.objects.count(),
+            'eventos': total_eventos,
+        },
+        'endpoints': resultados,
+    }
+
+    salida = json.dumps(reporte, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            archivo.write(salida + '\n')
+        print(f"✓ Resultados guardados en {args.salida}", file=sys.stderr)
+    else:
+        print(salida)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            comparar(reporte, json.load(archivo))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de serialización JSON: JSONRenderer/JSONParser de DRF contra ORJSONRenderer/ORJSONParser
+
+Mide el tiempo (mediana y mínimo) y la memoria asignada (pico de tracemalloc) al renderizar y
+parsear una página de N eventos serializados con EventoSerializer, y la misma página como
+diccionarios con datetime sin convertir (como los de .values()). Verifica además que ambos
+renderers produzcan el mismo JSON una vez parseado. No usa la base de datos.
+
+Uso:
+    pip install orjson
+    python scripts/benchmark_json.py --filas 10000 --repeticiones 20 --salida bench_json.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import timedelta
+
+import django
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smartconnect.settings')
+django.setup()
+
+from django.utils import timezone  # noqa: E402
+from rest_framework.parsers import JSONParser  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from access_control.models import Barrera, Evento, Sensor, Usuario  # noqa: E402
+from access_control.parsers import ORJSONParser  # noqa: E402
+from access_control.renderers import ORJSONRenderer, orjson  # noqa: E402
+from access_control.serializers import EventoSerializer  # noqa: E402
+
+
+def eventos_en_memoria(filas):
+    """Eventos sin guardar, con las relaciones ya cargadas (como el listado con select_related)"""
+    usuarios = [Usuario(id=i, username=f'operador{i}') for i in range(1, 51)]
+    sensores = [Sensor(id=i, nombre=f'Tarjeta {i}', uid_mac=f'UID-{i:06d}') for i in range(1, 501)]
+    barreras = [Barrera(id=i, nombre=f'Barrera {i}') for i in range(1, 21)]
+    tipos = Evento.TipoEvento.values
+    inicio = timezone.now()
+    eventos = []
+    for i in range(filas):
+        sensor, barrera, usuario = sensores[i % 500], barreras[i % 20], usuarios[i % 50]
+        eventos.append(Evento(
+            id=i + 1, tipo=tipos[i % len(tipos)], sensor=sensor, barrera=barrera,
+            usuario_responsable=usuario, motivo_denegacion='Sensor inactivo' if i % 7 == 0 else '',
+            descripcion=f'Acceso de {sensor.nombre} en {barrera.nombre} — verificación automática',
+            timestamp=inicio - timedelta(seconds=i),
+        ))
+    return eventos
+
+
+def cargas(filas):
+    """(nombre, datos) de las respuestas a medir"""
+    eventos = eventos_en_memoria(filas)
+    pagina = {
+        'count': filas, 'next': 'http://localhost:8000/api/eventos/?page=2', 'previous': None,
+        'results': EventoSerializer(eventos, many=True).data,
+    }
+    valores = [
+        {'id': e.id, 'tipo': e.tipo, 'sensor': e.sensor_id, 'barrera': e.barrera_id,
+         'descripcion': e.descripcion, 'timestamp': e.timestamp}
+        for e in eventos
+    ]
+    return [('evento_serializer', pagina), ('valores_datetime', valores)]
+
+
+def medir(funcion, repeticiones):
+    funcion()  # calentamiento
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tracemalloc.start()
+    funcion()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'mediana_ms': round(statistics.median(tiempos), 3),
+        'min_ms': round(min(tiempos), 3),
+        'pico_kb': round(pico / 1024, 1),
+    }
+
+
+def comparar_carga(datos, repeticiones):
+    contexto = {'encoding': 'utf-8'}
+    resultado = {}
+    cuerpos = {}
+    for nombre, renderer, parser in (
+        ('drf', JSONRenderer(), JSONParser()), ('orjson', ORJSONRenderer(), ORJSONParser()),
+    ):
+        cuerpo = renderer.render(datos, 'application/json', {})
+        cuerpos[nombre] = cuerpo
+        resultado[nombre] = {
+            'bytes': len(cuerpo),
+            'render': medir(lambda: renderer.render(datos, 'application/json', {}), repeticiones),
+            'parse': medir(lambda: parser.parse(io.BytesIO(cuerpo), 'application/json', contexto), repeticiones),
+        }
+    resultado['equivalentes'] = json.loads(cuerpos['drf']) == json.loads(cuerpos['orjson'])
+    for operacion in ('render', 'parse'):
+        resultado[f'aceleracion_{operacion}'] = round(
+            resultado['drf'][operacion]['mediana_ms'] / resultado['orjson'][operacion]['mediana_ms'], 2
+        )
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de JSONRenderer contra ORJSONRenderer')
+    parser.add_argument('--filas', type=int, default=10000, help='Eventos por página')
+    parser.add_argument('--repeticiones', type=int, default=20, help='Mediciones por operación')
+    parser.add_argument('--salida', help='Archivo JSON de resultados (por defecto, stdout)')
+    args = parser.parse_args()
+
+    if orjson is None:
+        sys.exit('orjson no está instalado: pip install orjson')
+
+    resultados = {}
+    for nombre, datos in cargas(args.filas):
+        print(f"→ {nombre}...", file=sys.stderr)
+        resultados[nombre] = comparar_carga(datos, args.repeticiones)
+
+    print(f"\n{'carga':<20}{'operación':<10}{'drf ms':>10}{'orjson ms':>11}{'x':>7}{'drf KB':>10}{'orjson KB':>11}",
+          file=sys.stderr)
+    for nombre, datos in resultados.items():
+        for operacion in ('render', 'parse'):
+            drf, rapido = datos['drf'][operacion], datos['orjson'][operacion]
+            print(f"{nombre:<20}{operacion:<10}{drf['mediana_ms']:>10.2f}{rapido['mediana_ms']:>11.2f}"
+                  f"{datos[f'aceleracion_{operacion}']:>7.1f}{drf['pico_kb']:>10.0f}{rapido['pico_kb']:>11.0f}",
+                  file=sys.stderr)
+        if not datos['equivalentes']:
+            print(f"✗ {nombre}: los renderers producen JSON distinto", file=sys.stderr)
+
+    reporte = {
+        'python': platform.python_version(),
+        'orjson': orjson.__version__,
+        'parametros': {'filas': args.filas, 'repeticiones': args.repeticiones},
+        'cargas': resultados,
+    }
+    salida = json.dumps(reporte, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            archivo.write(salida + '\n')
+        print(f"✓ Resultados guardados en {args.salida}", file=sys.stderr)
+    else:
+        print(salida)
+
+
+if __name__ == '__main__':
+    main()
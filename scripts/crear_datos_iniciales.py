@@ -1,9 +1,20 @@
 # -*- coding: utf-8 -*-
 """
 Script para crear datos iniciales de prueba
+
+Uso:
+    python scripts/crear_datos_iniciales.py
+    python scripts/crear_datos_iniciales.py --departamentos 50 --sensores 20000 --barreras 200 --eventos 2000000
+
+Las opciones de volumen agregan datos masivos (con bulk_create) para pruebas de carga
+y para scripts/benchmark_api.py
 """
+import argparse
 import os
+import random
 import sys
+from datetime import timedelta
+
 import django
 
 # Agregar el directorio raíz del proyecto al path
@@ -18,7 +29,81 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smartconnect.settings')
 django.setup()
 
 # 3. Importar modelos (esto debe ir DESPUÉS de django.setup)
-from access_control.models import Usuario, Departamento, Sensor, Barrera
+from django.utils import timezone
+
+from access_control.models import Usuario, Departamento, Sensor, Barrera, Evento
+from access_control.estadisticas import reconstruir
+
+
+def crear_datos_volumen(departamentos=0, sensores=0, barreras=0, eventos=0, dias=30, lote=5000,
+                        semilla=42):
+    """
+    Crea datos masivos para pruebas de carga
+    Es idempotente para departamentos, barreras y sensores (nombres/UID determinísticos);
+    los eventos siempre se agregan
+    """
+    aleatorio = random.Random(semilla)
+
+    if departamentos:
+        print(f"\nCreando {departamentos} departamentos...")
+        Departamento.objects.bulk_create([
+            Departamento(nombre=f'Departamento {i:05d}', ubicacion=f'Piso {i % 10}')
+            for i in range(departamentos)
+        ], batch_size=lote, ignore_conflicts=True)
+
+    ids_departamentos = list(Departamento.objects.values_list('id', flat=True))
+
+    if barreras:
+        print(f"Creando {barreras} barreras...")
+        Barrera.objects.bulk_create([
+            Barrera(nombre=f'Barrera {i:05d}', departamento_id=aleatorio.choice(ids_departamentos))
+            for i in range(barreras)
+        ], batch_size=lote, ignore_conflicts=True)
+
+    if sensores:
+        print(f"Creando {sensores} sensores...")
+        estados = [Sensor.Estado.ACTIVO] * 17 + [
+            Sensor.Estado.INACTIVO, Sensor.Estado.BLOQUEADO, Sensor.Estado.PERDIDO
+        ]
+        for inicio in range(0, sensores, lote):
+            Sensor.objects.bulk_create([
+                Sensor(
+                    uid_mac=f'BENCH-{i:08d}',
+                    nombre=f'Tarjeta {i:08d}',
+                    estado=aleatorio.choice(estados),
+                    departamento_id=aleatorio.choice(ids_departamentos),
+                )
+                for i in range(inicio, min(inicio + lote, sensores))
+            ], ignore_conflicts=True)
+
+    if eventos:
+        print(f"Creando {eventos} eventos en los últimos {dias} días...")
+        ids_sensores = list(Sensor.objects.values_list('id', flat=True))
+        ids_barreras = list(Barrera.objects.values_list('id', flat=True))
+        tipos = [Evento.TipoEvento.ACCESO_PERMITIDO] * 8 + [
+            Evento.TipoEvento.ACCESO_DENEGADO, Evento.TipoEvento.APERTURA_MANUAL
+        ]
+        ahora = timezone.now()
+        segundos = dias * 24 * 3600
+        for inicio in range(0, eventos, lote):
+            Evento.objects.bulk_create([
+                Evento(
+                    tipo=aleatorio.choice(tipos),
+                    sensor_id=aleatorio.choice(ids_sensores) if ids_sensores else None,
+                    barrera_id=aleatorio.choice(ids_barreras) if ids_barreras else None,
+                    descripcion='Evento generado para pruebas de carga',
+                    timestamp=ahora - timedelta(seconds=aleatorio.randrange(segundos)),
+                )
+                for _ in range(min(lote, eventos - inicio))
+            ])
+            print(f"  {min(inicio + lote, eventos)}/{eventos}", end='\r')
+        print("\nReconstruyendo estadísticas...")
+        reconstruir()
+
+    print(f"✓ Datos de volumen: {Departamento.objects.count()} departamentos, "
+          f"{Barrera.objects.count()} barreras, {Sensor.objects.count()} sensores, "
+          f"{Evento.objects.count()} eventos")
+
 
 def main():
     print("=== Iniciando creación de datos ===")
@@ -158,4 +243,18 @@ def main():
     print(f"  Operador -> User: operador | Pass: operador123")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Crea datos iniciales de prueba')
+    parser.add_argument('--departamentos', type=int, default=0, help='Departamentos adicionales')
+    parser.add_argument('--sensores', type=int, default=0, help='Sensores adicionales')
+    parser.add_argument('--barreras', type=int, default=0, help='Barreras adicionales')
+    parser.add_argument('--eventos', type=int, default=0, help='Eventos a generar')
+    parser.add_argument('--dias', type=int, default=30, help='Días hacia atrás para los eventos')
+    parser.add_argument('--lote', type=int, default=5000, help='Filas por bulk_create')
+    args = parser.parse_args()
+
+    main()
+    if args.departamentos or args.sensores or args.barreras or args.eventos:
+        crear_datos_volumen(
+            departamentos=args.departamentos, sensores=args.sensores, barreras=args.barreras,
+            eventos=args.eventos, dias=args.dias, lote=args.lote,
+        )
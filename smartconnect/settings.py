@@ -52,6 +52,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para medir la petición completa (ver access_control/metricas.py)
+    'access_control.metricas.MetricasMiddleware',
+    'access_control.perfilado.PerfiladoMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -86,10 +89,20 @@ WSGI_APPLICATION = 'smartconnect.wsgi.application'
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
 ENGINE = os.getenv("DB_ENGINE", "sqlite")
+# Conexiones MySQL: persistentes por DB_CONN_MAX_AGE segundos (con verificación de salud antes
+# de reutilizarlas), o con DB_POOL=True un pool por proceso de DB_POOL_TAMANO conexiones más
+# DB_POOL_DESBORDE en picos (ver access_control/db_backends/mysql_pool)
+DB_POOL = os.getenv("DB_POOL", "False") == "True"
+# Modo de producción para SQLite (DB_SQLITE_OPTIMIZADO=True): journal WAL (lecturas sin bloquear
+# la escritura), synchronous=NORMAL, caché de DB_SQLITE_CACHE_KB KiB, mmap de DB_SQLITE_MMAP_MB MiB
+# y espera de hasta DB_SQLITE_TIMEOUT segundos por el bloqueo. Las transacciones empiezan con
+# BEGIN IMMEDIATE y las escrituras de cada proceso se serializan antes de llegar a SQLite
+# (ver access_control/db_backends/sqlite_serializado)
+DB_SQLITE_OPTIMIZADO = os.getenv("DB_SQLITE_OPTIMIZADO", "False") == "True"
 if ENGINE == "mysql":
     DATABASES = {
         "default": {
-            "ENGINE": "django.db.backends.mysql",
+            "ENGINE": "access_control.db_backends.mysql_pool" if DB_POOL else "django.db.backends.mysql",
             "NAME": os.getenv("DB_NAME"),
             "USER": os.getenv("DB_USER"),
             "PASSWORD": os.getenv("DB_PASSWORD"),
@@ -100,8 +113,26 @@ if ENGINE == "mysql":
                 "init_command": "SET sql_mode='STRICT_TRANS_TABLES'",
                 "ssl_mode": "REQUIRED",
             },
+            "CONN_MAX_AGE": 0 if DB_POOL else int(os.getenv("DB_CONN_MAX_AGE", "60")),
+            "CONN_HEALTH_CHECKS": True,
+            "POOL": {
+                "TAMANO": int(os.getenv("DB_POOL_TAMANO", "10")),
+                "DESBORDE": int(os.getenv("DB_POOL_DESBORDE", "5")),
+                "TIMEOUT": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+                "RECICLAR": int(os.getenv("DB_POOL_RECICLAR", "3600")),
+                "VALIDAR_DESPUES": int(os.getenv("DB_POOL_VALIDAR_DESPUES", "30")),
+            },
         }
     }
+    if os.getenv("DB_REPLICA_HOST"):
+        DATABASES["replica"] = {
+            **DATABASES["default"],
+            "HOST": os.getenv("DB_REPLICA_HOST"),
+            "PORT": os.getenv("DB_REPLICA_PORT", DATABASES["default"]["PORT"]),
+            "USER": os.getenv("DB_REPLICA_USER", DATABASES["default"]["USER"]),
+            "PASSWORD": os.getenv("DB_REPLICA_PASSWORD", DATABASES["default"]["PASSWORD"]),
+            "OPTIONS": dict(DATABASES["default"]["OPTIONS"]),
+        }
 else:
     DATABASES = {
         "default": {
@@ -109,6 +140,37 @@ else:
             "NAME": BASE_DIR / os.getenv("DB_NAME", "db.sqlite3"),
         }
     }
+    if DB_SQLITE_OPTIMIZADO:
+        DATABASES["default"].update({
+            "ENGINE": "access_control.db_backends.sqlite_serializado",
+            "OPTIONS": {
+                "init_command": (
+                    "PRAGMA journal_mode=WAL;"
+                    "PRAGMA synchronous=NORMAL;"
+                    f"PRAGMA cache_size=-{int(os.getenv('DB_SQLITE_CACHE_KB', '65536'))};"
+                    f"PRAGMA mmap_size={int(os.getenv('DB_SQLITE_MMAP_MB', '256')) * 1024 * 1024};"
+                    f"PRAGMA busy_timeout={int(float(os.getenv('DB_SQLITE_TIMEOUT', '20')) * 1000)};"
+                    "PRAGMA temp_store=MEMORY"
+                ),
+                "transaction_mode": "IMMEDIATE",
+                "timeout": float(os.getenv("DB_SQLITE_TIMEOUT", "20")),
+            },
+            "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", "60")),
+        })
+    if os.getenv("DB_REPLICA_NAME"):
+        DATABASES["replica"] = {
+            **DATABASES["default"],
+            "NAME": BASE_DIR / os.getenv("DB_REPLICA_NAME"),
+        }
+
+# Réplica de lectura opcional (DB_REPLICA_HOST en MySQL, DB_REPLICA_NAME en SQLite): recibe
+# los GET de listados y reportes (ver access_control/db_router.py). Después de una escritura,
+# las lecturas del usuario usan la principal durante DB_REPLICA_ADHERENCIA segundos.
+# En las pruebas la réplica es un espejo de la base de datos principal
+if "replica" in DATABASES:
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+DATABASE_ROUTERS = ["access_control.db_router.ReplicaRouter"]
+DB_REPLICA_ADHERENCIA = int(os.getenv("DB_REPLICA_ADHERENCIA", "5"))
 
 
 # Password validation
@@ -168,7 +230,7 @@ CORS_ALLOW_ALL_ORIGINS = True  # Para desarrollo, en producción especifica los
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'access_control.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -178,6 +240,21 @@ REST_FRAMEWORK = {
     'EXCEPTION_HANDLER': 'access_control.utils.custom_exception_handler',
 }
 
+# JSON de la API con orjson (API_JSON_RAPIDO=True, requiere `pip install orjson`): mismo
+# contenido que el JSONRenderer/JSONParser de DRF, serializado varias veces más rápido en
+# páginas grandes. Sin orjson instalado se usa el módulo json estándar
+# (ver access_control/renderers.py y scripts/benchmark_json.py)
+if os.getenv("API_JSON_RAPIDO", "False") == "True":
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = (
+        'access_control.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    )
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'] = (
+        'access_control.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    )
+
 # Simple JWT settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=5),
@@ -194,6 +271,24 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
 }
 
+# Caché (LocMemCache por proceso; con CACHE_REDIS_URL se comparte entre workers)
+if os.getenv("CACHE_REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("CACHE_REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Segundos que se mantiene en caché el usuario autenticado por JWT
+JWT_USUARIO_CACHE_TTL = int(os.getenv("JWT_USUARIO_CACHE_TTL", "60"))
+
 # Custom User Model
 AUTH_USER_MODEL = 'access_control.Usuario'
 
@@ -203,3 +298,88 @@ RESEND_FROM_EMAIL = os.getenv("RESEND_FROM_EMAIL")
 RESEND_TEST_EMAIL = os.getenv("RESEND_TEST_EMAIL")
 
 COMPANY_NAME = os.getenv("COMPANY_NAME", "Dulcería Lilis")
+
+# Caché en memoria de credenciales de sensores (verificar_acceso). Es por proceso: un cambio
+# hecho en otro worker (bloqueo, alta o importación de sensores) se ve aquí a más tardar
+# CREDENCIALES_CACHE_TTL segundos después (0 desactiva la caché)
+CREDENCIALES_CACHE_TAMANO = int(os.getenv("CREDENCIALES_CACHE_TAMANO", "10000"))
+CREDENCIALES_CACHE_TTL = float(os.getenv("CREDENCIALES_CACHE_TTL", "10"))
+
+# Registro de eventos: 'sincrono' (INSERT en la petición) o 'diferido' (cola + bulk_create en segundo plano)
+EVENTOS_MODO = os.getenv("EVENTOS_MODO", "sincrono")
+EVENTOS_LOTE_TAMANO = int(os.getenv("EVENTOS_LOTE_TAMANO", "500"))
+EVENTOS_LOTE_INTERVALO = float(os.getenv("EVENTOS_LOTE_INTERVALO", "1.0"))
+EVENTOS_SPOOL_DIR = Path(os.getenv("EVENTOS_SPOOL_DIR", BASE_DIR / "spool"))
+EVENTOS_SPOOL_FSYNC = os.getenv("EVENTOS_SPOOL_FSYNC", "False") == "True"
+
+# Máximo de lecturas por petición en /api/sensores/verificar_acceso_lote/
+VERIFICAR_ACCESO_LOTE_MAX = int(os.getenv("VERIFICAR_ACCESO_LOTE_MAX", "1000"))
+
+# Filas validadas e insertadas por lote en la importación masiva de sensores
+SENSORES_IMPORTAR_LOTE = int(os.getenv("SENSORES_IMPORTAR_LOTE", "1000"))
+
+# /api/sensores/verificar_acceso/: segundos en que una lectura repetida (mismo UID/MAC y barrera)
+# recibe la decisión anterior sin registrar otro evento (0 desactiva), y límite opcional por
+# cliente (usuario + IP): lecturas por segundo en promedio y ráfaga máxima. El límite viene
+# desactivado (tasa 0): los lectores suelen compartir una cuenta de servicio y la IP de salida,
+# y un 429 en la barrera niega la entrada en un cambio de turno
+VERIFICAR_ACCESO_VENTANA = float(os.getenv("VERIFICAR_ACCESO_VENTANA", "2"))
+VERIFICAR_ACCESO_TASA = float(os.getenv("VERIFICAR_ACCESO_TASA", "0"))
+VERIFICAR_ACCESO_RAFAGA = int(os.getenv("VERIFICAR_ACCESO_RAFAGA", "100"))
+
+# Filas leídas por consulta en /api/eventos/exportar/
+EVENTOS_EXPORTAR_LOTE = int(os.getenv("EVENTOS_EXPORTAR_LOTE", "2000"))
+
+# Estadísticas pre-agregadas: actualizar los contadores al registrar cada evento.
+# Costo: en EVENTOS_MODO=sincrono cada evento abre otra transacción con un UPDATE (o INSERT)
+# por contador (hora y día), tras confirmar el evento y dentro de la misma petición; en SQLite
+# toma el bloqueo de escritura otra vez. En modo diferido se hace una vez por lote. Con False
+# los contadores se calculan con `manage.py reconstruir_estadisticas` (p. ej. desde cron)
+ESTADISTICAS_HABILITADAS = os.getenv("ESTADISTICAS_HABILITADAS", "True") == "True"
+
+# Notificaciones en tiempo real (/api/stream/): segundos entre heartbeats y mensajes
+# pendientes por conexión antes de descartar los más antiguos
+NOTIFICACIONES_HEARTBEAT = float(os.getenv("NOTIFICACIONES_HEARTBEAT", "15"))
+NOTIFICACIONES_MAX_PENDIENTES = int(os.getenv("NOTIFICACIONES_MAX_PENDIENTES", "100"))
+
+# Lista de permitidos para lectores (/api/sensores/permitidos/): bytes de SHA-256 por UID/MAC,
+# margen en segundos de la sincronización incremental y TTL de la lista en caché
+PERMITIDOS_HASH_BYTES = int(os.getenv("PERMITIDOS_HASH_BYTES", "8"))
+PERMITIDOS_MARGEN = int(os.getenv("PERMITIDOS_MARGEN", "5"))
+PERMITIDOS_CACHE_TTL = int(os.getenv("PERMITIDOS_CACHE_TTL", "60"))
+
+# Retención de eventos (manage.py archivar_eventos): los meses completos más antiguos que
+# EVENTOS_RETENCION_DIAS se mueven a archivos CSV comprimidos en EVENTOS_ARCHIVO_DIR.
+# Para usar S3 (django-storages), reemplazar el backend de STORAGES["archivo_eventos"]
+EVENTOS_RETENCION_DIAS = int(os.getenv("EVENTOS_RETENCION_DIAS", "180"))
+EVENTOS_ARCHIVO_DIR = Path(os.getenv("EVENTOS_ARCHIVO_DIR", BASE_DIR / "archivo"))
+
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+    "archivo_eventos": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {"location": EVENTOS_ARCHIVO_DIR},
+    },
+}
+
+# Métricas para Prometheus (/metrics, ver access_control/metricas.py). El endpoint exige
+# "Authorization: Bearer <METRICAS_TOKEN>" (bearer_token en la configuración del scrape);
+# sin token solo responde con DEBUG activo (fuera de DEBUG responde 404)
+METRICAS_HABILITADAS = os.getenv("METRICAS_HABILITADAS", "True") == "True"
+METRICAS_TOKEN = os.getenv("METRICAS_TOKEN", "")
+
+# Perfilado de SQL por petición (ver access_control/perfilado.py): fracción de peticiones
+# perfiladas al azar (0.01 = 1%), token del header X-Perfilado, umbral en ms para escribir
+# en el log rotativo PERFILADO_LOG y máximo de consultas con detalle por petición
+PERFILADO_MUESTREO = float(os.getenv("PERFILADO_MUESTREO", "0"))
+PERFILADO_TOKEN = os.getenv("PERFILADO_TOKEN", "")
+PERFILADO_UMBRAL_MS = float(os.getenv("PERFILADO_UMBRAL_MS", "500"))
+PERFILADO_MAX_CONSULTAS = int(os.getenv("PERFILADO_MAX_CONSULTAS", "500"))
+PERFILADO_LOG = Path(os.getenv("PERFILADO_LOG", BASE_DIR / "logs" / "perfilado.log"))
+PERFILADO_LOG_BYTES = int(os.getenv("PERFILADO_LOG_BYTES", str(10 * 1024 * 1024)))
+PERFILADO_LOG_ARCHIVOS = int(os.getenv("PERFILADO_LOG_ARCHIVOS", "5"))
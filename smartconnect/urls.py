@@ -16,6 +16,7 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from access_control.views import metricas
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -28,4 +29,6 @@ urlpatterns = [
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     # API endpoints
     path('api/', include('access_control.urls')),
+    # Métricas para Prometheus
+    path('metrics', metricas, name='metrics'),
 ]